@@ -0,0 +1,79 @@
+import random
+from pathlib import Path
+
+from pypdf import PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+)
+
+_WORDS = (
+    "invoice report quarter revenue contract region total amount due account "
+    "customer service delivery schedule payment terms page summary"
+).split()
+
+
+def _add_text_page(writer: PdfWriter, lines: list[str]) -> None:
+    """A letter-size page with lines of Helvetica text."""
+    page = writer.add_blank_page(612, 792)
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    page[NameObject("/Resources")] = DictionaryObject(
+        {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+    )
+    stream = b"BT /F1 10 Tf 14 TL 40 740 Td "
+    for line in lines:
+        escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        stream += b"(" + escaped.encode("latin-1") + b") Tj T* "
+    stream += b"ET"
+    contents = DecodedStreamObject()
+    contents.set_data(stream)
+    page[NameObject("/Contents")] = writer._add_object(contents)
+    page[NameObject("/MediaBox")] = ArrayObject(
+        [NumberObject(0), NumberObject(0), NumberObject(612), NumberObject(792)]
+    )
+
+
+def write_pdf(path: Path, pages: int, seed: int) -> None:
+    """A PDF of text pages whose content is unique to seed (so dedupe can't skip it)."""
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    for page_num in range(1, pages + 1):
+        lines = [f"Document {seed} page {page_num}"] + [
+            " ".join(rng.choices(_WORDS, k=12)) for _ in range(40)
+        ]
+        _add_text_page(writer, lines)
+    with open(path, "wb") as handle:
+        writer.write(handle)
+
+
+def generate_corpus(
+    directory: Path,
+    documents: int,
+    min_pages: int = 1,
+    max_pages: int = 20,
+    seed: int = 0,
+) -> dict[Path, int]:
+    """Write documents PDFs with min_pages..max_pages pages each to directory.
+
+    Page counts are skewed towards short documents (most inboxes are mostly
+    one- or two-page scans with the odd long one). Returns path -> pages.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    corpus: dict[Path, int] = {}
+    for i in range(documents):
+        span = max(0, max_pages - min_pages)
+        pages = min_pages + int(span * rng.random() ** 2)
+        path = directory / f"bench_{seed}_{i:05d}.pdf"
+        write_pdf(path, pages, seed * 1_000_003 + i)
+        corpus[path] = pages
+    return corpus
@@ -0,0 +1,175 @@
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+logger = logging.getLogger("pdf2md.benchmarks.fake_server")
+
+
+@dataclass
+class FakeServerOptions:
+    """How the stand-in LM Studio server behaves."""
+
+    latency: float = 0.5  # mean seconds per completion
+    jitter: float = 0.2  # latency is uniform in latency * (1 +/- jitter)
+    max_concurrency: int = 4  # completions processed at once; the rest wait
+    error_rate: float = 0.0  # fraction of completions answered with HTTP 500
+    invalid_json_rate: float = 0.0  # fraction answered with unparseable content
+    chars: int = 1500  # length of the natural_text of each page
+    seed: int | None = None
+
+
+class FakeServer:
+    """A local OpenAI-compatible server standing in for LM Studio.
+
+    Serves /v1/chat/completions with olmocr-style JSON content after a
+    configurable delay, processing at most max_concurrency requests at once
+    (further requests wait, like a loaded GPU) and failing a configurable
+    fraction of them. /v1/models answers health probes. Runs on a daemon
+    thread; stats() reports what it served.
+    """
+
+    def __init__(
+        self,
+        options: FakeServerOptions | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.options = options or FakeServerOptions()
+        self._random = random.Random(self.options.seed)
+        self._slots = threading.BoundedSemaphore(max(1, self.options.max_concurrency))
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "invalid_json": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+        }
+        handler = type("FakeServerHandler", (_Handler,), {"server_state": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host!s}:{port}/v1"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="pdf2md-fake-server", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Fake OpenAI-compatible server listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key: str, delta: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += delta
+            if key == "in_flight":
+                self._stats["max_in_flight"] = max(
+                    self._stats["max_in_flight"], self._stats["in_flight"]
+                )
+
+    def complete(self, request: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        """Status and body for one chat completion request."""
+        options = self.options
+        self._count("requests")
+        with self._slots:
+            self._count("in_flight")
+            try:
+                with self._lock:
+                    delay = options.latency * self._random.uniform(
+                        1 - options.jitter, 1 + options.jitter
+                    )
+                    roll = self._random.random()
+                time.sleep(max(0.0, delay))
+            finally:
+                self._count("in_flight", -1)
+        if roll < options.error_rate:
+            self._count("errors")
+            return 500, {"error": {"message": "Injected failure", "type": "server"}}
+        if roll < options.error_rate + options.invalid_json_rate:
+            self._count("invalid_json")
+            content = '{"natural_text": "cut sho'
+        else:
+            content = json.dumps(
+                {
+                    "primary_language": "en",
+                    "is_rotation_valid": True,
+                    "rotation_correction": 0,
+                    "is_table": False,
+                    "is_diagram": False,
+                    "natural_text": _text(options.chars),
+                }
+            )
+        return 200, {
+            "id": f"chatcmpl-{self._random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+
+def _text(chars: int) -> str:
+    words = "The quick brown fox jumps over the lazy dog. "
+    return (words * (chars // len(words) + 1))[:chars].strip()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_state: FakeServer
+    protocol_version = "HTTP/1.1"  # keep-alive, like LM Studio
+
+    def _send(self, status: int, body: dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/models"):
+            self._send(
+                200, {"object": "list", "data": [{"id": "fake", "object": "model"}]}
+            )
+        else:
+            self._send(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "Not found"}})
+            return
+        self._send(*self.server_state.complete(request))
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
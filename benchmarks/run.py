@@ -0,0 +1,364 @@
+"""Throughput benchmark of the whole service against a fake LM Studio.
+
+Generates a corpus of PDFs, starts a local OpenAI-compatible stand-in for
+LM Studio, runs the real monitor_folder -> on_new_pdf -> OcrProcessor path
+(the same one the service runs) and drops the corpus into its input folder.
+Reports documents/hour, pages/sec, page latency percentiles and peak RSS,
+optionally compared with an earlier run:
+
+    python -m benchmarks.run --documents 50 --json run.json
+    python -m benchmarks.run --documents 50 --baseline run.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_server import FakeServer, FakeServerOptions
+from src.config import load_config
+from src.jobstore import FAILED, QUEUED, RUNNING, JobStore
+from src.ocr import shutdown_ocr_engines
+from src.tracing import TRACER, load_traces
+
+logger = logging.getLogger("pdf2md.benchmarks")
+
+# A 1x1 grey PNG sent instead of a rendered page with --render skip
+_TINY_PNG = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAAAAAA6fptVAAAACklEQVR4nGNgAAAAAgABSK+kcQAAAABJRU5ErkJggg=="
+
+
+@dataclass
+class BenchmarkOptions:
+    documents: int = 20
+    min_pages: int = 1
+    max_pages: int = 20
+    seed: int = 0
+    arrival_rate: float = 0.0  # documents per second; 0 drops them all at once
+    workers: int = 2
+    page_slots: int = 8
+    render: str = "real"  # 'real' (poppler via olmocr) or 'skip' (fixed tiny image)
+    render_workers: int = 2
+    timeout: float = 3600.0
+    env: dict[str, str] = field(default_factory=dict)  # extra PDF2MD_* settings
+    server: FakeServerOptions = field(default_factory=FakeServerOptions)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q from 0 to 100) of values; 0 if there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    return {f"p{q}": round(percentile(values, q), 4) for q in (50, 95, 99)}
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak resident set size of this process (or its largest waited-for child)."""
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1_048_576 if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def skip_rendering() -> Iterator[None]:
+    """Send a fixed tiny image instead of rasterizing pages with poppler.
+
+    Anchor text is still extracted, so only the image rendering is left out.
+    Needs render_workers=0 (worker processes would not see the patch).
+    """
+    import olmocr.data.renderpdf
+    import olmocr.pipeline
+
+    def render_pdf_to_base64png(*args: Any, **kwargs: Any) -> str:
+        return _TINY_PNG
+
+    # olmocr.pipeline imported its own reference to the same function
+    original = olmocr.data.renderpdf.render_pdf_to_base64png
+    olmocr.data.renderpdf.render_pdf_to_base64png = render_pdf_to_base64png
+    olmocr.pipeline.render_pdf_to_base64png = render_pdf_to_base64png
+    try:
+        yield
+    finally:
+        olmocr.data.renderpdf.render_pdf_to_base64png = original
+        olmocr.pipeline.render_pdf_to_base64png = original
+
+
+@contextmanager
+def service_environment(env: dict[str, str]) -> Iterator[None]:
+    """Set PDF2MD_* variables for the service (read on every document)."""
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _feed(corpus: dict[Path, int], input_dir: Path, rate: float) -> None:
+    """Rename the corpus into the input folder, at rate documents/sec if given."""
+    start = time.monotonic()
+    for i, path in enumerate(corpus):
+        if rate > 0:
+            time.sleep(max(0.0, start + i / rate - time.monotonic()))
+        os.replace(path, input_dir / path.name)
+
+
+def _finished(counts: dict[str, int]) -> int:
+    return sum(n for status, n in counts.items() if status not in (QUEUED, RUNNING))
+
+
+def run_benchmark(options: BenchmarkOptions, workdir: Path) -> dict[str, Any]:
+    """Run one benchmark in workdir and return its measurements."""
+    input_dir = workdir / "input"
+    output_dir = workdir / "output"
+    done_dir = workdir / "done"
+    for directory in (input_dir, output_dir, done_dir):
+        directory.mkdir(parents=True, exist_ok=True)
+    corpus = generate_corpus(
+        workdir / "staging",
+        options.documents,
+        options.min_pages,
+        options.max_pages,
+        options.seed,
+    )
+    server = FakeServer(options.server).start()
+    env = {
+        "PDF2MD_INPUT_DIR": str(input_dir),
+        "PDF2MD_OUTPUT_DIR": str(output_dir),
+        "PDF2MD_DONE_DIR": str(done_dir),
+        "PDF2MD_LM_STUDIO_API": server.url,
+        "PDF2MD_LOG_FILE": str(workdir / "service.log"),
+        "PDF2MD_METRICS_PORT": "0",
+        "PDF2MD_CACHE_DIR": "",
+        "PDF2MD_WORKERS": str(options.workers),
+        "PDF2MD_PAGE_SLOTS": str(options.page_slots),
+        "PDF2MD_RENDER_WORKERS": (
+            "0" if options.render == "skip" else str(options.render_workers)
+        ),
+        **options.env,
+    }
+    try:
+        with service_environment(env):
+            # Imported here: the service module reads its settings on import
+            from src import pdf2md_service
+
+            cfg = load_config()
+            jobs = JobStore(cfg.JOB_STORE or workdir / "jobs.sqlite3")
+            trace_path = workdir / "trace.jsonl"
+            TRACER.configure(trace_path)
+            stop_event = threading.Event()
+            monitor = threading.Thread(
+                target=pdf2md_service.run_monitor,
+                args=(cfg, stop_event, jobs),
+                name="pdf2md-bench-monitor",
+                daemon=True,
+            )
+            with skip_rendering() if options.render == "skip" else nullcontext():
+                start = time.monotonic()
+                monitor.start()
+                _feed(corpus, input_dir, options.arrival_rate)
+                deadline = start + options.timeout
+                while time.monotonic() < deadline:
+                    counts = jobs.counts()
+                    if _finished(counts) >= len(corpus):
+                        break
+                    time.sleep(0.1)
+                elapsed = time.monotonic() - start
+                stop_event.set()
+                monitor.join(60)
+                shutdown_ocr_engines()
+            TRACER.close()
+            counts = jobs.counts()
+            pages_done = sum(row["pages"] for row in jobs.throughput(0))
+            jobs.close()
+    finally:
+        server.stop()
+
+    records = [r for trace in load_traces(trace_path).values() for r in trace]
+
+    def durations(name: str) -> list[float]:
+        return [r["duration"] for r in records if r["name"] == name]
+
+    finished = _finished(counts)
+    return {
+        "documents": len(corpus),
+        "pages": sum(corpus.values()),
+        "finished": finished,
+        "failed": counts.get(FAILED, 0),
+        "page_errors": sum(
+            1
+            for r in records
+            if r["name"] == "page" and not r.get("attrs", {}).get("ok", True)
+        ),
+        "seconds": round(elapsed, 3),
+        "docs_per_hour": round(finished / elapsed * 3600, 2),
+        "pages_per_sec": round(pages_done / elapsed, 3),
+        "page_latency": _percentiles(durations("page")),
+        "request_latency": _percentiles(durations("request")),
+        "document_latency": _percentiles(durations("document")),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_child_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "server": server.stats(),
+        "options": asdict(options),
+    }
+
+
+def format_report(
+    results: dict[str, Any], baseline: dict[str, Any] | None = None
+) -> str:
+    def latency(key: str) -> str:
+        values = results[key]
+        return "  ".join(f"{q} {values[q]:.3f}s" for q in ("p50", "p95", "p99"))
+
+    server = results["server"]
+    lines = [
+        f"Documents      {results['documents']} ({results['finished']} finished, "
+        f"{results['failed']} failed) in {results['seconds']:.1f}s",
+        f"Pages          {results['pages']} ({results['page_errors']} with errors)",
+        f"Throughput     {results['docs_per_hour']:.1f} docs/hour, "
+        f"{results['pages_per_sec']:.2f} pages/sec",
+        f"Page latency   {latency('page_latency')}",
+        f"Request        {latency('request_latency')}",
+        f"Document       {latency('document_latency')}",
+        f"Peak RSS       {results['peak_rss_mb']:.1f} MB "
+        f"(child processes {results['peak_child_rss_mb']:.1f} MB)",
+        f"Fake server    {server['requests']} requests, {server['errors']} errors, "
+        f"{server['invalid_json']} invalid JSON, max {server['max_in_flight']} in flight",
+    ]
+    if baseline is not None:
+        lines.append("Against baseline:")
+        for label, path, higher_is_better in (
+            ("docs/hour", ("docs_per_hour",), True),
+            ("pages/sec", ("pages_per_sec",), True),
+            ("page p50", ("page_latency", "p50"), False),
+            ("page p95", ("page_latency", "p95"), False),
+            ("page p99", ("page_latency", "p99"), False),
+            ("peak RSS MB", ("peak_rss_mb",), False),
+        ):
+            old: Any = baseline
+            new: Any = results
+            for key in path:
+                old, new = old[key], new[key]
+            change = (new - old) / old * 100 if old else 0.0
+            better = (change > 0) == higher_is_better if change else True
+            lines.append(
+                f"  {label:<12} {old:>10.3f} -> {new:>10.3f} ({change:+.1f}%"
+                + ("" if better else ", worse")
+                + ")"
+            )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description=__doc__.splitlines()[0]
+    )
+    corpus = parser.add_argument_group("corpus")
+    corpus.add_argument("--documents", type=int, default=20)
+    corpus.add_argument("--min-pages", type=int, default=1)
+    corpus.add_argument("--max-pages", type=int, default=20)
+    corpus.add_argument("--seed", type=int, default=0)
+    corpus.add_argument(
+        "--arrival-rate", type=float, default=0.0, help="documents/sec; 0 = all at once"
+    )
+    service = parser.add_argument_group("service")
+    service.add_argument("--workers", type=int, default=2)
+    service.add_argument("--page-slots", type=int, default=8)
+    service.add_argument(
+        "--render",
+        choices=("real", "skip"),
+        default="real",
+        help="skip: send a fixed tiny image instead of rasterizing (no poppler needed)",
+    )
+    service.add_argument("--render-workers", type=int, default=2)
+    service.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="PDF2MD_X=VALUE",
+        help="extra service setting (repeatable)",
+    )
+    server = parser.add_argument_group("fake LM Studio")
+    server.add_argument(
+        "--latency", type=float, default=0.5, help="mean seconds per page"
+    )
+    server.add_argument("--jitter", type=float, default=0.2)
+    server.add_argument("--server-concurrency", type=int, default=4)
+    server.add_argument("--error-rate", type=float, default=0.0)
+    server.add_argument("--invalid-json-rate", type=float, default=0.0)
+    output = parser.add_argument_group("output")
+    output.add_argument("--json", metavar="FILE", help="write the results to FILE")
+    output.add_argument(
+        "--baseline", metavar="FILE", help="compare with an earlier --json"
+    )
+    output.add_argument("--workdir", help="keep the corpus, outputs and trace here")
+    output.add_argument("--timeout", type=float, default=3600.0)
+    output.add_argument(
+        "-v", "--verbose", action="store_true", help="show service logs"
+    )
+    args = parser.parse_args(argv)
+
+    env = dict(item.split("=", 1) for item in args.set)
+    options = BenchmarkOptions(
+        documents=args.documents,
+        min_pages=args.min_pages,
+        max_pages=args.max_pages,
+        seed=args.seed,
+        arrival_rate=args.arrival_rate,
+        workers=args.workers,
+        page_slots=args.page_slots,
+        render=args.render,
+        render_workers=args.render_workers,
+        timeout=args.timeout,
+        env=env,
+        server=FakeServerOptions(
+            latency=args.latency,
+            jitter=args.jitter,
+            max_concurrency=args.server_concurrency,
+            error_rate=args.error_rate,
+            invalid_json_rate=args.invalid_json_rate,
+            seed=args.seed,
+        ),
+    )
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if not args.verbose:
+        # The service module adds its own handlers on import
+        logging.getLogger("pdf2md").setLevel(logging.WARNING)
+    workdir = (
+        Path(args.workdir)
+        if args.workdir
+        else Path(tempfile.mkdtemp(prefix="pdf2md-bench-"))
+    )
+    try:
+        results = run_benchmark(options, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    print(format_report(results, baseline))
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
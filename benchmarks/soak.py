@@ -0,0 +1,351 @@
+"""Soak test: run the service for hours against a fake LM Studio.
+
+Feeds freshly generated PDFs into the real monitor_folder -> on_new_pdf ->
+OcrProcessor path at a steady rate and samples resident memory, open file
+descriptors, threads and the service's own gauges (queued and tracked
+files, per-file timestamp tables, files awaiting stability, in-flight
+requests) every few seconds. At the end each series is checked for
+sustained growth, which is what a slow leak looks like:
+
+    python -m benchmarks.soak --hours 4 --rate 0.5 --samples soak.jsonl
+
+Exits with status 1 if anything kept growing.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from benchmarks.corpus import write_pdf
+from benchmarks.fake_server import FakeServer, FakeServerOptions
+from benchmarks.run import service_environment, skip_rendering
+from src.config import load_config
+from src.jobstore import JobStore
+from src.metrics import REGISTRY, process_stats
+from src.ocr import shutdown_ocr_engines
+
+logger = logging.getLogger("pdf2md.benchmarks.soak")
+
+# Least growth worth flagging, absolute and relative to the starting level
+_TOLERANCE = {"rss_mb": (16.0, 0.10)}
+_DEFAULT_TOLERANCE = (2.0, 0.10)
+
+
+@dataclass
+class SoakOptions:
+    duration: float = 3600.0  # seconds
+    rate: float = 0.5  # documents per second
+    sample_interval: float = 10.0  # seconds
+    min_pages: int = 1
+    max_pages: int = 5
+    workers: int = 2
+    page_slots: int = 8
+    render: str = "skip"  # 'real' (poppler via olmocr) or 'skip'
+    render_workers: int = 2
+    warmup: float = 0.2  # fraction of the samples ignored while caches fill
+    env: dict[str, str] = field(default_factory=dict)  # extra PDF2MD_* settings
+    server: FakeServerOptions = field(
+        default_factory=lambda: FakeServerOptions(latency=0.2)
+    )
+
+
+def sample() -> dict[str, float]:
+    """Process resources plus every gauge the service exports right now."""
+    stats = process_stats()
+    values: dict[str, float] = {
+        "rss_mb": round(stats["rss_bytes"] / 1_048_576, 2),
+        "open_fds": stats["open_fds"],
+        "threads": stats["threads"],
+    }
+    for family in REGISTRY.collect():
+        if family.kind != "gauge" or family.name.startswith("process_"):
+            continue
+        if family.name == "pdf2md_threads":
+            continue
+        for labels, value in family.samples:
+            suffix = ",".join(f"{k}={v}" for k, v in labels.items())
+            values[f"{family.name}{{{suffix}}}" if suffix else family.name] = value
+    return values
+
+
+def _series(samples: list[dict[str, float]]) -> list[str]:
+    """Every series sampled, in first-seen order (gauges appear once registered)."""
+    return [key for key in dict.fromkeys(k for s in samples for k in s) if key != "t"]
+
+
+def find_growth(
+    samples: list[dict[str, float]], warmup: float = 0.2, windows: int = 4
+) -> dict[str, dict[str, float]]:
+    """Series that grew steadily over the run, with their start and end levels.
+
+    After dropping the warmup fraction, the samples are cut into windows and
+    each series is reduced to its minimum per window: the level it returns to
+    between bursts of work. A series is flagged when that floor never drops
+    from one window to the next and ends above where it started by more than
+    a tolerance, so a sawtooth (work arriving and finishing) is not a leak but
+    a floor that keeps rising is.
+    """
+    steady = samples[int(len(samples) * warmup) :]
+    if len(steady) < windows:
+        return {}
+    size = len(steady) // windows
+    chunks = [steady[i * size : (i + 1) * size] for i in range(windows)]
+    chunks[-1] = steady[(windows - 1) * size :]
+    growth: dict[str, dict[str, float]] = {}
+    for key in _series(steady):
+        floors = [min(s.get(key, 0.0) for s in chunk) for chunk in chunks]
+        absolute, relative = _TOLERANCE.get(key, _DEFAULT_TOLERANCE)
+        rise = floors[-1] - floors[0]
+        rising = all(b >= a for a, b in zip(floors, floors[1:], strict=False))
+        if rising and rise > max(absolute, relative * abs(floors[0])):
+            growth[key] = {
+                "start": floors[0],
+                "end": floors[-1],
+                "per_hour": round(
+                    rise / max(steady[-1]["t"] - steady[0]["t"], 1e-9) * 3600, 3
+                ),
+            }
+    return growth
+
+
+def _feed(
+    staging: Path, input_dir: Path, options: SoakOptions, stop: threading.Event
+) -> None:
+    """Drop a new unique PDF into input_dir every 1/rate seconds until stop."""
+    interval = 1 / options.rate if options.rate > 0 else 1.0
+    span = max(0, options.max_pages - options.min_pages)
+    i = 0
+    next_at = time.monotonic()
+    while not stop.wait(max(0.0, next_at - time.monotonic())):
+        pages = options.min_pages + (i * 7919) % (span + 1)
+        path = staging / f"soak_{i:07d}.pdf"
+        write_pdf(path, pages, i)
+        os.replace(path, input_dir / path.name)
+        i += 1
+        next_at += interval
+
+
+def _clean(output_dir: Path, done_dir: Path) -> None:
+    """Remove finished outputs so disk use stays flat over a long run."""
+    for path in [*output_dir.glob("*.md"), *done_dir.glob("*.pdf")]:
+        path.unlink(missing_ok=True)
+
+
+def run_soak(
+    options: SoakOptions, workdir: Path, samples_path: Path | None = None
+) -> dict[str, Any]:
+    """Run a soak test in workdir; returns the samples and flagged growth."""
+    input_dir = workdir / "input"
+    output_dir = workdir / "output"
+    done_dir = workdir / "done"
+    staging = workdir / "staging"
+    for directory in (input_dir, output_dir, done_dir, staging):
+        directory.mkdir(parents=True, exist_ok=True)
+    server = FakeServer(options.server).start()
+    env = {
+        "PDF2MD_INPUT_DIR": str(input_dir),
+        "PDF2MD_OUTPUT_DIR": str(output_dir),
+        "PDF2MD_DONE_DIR": str(done_dir),
+        "PDF2MD_LM_STUDIO_API": server.url,
+        "PDF2MD_LOG_FILE": str(workdir / "service.log"),
+        "PDF2MD_METRICS_PORT": "0",
+        "PDF2MD_CACHE_DIR": "",
+        "PDF2MD_WORKERS": str(options.workers),
+        "PDF2MD_PAGE_SLOTS": str(options.page_slots),
+        "PDF2MD_RENDER_WORKERS": (
+            "0" if options.render == "skip" else str(options.render_workers)
+        ),
+        **options.env,
+    }
+    samples: list[dict[str, float]] = []
+    handle = open(samples_path, "w", encoding="utf-8") if samples_path else None
+    try:
+        with service_environment(env):
+            # Imported here: the service module reads its settings on import
+            from src import pdf2md_service
+
+            cfg = load_config()
+            jobs = JobStore(cfg.JOB_STORE or workdir / "jobs.sqlite3")
+            stop_event = threading.Event()
+            feeding = threading.Event()
+            monitor = threading.Thread(
+                target=pdf2md_service.run_monitor,
+                args=(cfg, stop_event, jobs),
+                name="pdf2md-soak-monitor",
+                daemon=True,
+            )
+            feeder = threading.Thread(
+                target=_feed,
+                args=(staging, input_dir, options, feeding),
+                name="pdf2md-soak-feeder",
+                daemon=True,
+            )
+            with skip_rendering() if options.render == "skip" else nullcontext():
+                start = time.monotonic()
+                monitor.start()
+                feeder.start()
+                try:
+                    while True:
+                        elapsed = time.monotonic() - start
+                        values = {"t": round(elapsed, 1), **sample()}
+                        samples.append(values)
+                        if handle is not None:
+                            handle.write(json.dumps(values) + "\n")
+                            handle.flush()
+                        logger.info(
+                            f"{elapsed:7.0f}s rss {values['rss_mb']:.1f} MB, "
+                            f"{values['open_fds']:.0f} fds, "
+                            f"{values['threads']:.0f} threads, "
+                            f"{values.get('pdf2md_tracked_files', 0):.0f} tracked"
+                        )
+                        if elapsed >= options.duration:
+                            break
+                        _clean(output_dir, done_dir)
+                        time.sleep(
+                            min(options.sample_interval, options.duration - elapsed)
+                        )
+                finally:
+                    feeding.set()
+                    feeder.join(10)
+                    stop_event.set()
+                    monitor.join(60)
+                    shutdown_ocr_engines()
+            counts = jobs.counts()
+            jobs.close()
+    finally:
+        server.stop()
+        if handle is not None:
+            handle.close()
+    return {
+        "seconds": samples[-1]["t"],
+        "documents": counts,
+        "samples": samples,
+        "growth": find_growth(samples, options.warmup),
+        "server": server.stats(),
+    }
+
+
+def format_report(results: dict[str, Any]) -> str:
+    samples = results["samples"]
+    first, last = samples[0], samples[-1]
+    series = _series(samples)
+    width = max(len(key) for key in series)
+    lines = [
+        f"Ran {results['seconds'] / 60:.1f} min, {len(samples)} samples; "
+        f"documents by status: {results['documents']}",
+        f"{'series':<{width}} {'first':>10} {'last':>10} {'max':>10}",
+    ]
+    for key in series:
+        peak = max(s.get(key, 0.0) for s in samples)
+        lines.append(
+            f"{key:<{width}} {first.get(key, 0.0):>10.1f} "
+            f"{last.get(key, 0.0):>10.1f} {peak:>10.1f}"
+        )
+    if results["growth"]:
+        lines.append("Sustained growth:")
+        for key, g in results["growth"].items():
+            lines.append(
+                f"  {key}: {g['start']:.1f} -> {g['end']:.1f} ({g['per_hour']:+.1f}/hour)"
+            )
+    else:
+        lines.append("No sustained growth.")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.soak", description=__doc__.splitlines()[0]
+    )
+    length = parser.add_mutually_exclusive_group()
+    length.add_argument("--hours", type=float)
+    length.add_argument("--minutes", type=float)
+    parser.add_argument(
+        "--rate", type=float, default=0.5, help="documents per second fed in"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=10.0, help="seconds between samples"
+    )
+    parser.add_argument("--min-pages", type=int, default=1)
+    parser.add_argument("--max-pages", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--page-slots", type=int, default=8)
+    parser.add_argument("--render", choices=("real", "skip"), default="skip")
+    parser.add_argument("--render-workers", type=int, default=2)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="PDF2MD_X=VALUE",
+        help="extra service setting (repeatable)",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="fake server seconds per page"
+    )
+    parser.add_argument("--server-concurrency", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--samples", metavar="FILE", help="write every sample here (JSON lines)"
+    )
+    parser.add_argument("--workdir", help="keep the service log and job store here")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    duration = (
+        args.hours * 3600
+        if args.hours
+        else (args.minutes * 60 if args.minutes else 3600.0)
+    )
+    options = SoakOptions(
+        duration=duration,
+        rate=args.rate,
+        sample_interval=args.interval,
+        min_pages=args.min_pages,
+        max_pages=args.max_pages,
+        workers=args.workers,
+        page_slots=args.page_slots,
+        render=args.render,
+        render_workers=args.render_workers,
+        env=dict(item.split("=", 1) for item in args.set),
+        server=FakeServerOptions(
+            latency=args.latency,
+            max_concurrency=args.server_concurrency,
+            error_rate=args.error_rate,
+        ),
+    )
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(message)s",
+    )
+    if not args.verbose:
+        # The service module adds its own handlers on import
+        logging.getLogger("pdf2md").setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)  # progress lines either way
+    workdir = (
+        Path(args.workdir)
+        if args.workdir
+        else Path(tempfile.mkdtemp(prefix="pdf2md-soak-"))
+    )
+    try:
+        results = run_soak(
+            options, workdir, Path(args.samples) if args.samples else None
+        )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    print(format_report(results))
+    if results["growth"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger("pdf2md.cache")
+
+
+class PageCache:
+    """Content-addressed on-disk cache of page OCR text with LRU eviction.
+
+    Entries are stored as <key>.txt files (sharded by key prefix) under
+    cache_dir. Recency is tracked in memory, seeded from file mtimes on startup
+    and persisted by touching files on hits, and the least recently used entries
+    are deleted once the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()  # key -> size, LRU first
+        self._total_bytes = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(query: dict[str, Any], model_name: str) -> str:
+        """Hash everything that determines the model's answer for a page.
+
+        The query carries the rendered page image, the prompt (which embeds the
+        anchor text) and the sampling parameters; the model name is added
+        explicitly so switching models never returns stale text.
+        """
+        payload = json.dumps(
+            {"model": model_name, "query": query}, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def _load_index(self) -> None:
+        found: list[tuple[float, str, int]] = []
+        for path in self.cache_dir.glob("*/*.txt"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            found.append((st.st_mtime, path.stem, st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        if found:
+            logger.info(
+                f"Loaded page cache with {len(found)} entries "
+                f"({self._total_bytes / 1_048_576:.1f} MB) from {self.cache_dir}"
+            )
+        self._evict()
+
+    def get(self, key: str) -> str | None:
+        """Return the cached text for key, or None on a miss."""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                text = path.read_text(encoding="utf-8")
+                os.utime(path)  # persist recency across restarts
+            except OSError as e:
+                logger.warning(f"Dropping unreadable page cache entry {path}: {e}")
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str) -> None:
+        """Store text under key, evicting least recently used entries if needed."""
+        data = text.encode("utf-8")
+        path = self._path(key)
+        with self._lock:
+            tmp_name = None
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_name, path)
+            except OSError as e:
+                logger.warning(f"Could not write page cache entry {path}: {e}")
+                if tmp_name is not None:
+                    try:
+                        os.unlink(tmp_name)
+                    except OSError:
+                        pass
+                return
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict page cache entry {key}: {e}")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
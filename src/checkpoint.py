@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger("pdf2md.checkpoint")
+
+
+class CheckpointStore:
+    """Per-page results of documents in progress, keyed by document hash.
+
+    Each successful page is written atomically to <root>/<doc_hash>/<page>.json
+    as soon as it is done, so a document interrupted by a restart (or queued
+    again after a failure) only needs its missing pages OCR'd.
+
+    Each page records the settings it was produced under (model, image
+    sizes, ...); load() ignores pages saved under different settings, so
+    changing the configuration between runs redoes those pages.
+    """
+
+    def __init__(
+        self, root: str | Path, settings: dict[str, Any] | None = None
+    ) -> None:
+        self.root = Path(root)
+        # Normalised through JSON so it compares equal to what load() reads back
+        self.settings = json.loads(json.dumps(settings or {}))
+
+    def _doc_dir(self, doc_hash: str) -> Path:
+        return self.root / doc_hash
+
+    def load(self, doc_hash: str) -> dict[int, tuple[str, str]]:
+        """Return {page_num: (text, source)} for every page checkpointed under
+        the current settings."""
+        pages: dict[int, tuple[str, str]] = {}
+        doc_dir = self._doc_dir(doc_hash)
+        if not doc_dir.is_dir():
+            return pages
+        stale = 0
+        for path in doc_dir.glob("*.json"):
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+                if entry.get("settings", {}) != self.settings:
+                    stale += 1
+                    continue
+                pages[int(entry["page"])] = (str(entry["text"]), str(entry["source"]))
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        if stale:
+            logger.info(
+                f"Ignoring {stale} checkpointed page(s) of {doc_hash} saved under "
+                "different settings"
+            )
+        return pages
+
+    def save_page(
+        self, doc_hash: str, page_num: int, text: str, source: str = "ocr"
+    ) -> None:
+        """Checkpoint one finished page (atomic write; failures are only logged)."""
+        doc_dir = self._doc_dir(doc_hash)
+        entry = {
+            "page": page_num,
+            "text": text,
+            "source": source,
+            "settings": self.settings,
+        }
+        tmp_name = None
+        try:
+            doc_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=doc_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_name, doc_dir / f"{page_num:05d}.json")
+        except OSError as e:
+            logger.warning(f"Could not checkpoint page {page_num} of {doc_hash}: {e}")
+            if tmp_name is not None:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+
+    def clear(self, doc_hash: str) -> None:
+        """Drop all checkpoints of a document once its output is written."""
+        shutil.rmtree(self._doc_dir(doc_hash), ignore_errors=True)
+
+    def prune(self, max_age: float) -> int:
+        """Drop checkpoints of documents untouched for max_age seconds.
+
+        Documents that were deleted, abandoned or never finished would
+        otherwise keep their checkpoints forever. Returns the count removed.
+        """
+        if not self.root.is_dir():
+            return 0
+        cutoff = time.time() - max_age
+        removed = 0
+        for doc_dir in self.root.iterdir():
+            try:
+                if not doc_dir.is_dir() or doc_dir.stat().st_mtime >= cutoff:
+                    continue
+                shutil.rmtree(doc_dir)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove stale checkpoints {doc_dir}: {e}")
+        if removed:
+            logger.info(
+                f"Removed checkpoints of {removed} document(s) untouched for "
+                f"{max_age / 86400:g} days from {self.root}"
+            )
+        return removed
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from collections.abc import Hashable
+
+logger = logging.getLogger("pdf2md.concurrency")
+
+
+class AimdLimiter:
+    """Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    Every successful request that was sent while the limit was fully used
+    raises the limit by about one per round (increase / limit per success).
+    A timeout, a server error, or a response slower than latency_target cuts
+    the limit by decrease_ratio. Requests that were already in flight when the
+    limit was cut don't cut it again, so one overload burst costs one decrease,
+    not one per failed request. Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        latency_target: float = 60.0,
+        increase: float = 1.0,
+        decrease_ratio: float = 0.5,
+    ) -> None:
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease_ratio = decrease_ratio
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self._last_decrease = float("-inf")
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return int(self._limit)
+
+    def on_success(self, latency: float, started: float, in_flight: int) -> None:
+        """Record a completed request; in_flight counts it as still running."""
+        if latency > self.latency_target:
+            self._decrease(started, f"latency {latency:.1f}s > {self.latency_target}s")
+            return
+        if in_flight < self.limit:
+            return  # the limit wasn't the bottleneck; don't grow it blindly
+        old = self.limit
+        self._limit = min(
+            float(self.max_limit), self._limit + self.increase / self._limit
+        )
+        if self.limit != old:
+            self.increases += 1
+            logger.info(
+                f"Concurrency limit for {self.name}: {old} -> {self.limit} "
+                f"(latency {latency:.1f}s)"
+            )
+
+    def on_overload(self, started: float, reason: str) -> None:
+        """Record a timeout or server error for a request started at `started`."""
+        self._decrease(started, reason)
+
+    def _decrease(self, started: float, reason: str) -> None:
+        if started <= self._last_decrease:
+            return  # sent under the old limit; its overload is already counted
+        old = self.limit
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_ratio)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+        logger.warning(
+            f"Concurrency limit for {self.name}: {old} -> {self.limit} ({reason})"
+        )
+
+
+class PageScheduler:
+    """Shares a fixed number of page inference slots fairly between documents.
+
+    Every document being converted queues its ready pages here; whenever a
+    slot frees up it goes to the next document in round-robin order that has
+    a page waiting. A large document can use every slot while it is alone,
+    but a small one that arrives later gets a slot within one round instead
+    of waiting behind the large document's pages. Must be used from a single
+    event loop.
+    """
+
+    def __init__(self, slots: int) -> None:
+        self.slots = max(1, slots)
+        self.in_use = 0
+        # Documents with pages waiting, in round-robin order
+        self._waiting: OrderedDict[Hashable, deque[asyncio.Future[None]]] = (
+            OrderedDict()
+        )
+
+    def waiting(self) -> int:
+        """Number of pages waiting for a slot."""
+        return sum(len(waiters) for waiters in self._waiting.values())
+
+    async def acquire(self, document: Hashable) -> None:
+        """Wait for a slot for one page of document."""
+        if self.in_use < self.slots and not self._waiting:
+            self.in_use += 1
+            return
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(document, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # granted just as the page was cancelled
+            else:
+                self._discard(document, waiter)
+            raise
+
+    def release(self) -> None:
+        """Return a slot and hand it to the next document in turn."""
+        self.in_use -= 1
+        while self.in_use < self.slots and self._waiting:
+            document, waiters = next(iter(self._waiting.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._waiting.move_to_end(document)
+            else:
+                del self._waiting[document]
+            if not waiter.done():
+                self.in_use += 1
+                waiter.set_result(None)
+
+    def _discard(self, document: Hashable, waiter: asyncio.Future[None]) -> None:
+        waiters = self._waiting.get(document)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiting[document]
@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from typing import Any
 
 try:
     from dotenv import load_dotenv
@@ -18,6 +19,49 @@ def get_env_var(name: str, default: str | None = None, required: bool = False) -
     return value
 
 
+def get_env_int(name: str, default: int) -> int:
+    value = get_env_var(name, str(default))
+    try:
+        return int(value)
+    except ValueError:
+        raise RuntimeError(
+            f"Invalid integer for environment variable {name}: {value!r}"
+        ) from None
+
+
+def get_env_float(name: str, default: float) -> float:
+    value = get_env_var(name, str(default))
+    try:
+        return float(value)
+    except ValueError:
+        raise RuntimeError(
+            f"Invalid number for environment variable {name}: {value!r}"
+        ) from None
+
+
+def get_env_bool(name: str, default: bool) -> bool:
+    value = get_env_var(name, "1" if default else "0").strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off", ""):
+        return False
+    raise RuntimeError(f"Invalid boolean for environment variable {name}: {value!r}")
+
+
+def get_env_int_list(name: str, default: tuple[int, ...]) -> tuple[int, ...]:
+    value = get_env_var(name, ",".join(str(n) for n in default))
+    try:
+        numbers = tuple(int(part) for part in value.split(",") if part.strip())
+    except ValueError:
+        numbers = ()
+    if not numbers or min(numbers) <= 0:
+        raise RuntimeError(
+            f"Invalid list of positive integers for environment variable {name}: "
+            f"{value!r}"
+        )
+    return numbers
+
+
 @dataclass
 class Config:
     INPUT_DIR: str
@@ -28,15 +72,51 @@ class Config:
     LM_STUDIO_API_KEY: str = "lm-studio"
     LOG_FILE: str = "app.log"
     MD_PAGE_DELIMITER: str = "delimited"  # 'delimited' or 'concat'
+    OCR_PAGE_CONCURRENCY: int = 2  # deprecated: per-PDF limit when PAGE_SLOTS is 0
+    PAGE_SLOTS: int = 8  # pages in flight across all PDFs; 0 = per-PDF limit only
+    WORKERS: int = 2  # PDFs converted in parallel
+    MAX_QUEUE_SIZE: int = 1000  # PDFs waiting for a worker before producers block
+    STABLE_QUIET_PERIOD: float = 2.0  # seconds a new PDF must go unchanged
+    MONITOR_MODE: str = "events"  # 'events' (native) or 'polling' (network shares)
+    SCAN_INTERVAL: float = 5.0  # seconds between directory scans when polling
+    CACHE_DIR: str = ""  # page OCR cache directory; empty disables the cache
+    CACHE_MAX_MB: int = 1024
+    DEDUPE_INDEX: str = ""  # PDF hash -> markdown index file; empty disables dedupe
+    TEXT_LAYER_THRESHOLD: float = 0.0  # 0 disables the embedded-text fast path
+    CHECKPOINT_DIR: str = ""  # per-page checkpoints; empty disables resume
+    CHECKPOINT_MAX_AGE_DAYS: float = 7.0  # stale checkpoints pruned on start; 0 keeps
+    JOB_STORE: str = ""  # SQLite job history and queue state; empty disables it
+    JOB_MAX_ATTEMPTS: int = 3  # crashes during a job before it is abandoned
+    METRICS_PORT: int = 0  # Prometheus /metrics endpoint, e.g. 9464; 0 disables it
+    METRICS_HOST: str = "127.0.0.1"  # interface the metrics endpoint listens on
+    TRACE_FILE: str = ""  # JSON lines of per-document trace spans; empty disables
+    LM_STUDIO_ENDPOINTS: str = ""  # url|weight|max_concurrency,...; "" = LM_STUDIO_API
+    ENDPOINT_FAILURE_THRESHOLD: int = 3  # failures in a row to bench an endpoint
+    ENDPOINT_PROBE_INTERVAL: float = 30.0  # seconds between probes when benched
+    CIRCUIT_BREAKER: bool = True  # hold requests while every endpoint is down
+    CIRCUIT_MAX_OUTAGE: float = 900.0  # seconds to hold them before failing; 0 = no cap
+    ADAPTIVE_MAX_CONCURRENCY: int = 8  # ceiling of the AIMD limit; 0 = fixed
+    ADAPTIVE_LATENCY_TARGET: float = 60.0  # slower responses count as overload
+    RENDER_WORKERS: int = 2  # page render processes; 0 renders on the OCR loop
+    RENDER_READ_AHEAD: int = 4  # rendered pages per PDF waiting for inference
+    IMAGE_DIMS: tuple[int, ...] = (1024,)  # page image sizes, cheap first
+    ANCHOR_TEXT_LEN: int = 6000  # max characters of PDF text sent with each page
+    MIN_RESULT_CHARS: int = 25  # shorter results are retried at a higher size
+    SCHEDULING: str = "sjf"  # 'sjf' (fewest pages first) or 'fifo'
+    SCHEDULING_AGING: float = 10.0  # pages of head start per minute waited
+    PRIORITY_DIR: str = "priority"  # input subfolder for urgent PDFs
+    PRIORITY_PREFIX: str = "priority_"  # filename prefix for urgent PDFs
 
-    def as_dict(self) -> dict[str, str]:
+    def as_dict(self) -> dict[str, Any]:
         return self.__dict__
 
 
 def load_config() -> Config:
+    output_dir = get_env_var("PDF2MD_OUTPUT_DIR", required=True)
+    log_file = get_env_var("PDF2MD_LOG_FILE", "app.log")
     return Config(
         INPUT_DIR=get_env_var("PDF2MD_INPUT_DIR", required=True),
-        OUTPUT_DIR=get_env_var("PDF2MD_OUTPUT_DIR", required=True),
+        OUTPUT_DIR=output_dir,
         DONE_DIR=get_env_var("PDF2MD_DONE_DIR", required=True),
         LM_STUDIO_API=get_env_var(
             "PDF2MD_LM_STUDIO_API", "http://localhost:1234", required=True
@@ -45,6 +125,51 @@ def load_config() -> Config:
             "PDF2MD_LM_STUDIO_MODEL", "allenai_olmocr-7b-0225-preview"
         ),
         LM_STUDIO_API_KEY=get_env_var("PDF2MD_LM_STUDIO_API_KEY", "lm-studio"),
-        LOG_FILE=get_env_var("PDF2MD_LOG_FILE", "app.log"),
+        LOG_FILE=log_file,
         MD_PAGE_DELIMITER=get_env_var("PDF2MD_MD_PAGE_DELIMITER", "delimited"),
+        OCR_PAGE_CONCURRENCY=get_env_int("PDF2MD_OCR_PAGE_CONCURRENCY", 2),
+        PAGE_SLOTS=get_env_int("PDF2MD_PAGE_SLOTS", 8),
+        WORKERS=get_env_int("PDF2MD_WORKERS", 2),
+        MAX_QUEUE_SIZE=get_env_int("PDF2MD_MAX_QUEUE_SIZE", 1000),
+        STABLE_QUIET_PERIOD=get_env_float("PDF2MD_STABLE_QUIET_PERIOD", 2.0),
+        MONITOR_MODE=get_env_var("PDF2MD_MONITOR_MODE", "events"),
+        SCAN_INTERVAL=get_env_float("PDF2MD_SCAN_INTERVAL", 5.0),
+        CACHE_DIR=get_env_var("PDF2MD_CACHE_DIR", ""),
+        CACHE_MAX_MB=get_env_int("PDF2MD_CACHE_MAX_MB", 1024),
+        DEDUPE_INDEX=get_env_var(
+            "PDF2MD_DEDUPE_INDEX", os.path.join(output_dir, ".pdf2md-index.jsonl")
+        ),
+        TEXT_LAYER_THRESHOLD=get_env_float("PDF2MD_TEXT_LAYER_THRESHOLD", 0.0),
+        CHECKPOINT_DIR=get_env_var(
+            "PDF2MD_CHECKPOINT_DIR", os.path.join(output_dir, ".pdf2md-checkpoints")
+        ),
+        CHECKPOINT_MAX_AGE_DAYS=get_env_float("PDF2MD_CHECKPOINT_MAX_AGE_DAYS", 7.0),
+        JOB_STORE=get_env_var(
+            # SQLite's locking (and WAL) is unreliable on network shares, so
+            # the database lives next to the log rather than in OUTPUT_DIR
+            "PDF2MD_JOB_STORE",
+            os.path.join(
+                os.path.dirname(os.path.abspath(log_file)), ".pdf2md-jobs.sqlite3"
+            ),
+        ),
+        JOB_MAX_ATTEMPTS=get_env_int("PDF2MD_JOB_MAX_ATTEMPTS", 3),
+        METRICS_PORT=get_env_int("PDF2MD_METRICS_PORT", 0),
+        METRICS_HOST=get_env_var("PDF2MD_METRICS_HOST", "127.0.0.1"),
+        TRACE_FILE=get_env_var("PDF2MD_TRACE_FILE", ""),
+        LM_STUDIO_ENDPOINTS=get_env_var("PDF2MD_LM_STUDIO_ENDPOINTS", ""),
+        ENDPOINT_FAILURE_THRESHOLD=get_env_int("PDF2MD_ENDPOINT_FAILURE_THRESHOLD", 3),
+        ENDPOINT_PROBE_INTERVAL=get_env_float("PDF2MD_ENDPOINT_PROBE_INTERVAL", 30.0),
+        CIRCUIT_BREAKER=get_env_bool("PDF2MD_CIRCUIT_BREAKER", True),
+        CIRCUIT_MAX_OUTAGE=get_env_float("PDF2MD_CIRCUIT_MAX_OUTAGE", 900.0),
+        ADAPTIVE_MAX_CONCURRENCY=get_env_int("PDF2MD_ADAPTIVE_MAX_CONCURRENCY", 8),
+        ADAPTIVE_LATENCY_TARGET=get_env_float("PDF2MD_ADAPTIVE_LATENCY_TARGET", 60.0),
+        RENDER_WORKERS=get_env_int("PDF2MD_RENDER_WORKERS", 2),
+        RENDER_READ_AHEAD=get_env_int("PDF2MD_RENDER_READ_AHEAD", 4),
+        IMAGE_DIMS=get_env_int_list("PDF2MD_IMAGE_DIMS", (1024,)),
+        ANCHOR_TEXT_LEN=get_env_int("PDF2MD_ANCHOR_TEXT_LEN", 6000),
+        MIN_RESULT_CHARS=get_env_int("PDF2MD_MIN_RESULT_CHARS", 25),
+        SCHEDULING=get_env_var("PDF2MD_SCHEDULING", "sjf"),
+        SCHEDULING_AGING=get_env_float("PDF2MD_SCHEDULING_AGING", 10.0),
+        PRIORITY_DIR=get_env_var("PDF2MD_PRIORITY_DIR", "priority"),
+        PRIORITY_PREFIX=get_env_var("PDF2MD_PRIORITY_PREFIX", "priority_"),
     )
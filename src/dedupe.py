@@ -0,0 +1,90 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger("pdf2md.dedupe")
+
+
+def file_sha256(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the hex SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DocumentIndex:
+    """Persistent index from PDF content hash to the markdown produced for it.
+
+    Stored as an append-only JSON-lines file so recording a document is a
+    single small write; later lines win when the file is replayed on startup.
+    Each entry also records the hash of the markdown, so an output that was
+    since overwritten or edited is never handed out as a duplicate result.
+    """
+
+    def __init__(self, index_path: str | Path) -> None:
+        self.index_path = Path(index_path)
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, str]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                for line_num, line in enumerate(f, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry["pdf_sha256"]] = entry
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        logger.warning(
+                            f"Skipping malformed line {line_num} in {self.index_path}"
+                        )
+        except FileNotFoundError:
+            return
+        logger.info(f"Loaded {len(self._entries)} documents from {self.index_path}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, pdf_sha256: str) -> Path | None:
+        """Return the existing markdown for this PDF hash, if it is still intact."""
+        with self._lock:
+            entry = self._entries.get(pdf_sha256)
+        if entry is None:
+            return None
+        output = Path(entry["output"])
+        try:
+            if file_sha256(output) == entry["md_sha256"]:
+                return output
+        except OSError:
+            pass
+        logger.info(f"Indexed output {output} is missing or changed; ignoring entry")
+        with self._lock:
+            self._entries.pop(pdf_sha256, None)
+        return None
+
+    def record(self, pdf_sha256: str, output_path: str | Path, source: str) -> None:
+        """Remember that the PDF with this hash was converted to output_path."""
+        entry = {
+            "pdf_sha256": pdf_sha256,
+            "output": str(output_path),
+            "md_sha256": file_sha256(output_path),
+            "source": source,
+            "indexed_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+        with self._lock:
+            self._entries[pdf_sha256] = entry
+            try:
+                self.index_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.index_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                logger.warning(
+                    f"Could not update document index {self.index_path}: {e}"
+                )
@@ -0,0 +1,377 @@
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI
+
+from src.concurrency import AimdLimiter
+
+logger = logging.getLogger("pdf2md.endpoints")
+
+
+@dataclass(frozen=True)
+class EndpointSpec:
+    """One LM Studio server: its URL, routing weight and in-flight request cap."""
+
+    url: str
+    weight: float = 1.0
+    max_concurrency: int = 0  # 0 = no cap beyond the callers' own limits
+
+
+def parse_endpoints(value: str, default_url: str) -> tuple[EndpointSpec, ...]:
+    """Parse PDF2MD_LM_STUDIO_ENDPOINTS.
+
+    The value is a comma-separated list of `url|weight|max_concurrency` entries,
+    where weight and max_concurrency are optional. An empty value means the
+    single server at default_url.
+    """
+    if not value.strip():
+        return (EndpointSpec(default_url),)
+    specs: list[EndpointSpec] = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = [part.strip() for part in entry.split("|")]
+        if len(parts) > 3 or not parts[0]:
+            raise RuntimeError(f"Invalid LM Studio endpoint entry: {entry!r}")
+        try:
+            weight = float(parts[1]) if len(parts) > 1 and parts[1] else 1.0
+            max_concurrency = int(parts[2]) if len(parts) > 2 and parts[2] else 0
+        except ValueError:
+            raise RuntimeError(
+                f"Invalid weight or max concurrency in LM Studio endpoint entry: {entry!r}"
+            ) from None
+        if weight <= 0 or max_concurrency < 0:
+            raise RuntimeError(
+                f"Weight must be positive and max concurrency non-negative: {entry!r}"
+            )
+        specs.append(EndpointSpec(parts[0], weight, max_concurrency))
+    if not specs:
+        raise RuntimeError(f"No LM Studio endpoints in {value!r}")
+    return tuple(specs)
+
+
+# How LM Studio answers (with a 400 or 404) while no model, or not the
+# requested one, is loaded
+_NO_MODEL = re.compile(
+    r"no models? (is )?loaded|model_not_found|model\b.*\bnot (found|loaded)", re.I
+)
+
+
+def _is_no_model(exc: BaseException) -> bool:
+    return (
+        isinstance(exc, APIStatusError)
+        and exc.status_code in (400, 404)
+        and bool(_NO_MODEL.search(f"{exc.code or ''} {exc.message}"))
+    )
+
+
+def is_endpoint_failure(exc: BaseException) -> bool:
+    """True for errors that say something about the server rather than the request.
+
+    Besides timeouts, connection errors and 5xx responses, that includes the
+    4xx LM Studio sends while the model is unloaded: the server is up but
+    cannot OCR anything until the model is loaded again.
+    """
+    if isinstance(exc, (APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError) and exc.status_code >= 500:
+        return True
+    return _is_no_model(exc)
+
+
+@dataclass
+class Endpoint:
+    """Runtime state of one endpoint in an EndpointPool."""
+
+    spec: EndpointSpec
+    client: AsyncOpenAI
+    in_flight: int = 0
+    healthy: bool = True
+    consecutive_failures: int = 0
+    requests: int = 0
+    failures: int = 0
+    down_since: float = 0.0
+    on_trial: bool = False  # back after a probe, no request has succeeded yet
+    limiter: AimdLimiter | None = None
+
+    @property
+    def url(self) -> str:
+        return self.spec.url
+
+    def capacity(self) -> int:
+        """Current cap on in-flight requests (0 = none)."""
+        if self.limiter is not None:
+            return self.limiter.limit
+        return self.spec.max_concurrency
+
+    def has_capacity(self) -> bool:
+        cap = self.capacity()
+        return cap <= 0 or self.in_flight < cap
+
+    def load(self) -> float:
+        """Load after taking one more request, relative to the endpoint's weight."""
+        return (self.in_flight + 1) / self.spec.weight
+
+
+class EndpointPool:
+    """Routes requests to the least-loaded healthy LM Studio endpoint.
+
+    Each endpoint has its own pooled AsyncOpenAI client. An endpoint that fails
+    failure_threshold requests in a row (see is_endpoint_failure) is taken out
+    of rotation and probed every probe_interval seconds until it answers
+    again (with probe_model set, until a one-token completion from that
+    model succeeds, so an unloaded model is not mistaken for a recovery); it then needs only one more failure to be taken out again.
+    If every endpoint is down, requests still go to the endpoints, so callers'
+    retry and backoff logic sees the errors as before, unless circuit_breaker
+    is set: then the circuit is open and acquire() waits until a probe gets
+    an answer, so an outage costs idle time rather than failed requests. With
+    max_outage > 0 the circuit closes again after that many seconds down, so
+    requests fail with the endpoints' errors instead of waiting forever on a
+    server that won't recover by itself (a misconfigured model name). An
+    endpoint on trial after a probe then takes one request at a time until
+    one succeeds, and a failure on trial is the request's own, not the
+    outage's (see release()).
+
+    With adaptive_max_concurrency > 0, each endpoint's in-flight cap is an
+    AimdLimiter between 1 and adaptive_max_concurrency (or the endpoint's own
+    max_concurrency, if lower) driven by its latency, timeouts and errors.
+    Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        specs: tuple[EndpointSpec, ...],
+        api_key: str,
+        timeout: int = 120,
+        failure_threshold: int = 3,
+        probe_interval: float = 30.0,
+        adaptive_max_concurrency: int = 0,
+        latency_target: float = 60.0,
+        circuit_breaker: bool = False,
+        probe_model: str = "",
+        max_outage: float = 0.0,
+    ) -> None:
+        if not specs:
+            raise RuntimeError("EndpointPool needs at least one endpoint")
+        self.failure_threshold = max(1, failure_threshold)
+        self.probe_model = probe_model
+        self.probe_interval = probe_interval
+        self.circuit_breaker = circuit_breaker
+        self.max_outage = max_outage
+        self._outage_reported = False
+        # Retries are handled by the caller, so the SDK's own retries are disabled
+        self.endpoints = [
+            Endpoint(
+                spec,
+                AsyncOpenAI(
+                    base_url=spec.url, api_key=api_key, timeout=timeout, max_retries=0
+                ),
+            )
+            for spec in specs
+        ]
+        if adaptive_max_concurrency > 0:
+            for endpoint in self.endpoints:
+                cap = endpoint.spec.max_concurrency
+                endpoint.limiter = AimdLimiter(
+                    endpoint.url,
+                    max_limit=min(cap, adaptive_max_concurrency)
+                    if cap > 0
+                    else adaptive_max_concurrency,
+                    latency_target=latency_target,
+                )
+        self._cond = asyncio.Condition()
+        self._probes: dict[str, asyncio.Task[None]] = {}
+
+    @property
+    def circuit_open(self) -> bool:
+        """True while requests are held back because every endpoint is down."""
+        if not self.circuit_breaker or any(e.healthy for e in self.endpoints):
+            return False
+        left = self._outage_left()
+        return left is None or left > 0
+
+    def _outage_left(self) -> float | None:
+        """Seconds until an open circuit gives up waiting (None = never)."""
+        if self.max_outage <= 0:
+            return None
+        down_since = max(e.down_since for e in self.endpoints)
+        return self.max_outage - (time.monotonic() - down_since)
+
+    async def acquire(self) -> Endpoint:
+        """Reserve a slot on the best endpoint, waiting while all are at capacity
+        (or, with the circuit breaker, while all are down)."""
+        async with self._cond:
+            while True:
+                healthy = [e for e in self.endpoints if e.healthy]
+                if not healthy and self.circuit_breaker:
+                    left = self._outage_left()
+                    if left is None:
+                        await self._cond.wait()
+                        continue
+                    if left > 0:
+                        try:
+                            await asyncio.wait_for(self._cond.wait(), left)
+                        except TimeoutError:
+                            pass
+                        continue
+                    if not self._outage_reported:
+                        self._outage_reported = True
+                        logger.error(
+                            f"Every LM Studio endpoint has been down for over "
+                            f"{self.max_outage:g}s; failing OCR requests until "
+                            "one answers a probe"
+                        )
+                candidates = [
+                    e
+                    for e in (healthy or self.endpoints)
+                    if e.has_capacity()
+                    and not (self.circuit_breaker and e.on_trial and e.in_flight)
+                ]
+                if candidates:
+                    endpoint = min(candidates, key=lambda e: (e.load(), -e.spec.weight))
+                    endpoint.in_flight += 1
+                    endpoint.requests += 1
+                    return endpoint
+                await self._cond.wait()
+
+    async def release(
+        self,
+        endpoint: Endpoint,
+        error: BaseException | None,
+        started: float | None = None,
+    ) -> bool:
+        """Return a slot and record whether the request succeeded.
+
+        started is the time.monotonic() at which the request was sent; it feeds
+        the adaptive limiter, if enabled. Returns True if the request failed
+        because of an outage: the circuit is open and the endpoint was not on
+        trial. A request that keeps failing on an endpoint that answers probes
+        (a page that always times out, say) gets False, so callers can still
+        give up on it.
+        """
+        async with self._cond:
+            on_trial = endpoint.on_trial
+            if endpoint.limiter is not None and started is not None:
+                if error is None:
+                    endpoint.limiter.on_success(
+                        time.monotonic() - started, started, endpoint.in_flight
+                    )
+                elif is_endpoint_failure(error):
+                    endpoint.limiter.on_overload(started, type(error).__name__)
+            endpoint.in_flight -= 1
+            if error is None:
+                endpoint.consecutive_failures = 0
+                endpoint.on_trial = False
+                if not endpoint.healthy:
+                    self._mark_healthy(endpoint)
+            elif is_endpoint_failure(error):
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if (
+                    endpoint.healthy
+                    and endpoint.consecutive_failures >= self.failure_threshold
+                ):
+                    self._mark_down(endpoint, error)
+            self._cond.notify_all()
+            return (
+                error is not None
+                and is_endpoint_failure(error)
+                and self.circuit_open
+                and not on_trial
+            )
+
+    def _mark_healthy(self, endpoint: Endpoint, on_trial: bool = False) -> None:
+        was_open = self.circuit_breaker and not any(e.healthy for e in self.endpoints)
+        self._outage_reported = False
+        endpoint.healthy = True
+        endpoint.on_trial = on_trial
+        # A probe only shows the server answers; until a real request succeeds
+        # a single failure takes the endpoint out again
+        endpoint.consecutive_failures = self.failure_threshold - 1 if on_trial else 0
+        downtime = time.monotonic() - endpoint.down_since
+        logger.info(
+            f"LM Studio endpoint {endpoint.url} is back in rotation "
+            f"after {downtime:.0f}s"
+        )
+        if was_open:
+            logger.info("LM Studio is reachable again; resuming OCR requests")
+
+    def _mark_down(self, endpoint: Endpoint, error: BaseException) -> None:
+        endpoint.healthy = False
+        endpoint.on_trial = False
+        endpoint.down_since = time.monotonic()
+        logger.warning(
+            f"LM Studio endpoint {endpoint.url} taken out of rotation after "
+            f"{endpoint.consecutive_failures} consecutive failures"
+        )
+        if _is_no_model(error):
+            # Only loading the model (or fixing its name) brings it back
+            model = f"model {self.probe_model!r}" if self.probe_model else "the model"
+            logger.error(
+                f"LM Studio at {endpoint.url} has not loaded {model} ({error}); "
+                "load it or check PDF2MD_LM_STUDIO_MODEL"
+            )
+        if self.circuit_open:
+            logger.warning(
+                "Every LM Studio endpoint is down; holding OCR requests until one "
+                f"answers a probe (every {self.probe_interval:.0f}s)"
+            )
+        probe = len(self.endpoints) > 1 or self.circuit_breaker
+        if probe and endpoint.url not in self._probes:
+            self._probes[endpoint.url] = asyncio.create_task(self._probe(endpoint))
+
+    async def _probe(self, endpoint: Endpoint) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.probe_interval)
+                if endpoint.healthy:  # a live request got through meanwhile
+                    return
+                try:
+                    await self._probe_request(endpoint)
+                except Exception as e:
+                    logger.debug(f"Probe of {endpoint.url} failed: {e}")
+                    continue
+                async with self._cond:
+                    if not endpoint.healthy:
+                        self._mark_healthy(endpoint, on_trial=True)
+                    self._cond.notify_all()
+                return
+        finally:
+            self._probes.pop(endpoint.url, None)
+
+    async def _probe_request(self, endpoint: Endpoint) -> None:
+        if not self.probe_model:
+            await endpoint.client.models.list()
+            return
+        # models.list() answers even with no model loaded
+        await endpoint.client.chat.completions.create(
+            model=self.probe_model,
+            messages=[{"role": "user", "content": "ping"}],
+            max_tokens=1,
+        )
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Per-endpoint health and request counters."""
+        return [
+            {
+                "url": e.url,
+                "healthy": e.healthy,
+                "in_flight": e.in_flight,
+                "limit": e.capacity(),
+                "requests": e.requests,
+                "failures": e.failures,
+            }
+            for e in self.endpoints
+        ]
+
+    async def close(self) -> None:
+        """Stop probes and close every endpoint's client."""
+        for task in list(self._probes.values()):
+            task.cancel()
+        for endpoint in self.endpoints:
+            await endpoint.client.close()
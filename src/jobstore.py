@@ -0,0 +1,314 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from src.ocr import PageResult
+
+logger = logging.getLogger("pdf2md.jobstore")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+DUPLICATE = "duplicate"  # output reused from an identical, earlier PDF
+FAILED = "failed"
+REMOVED = "removed"  # the PDF disappeared before it was converted
+INTERRUPTED = "interrupted"  # in flight when the service stopped cleanly
+ABANDONED = "abandoned"  # interrupted too often; not queued again unless changed
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    size INTEGER,
+    mtime_ns INTEGER,
+    pages INTEGER,
+    page_failures INTEGER,
+    output TEXT,
+    error TEXT,
+    queued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_path ON jobs (path, status);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS pages (
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    page INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    chars INTEGER NOT NULL,
+    PRIMARY KEY (job_id, page)
+);
+"""
+
+
+def _signature(path: Path) -> tuple[int | None, int | None]:
+    """(size, mtime_ns) of path, or (None, None) if it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    return st.st_size, st.st_mtime_ns
+
+
+class JobStore:
+    """SQLite record of every PDF job: status, attempts, timings and pages.
+
+    A job is created when a PDF is queued, marked running when a worker picks
+    it up and finished with its outcome and per-page results. Jobs still
+    queued or running when the service stopped are handed back by
+    unfinished() on the next start; attempts counts only the runs the
+    service died during, as jobs in flight at a clean stop are marked
+    interrupted(). Each job keeps its file's size and mtime, so a changed
+    file under the same name starts afresh. The history is kept for
+    throughput reports. Safe to use from several threads.
+    """
+
+    def __init__(self, db_path: str | Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {
+                row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")
+            }
+            # Stores created before jobs kept their file's signature
+            if "size" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN size INTEGER")
+            if "mtime_ns" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN mtime_ns INTEGER")
+
+    def _current(self, path: Path) -> int | None:
+        row = self._conn.execute(
+            "SELECT id FROM jobs WHERE path = ? AND status IN (?, ?, ?) "
+            "ORDER BY id DESC LIMIT 1",
+            (str(path), QUEUED, RUNNING, INTERRUPTED),
+        ).fetchone()
+        return int(row["id"]) if row is not None else None
+
+    def _insert(self, path: Path, now: float) -> int:
+        size, mtime_ns = _signature(path)
+        cursor = self._conn.execute(
+            "INSERT INTO jobs (path, status, queued_at, size, mtime_ns) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (str(path), QUEUED, now, size, mtime_ns),
+        )
+        return int(cursor.lastrowid or 0)
+
+    def enqueued(self, path: Path) -> int:
+        """Record that path was queued; reuses its job if one is unfinished.
+
+        If the file changed since that job was created, its attempts start
+        again from zero.
+        """
+        size, mtime_ns = _signature(path)
+        with self._lock, self._conn:
+            job_id = self._current(path)
+            if job_id is None:
+                return self._insert(path, time.time())
+            if size is not None:
+                self._conn.execute(
+                    "UPDATE jobs SET attempts = 0, size = ?, mtime_ns = ? "
+                    "WHERE id = ? AND (size IS NOT ? OR mtime_ns IS NOT ?)",
+                    (size, mtime_ns, job_id, size, mtime_ns),
+                )
+            return job_id
+
+    def started(self, path: Path) -> int:
+        """Record that a worker started on path."""
+        now = time.time()
+        with self._lock, self._conn:
+            job_id = self._current(path)
+            if job_id is None:
+                job_id = self._insert(path, now)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, error = NULL WHERE id = ?",
+                (RUNNING, now, job_id),
+            )
+            return job_id
+
+    def interrupted(self) -> int:
+        """Mark the jobs still running as interrupted by a clean stop.
+
+        They are handed back by unfinished() without counting an attempt.
+        Returns how many there were.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ?", (INTERRUPTED, RUNNING)
+            )
+            return cursor.rowcount
+
+    def finished(
+        self,
+        path: Path,
+        status: str,
+        output: Path | None = None,
+        num_pages: int | None = None,
+        pages: Iterable["PageResult"] = (),
+        error: str | None = None,
+    ) -> None:
+        """Record the outcome of path's current job (no-op if it has none)."""
+        with self._lock, self._conn:
+            job_id = self._current(path)
+            if job_id is None:
+                return
+            page_rows = [
+                (job_id, p.page, p.source, int(p.ok), p.seconds, p.chars) for p in pages
+            ]
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, output = ?, pages = ?, "
+                "page_failures = ?, error = ?, finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    str(output) if output is not None else None,
+                    num_pages,
+                    sum(1 for row in page_rows if not row[3]) if page_rows else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", page_rows
+            )
+
+    def status(self, path: Path) -> str | None:
+        """Status of the latest job for path, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM jobs WHERE path = ? ORDER BY id DESC LIMIT 1",
+                (str(path),),
+            ).fetchone()
+        return str(row["status"]) if row is not None else None
+
+    def abandoned(self, path: Path) -> bool:
+        """True if path's latest job was abandoned and the file is unchanged."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, size, mtime_ns FROM jobs WHERE path = ? "
+                "ORDER BY id DESC LIMIT 1",
+                (str(path),),
+            ).fetchone()
+        if row is None or row["status"] != ABANDONED:
+            return False
+        return (row["size"], row["mtime_ns"]) == _signature(path)
+
+    def unfinished(self, max_attempts: int = 3) -> list[Path]:
+        """Paths of jobs left unfinished by the last run, oldest first.
+
+        Jobs whose PDF is gone are marked removed. A job still marked running
+        was in flight when the service died, which counts as one attempt;
+        interrupted and queued jobs don't count. Jobs that reach max_attempts
+        (e.g. a PDF that brings the service down) are marked abandoned rather
+        than handed back again. A file changed since its job was created
+        starts again from zero attempts.
+        """
+        now = time.time()
+        paths: list[Path] = []
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, path, status, attempts, size, mtime_ns FROM jobs "
+                "WHERE status IN (?, ?, ?) ORDER BY queued_at, id",
+                (QUEUED, RUNNING, INTERRUPTED),
+            ).fetchall()
+            for row in rows:
+                path = Path(row["path"])
+                size, mtime_ns = _signature(path)
+                if size is None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?",
+                        (REMOVED, now, row["id"]),
+                    )
+                    continue
+                attempts = row["attempts"]
+                if (row["size"], row["mtime_ns"]) != (size, mtime_ns):
+                    attempts = 0
+                if row["status"] == RUNNING:
+                    attempts += 1
+                if max_attempts > 0 and attempts >= max_attempts:
+                    error = f"Interrupted {attempts} times"
+                    logger.error(
+                        f"Giving up on {path}: {error}; change or rename it "
+                        "to try again"
+                    )
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = ?, error = ?, "
+                        "finished_at = ?, size = ?, mtime_ns = ? WHERE id = ?",
+                        (ABANDONED, attempts, error, now, size, mtime_ns, row["id"]),
+                    )
+                    continue
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, size = ?, "
+                    "mtime_ns = ? WHERE id = ?",
+                    (QUEUED, attempts, size, mtime_ns, row["id"]),
+                )
+                paths.append(path)
+        return paths
+
+    def counts(self) -> dict[str, int]:
+        """Number of jobs in each status."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        return {str(row["status"]): int(row["n"]) for row in rows}
+
+    def throughput(
+        self, since: float, bucket_seconds: int = 3600
+    ) -> list[dict[str, Any]]:
+        """Finished jobs per time bucket since the given Unix time.
+
+        Each bucket has its start time, documents converted and failed, pages
+        converted, and the average and longest time a document took.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CAST(finished_at / ? AS INTEGER) * ? AS bucket, "
+                "COUNT(*) AS documents, "
+                "SUM(status = ?) AS failed, "
+                "COALESCE(SUM(pages), 0) AS pages, "
+                "AVG(finished_at - started_at) AS avg_seconds, "
+                "MAX(finished_at - started_at) AS max_seconds "
+                "FROM jobs WHERE finished_at >= ? AND status IN (?, ?, ?) "
+                "GROUP BY bucket ORDER BY bucket",
+                (
+                    bucket_seconds,
+                    bucket_seconds,
+                    FAILED,
+                    since,
+                    DONE,
+                    DUPLICATE,
+                    FAILED,
+                ),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def page_stats(self, since: float) -> list[dict[str, Any]]:
+        """Pages converted since the given Unix time, per source."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.source, COUNT(*) AS pages, SUM(NOT p.ok) AS failed, "
+                "AVG(p.seconds) AS avg_seconds "
+                "FROM pages p JOIN jobs j ON j.id = p.job_id "
+                "WHERE j.finished_at >= ? GROUP BY p.source ORDER BY pages DESC",
+                (since,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,337 @@
+import logging
+import math
+import os
+import resource
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("pdf2md.metrics")
+
+LabelValues = tuple[str, ...]
+
+# Seconds; from a cached page (milliseconds) up to a large document (minutes)
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+
+@dataclass
+class Family:
+    """One metric and its samples, as produced at scrape time by a collector."""
+
+    name: str
+    kind: str  # 'counter', 'gauge' or 'histogram'
+    help: str
+    samples: list[tuple[dict[str, str], float]] = field(default_factory=list)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {labels}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> dict[str, str]:
+        return dict(zip(self.labelnames, key, strict=True))
+
+    @abstractmethod
+    def render(self) -> list[str]: ...
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self._labels(k))} {_format_value(v)}"
+            for k, v in items
+        ]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, per label combination."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (count per bucket, +Inf count, sum)
+        self._values: dict[LabelValues, tuple[list[int], int, float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, sum_ = self._values.get(
+                key, ([0] * len(self.buckets), 0, 0.0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + 1, sum_ + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe how long the with-block took (also when it raises)."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+        return entry[1] if entry is not None else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(
+                (k, (list(c), t, s)) for k, (c, t, s) in self._values.items()
+            )
+        lines = []
+        for key, (counts, total, sum_) in items:
+            labels = self._labels(key)
+            for bound, count in zip(self.buckets, counts, strict=True):
+                bucket = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket} {count}")
+            lines.append(
+                f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {total}"
+            )
+            lines.append(
+                f"{self.name}_sum{_format_labels(labels)} {_format_value(sum_)}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(labels)} {total}")
+        return lines
+
+
+class Registry:
+    """Metrics owned by this process plus collectors read at scrape time.
+
+    Collectors report state that lives elsewhere (queue depth, in-flight
+    requests, cache counters); they are registered under a name, so
+    registering again replaces the previous one.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+        self._collectors: dict[str, Callable[[], list[Family]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def counter(
+        self, name: str, help: str, labelnames: tuple[str, ...] = ()
+    ) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self, name: str, help: str, labelnames: tuple[str, ...] = ()
+    ) -> Histogram:
+        metric = Histogram(name, help, labelnames)
+        self.register(metric)
+        return metric
+
+    def add_collector(self, name: str, collect: Callable[[], list[Family]]) -> None:
+        with self._lock:
+            self._collectors[name] = collect
+
+    def remove_collector(self, name: str) -> None:
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def collect(self) -> list[Family]:
+        """What the collectors report right now (a failing one is skipped)."""
+        with self._lock:
+            collectors = list(self._collectors.items())
+        families: list[Family] = []
+        for name, collect in collectors:
+            try:
+                families.extend(collect())
+            except Exception as e:
+                logger.warning(f"Metrics collector {name} failed: {e}")
+        return families
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: list[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            lines.extend(
+                f"{family.name}{_format_labels(labels)} {_format_value(value)}"
+                for labels, value in family.samples
+            )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "pdf2md_stage_seconds",
+    "Time spent per pipeline stage (stability_wait, render, inference, parse, "
+    "write, move, document)",
+    ("stage",),
+)
+PAGES = REGISTRY.counter(
+    "pdf2md_pages_total",
+    "Pages converted, by source and result",
+    ("source", "result"),
+)
+DOCUMENTS = REGISTRY.counter(
+    "pdf2md_documents_total", "Documents finished, by status", ("status",)
+)
+ERRORS = REGISTRY.counter("pdf2md_errors_total", "Errors, by type", ("type",))
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # no procfs (macOS)
+        pass
+    # Peak rather than current memory, but still shows sustained growth
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes vs KiB
+
+
+def _open_fds() -> int:
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        try:
+            # Minus the descriptor listing the directory used
+            return len(os.listdir(fd_dir)) - 1
+        except OSError:
+            continue
+    return 0
+
+
+def process_stats() -> dict[str, int]:
+    """Current resident memory (bytes), open file descriptors and threads.
+
+    Without procfs (macOS) the memory is the peak resident size so far.
+    """
+    return {
+        "rss_bytes": _rss_bytes(),
+        "open_fds": _open_fds(),
+        "threads": threading.active_count(),
+    }
+
+
+def _collect_process_metrics() -> list[Family]:
+    stats = process_stats()
+    return [
+        Family(
+            "process_resident_memory_bytes",
+            "gauge",
+            "Resident memory size in bytes",
+            [({}, stats["rss_bytes"])],
+        ),
+        Family(
+            "process_open_fds",
+            "gauge",
+            "Open file descriptors",
+            [({}, stats["open_fds"])],
+        ),
+        Family(
+            "pdf2md_threads", "gauge", "Live Python threads", [({}, stats["threads"])]
+        ),
+    ]
+
+
+REGISTRY.add_collector("process", _collect_process_metrics)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass  # scrapes would flood the service log
+
+
+def start_metrics_server(
+    port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY
+) -> ThreadingHTTPServer:
+    """Serve registry at http://host:port/metrics from a daemon thread."""
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="pdf2md-metrics", daemon=True
+    ).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
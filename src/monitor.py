@@ -1,5 +1,7 @@
 import inspect
 import logging
+import os
+import queue
 import threading
 import time
 from collections.abc import Callable
@@ -8,52 +10,297 @@ from typing import Any
 
 from watchdog.events import FileSystemEvent, FileSystemEventHandler
 from watchdog.observers import Observer
+from watchdog.observers.api import BaseObserver
+
+from src.jobstore import FAILED, RUNNING, JobStore
+from src.metrics import REGISTRY, Family
+from src.scheduling import NORMAL, JobQueue, SchedulingPolicy
+from src.stability import StabilityTracker
+from src.tracing import TRACER
 
 logger = logging.getLogger("pdf2md.monitor")
 
 
 class PDFHandler(FileSystemEventHandler):
-    def __init__(self, callback: Callable[..., Any]) -> None:
+    """Turns filesystem events into queued PDF jobs.
+
+    Event handlers only enqueue; a fixed pool of worker threads drains the
+    bounded queue and runs the callback, so a slow conversion never blocks the
+    watchdog observer and a burst of files never spawns a thread per file.
+    With a SchedulingPolicy, queued files are handed out shortest (and
+    urgent) first instead of in arrival order. With a quiet_period, files are
+    only queued once a StabilityTracker has seen them finish being written,
+    so workers never sit waiting for a copy to complete. With a JobStore,
+    every job's progress is recorded there; the callback records the outcome
+    (a job it leaves running is marked failed).
+    """
+
+    def __init__(
+        self,
+        callback: Callable[..., Any],
+        num_workers: int = 2,
+        max_queue_size: int = 1000,
+        policy: SchedulingPolicy | None = None,
+        quiet_period: float | None = None,
+        max_stable_wait: float = 300.0,
+        jobs: JobStore | None = None,
+    ) -> None:
         super().__init__()
         self.callback = callback
         self.seen: set[Path] = set()
         self.lock = threading.Lock()
+        self.num_workers = max(1, num_workers)
+        self.policy = policy
+        self.jobs = jobs
+        # None is the shutdown sentinel for a worker
+        self.queue: JobQueue[Path | None] = JobQueue(
+            maxsize=max(0, max_queue_size),
+            aging=policy.aging if policy is not None else 0.0,
+        )
+        self._workers: list[threading.Thread] = []
+        self.busy = 0  # workers running the callback
+        # Unix times for each document's trace: when a file was first seen
+        # (until it is queued) and (first seen, queued) until a worker takes it
+        self._first_seen: dict[Path, float] = {}
+        self._queued_at: dict[Path, tuple[float, float]] = {}
+        self.stability = (
+            StabilityTracker(
+                self.enqueue, quiet_period, max_stable_wait, on_dropped=self._unseen
+            )
+            if quiet_period is not None
+            else None
+        )
+
+    def start_workers(self) -> None:
+        """Start the worker pool (idempotent)."""
+        if self.stability is not None:
+            self.stability.start()
+        if self._workers:
+            return
+        for i in range(self.num_workers):
+            worker = threading.Thread(
+                target=self._worker_loop, name=f"pdf2md-worker-{i + 1}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Started {self.num_workers} PDF worker(s)")
+
+    def stop_workers(self, timeout: float | None = None) -> None:
+        """Drop jobs that have not started yet and stop the worker pool.
+
+        Dropped PDFs stay in the input folder and are picked up on the next start.
+        Jobs already running are allowed to finish (up to timeout per worker).
+        """
+        if self.stability is not None:
+            self.stability.stop(timeout)
+        with self.lock:
+            # Files the tracker was still waiting on are forgotten with it
+            self._first_seen.clear()
+        dropped = 0
+        while True:
+            try:
+                path = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if path is not None:
+                dropped += 1
+                with self.lock:
+                    self.seen.discard(path)
+                    self._queued_at.pop(path, None)
+            self.queue.task_done()
+        if dropped:
+            logger.info(f"Dropped {dropped} queued PDF(s) on shutdown")
+        for _ in self._workers:
+            self.queue.put(None, priority=-1)
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def enqueue(self, path: Path, source: str = "new") -> bool:
+        """Queue path for processing unless it is already queued or in progress.
+
+        Blocks while the queue is full, which throttles producers instead of
+        buffering an unbounded backlog. Returns True if the path was queued.
+        """
+        now = time.time()
+        with self.lock:
+            if path in self.seen:
+                return False
+            self.seen.add(path)
+            self._queued_at[path] = (self._first_seen.pop(path, now), now)
+        if self.jobs is not None:
+            if self.jobs.abandoned(path):
+                logger.warning(f"Not queuing {path}: it was abandoned earlier")
+                with self.lock:
+                    # Not held: a corrected file under the same name can come in
+                    self.seen.discard(path)
+                    self._queued_at.pop(path, None)
+                return False
+            self.jobs.enqueued(path)
+        if self.policy is None:
+            logger.info(f"Queuing {source} PDF for processing: {path}")
+            self.queue.put(path)
+            return True
+        priority = self.policy.priority(path)
+        cost = self.policy.cost(path)
+        urgency = "" if priority == NORMAL else ", urgent"
+        logger.info(
+            f"Queuing {source} PDF for processing: {path} "
+            f"(about {cost:.0f} pages{urgency})"
+        )
+        self.queue.put(path, priority, cost)
+        return True
+
+    def _worker_loop(self) -> None:
+        while True:
+            path = self.queue.get()
+            try:
+                if path is None:
+                    return
+                if self.jobs is not None:
+                    self.jobs.started(path)
+                self._run_job(path)
+                if self.jobs is not None and self.jobs.status(path) == RUNNING:
+                    self.jobs.finished(path, FAILED, error="No result recorded")
+            finally:
+                self.queue.task_done()
+
+    def _run_job(self, path: Path) -> None:
+        now = time.time()
+        with self.lock:
+            self.busy += 1
+            first_seen, queued_at = self._queued_at.pop(path, (now, now))
+        try:
+            # The root of the document's trace; it starts when the file was seen
+            with TRACER.span("document", path=str(path)) as span:
+                span.start = first_seen
+                if queued_at > first_seen:
+                    TRACER.record("stability_wait", first_seen, queued_at)
+                TRACER.record("queue_wait", queued_at, now)
+                try:
+                    self.callback(str(path))
+                except Exception as e:
+                    logger.error(f"Error in callback for PDF {path}: {e}")
+                    span.error = str(e)
+                    if self.jobs is not None:
+                        self.jobs.finished(path, FAILED, error=str(e))
+                    # Remove from seen on callback error so it can be retried
+                    with self.lock:
+                        self.seen.discard(path)
+        finally:
+            with self.lock:
+                self.busy -= 1
+
+    def collect_metrics(self) -> list[Family]:
+        """Queue depth and worker state, for /metrics."""
+        with self.lock:
+            busy, tracked = self.busy, len(self.seen)
+            first_seen, queued_at = len(self._first_seen), len(self._queued_at)
+        families = [
+            Family(
+                "pdf2md_queue_depth",
+                "gauge",
+                "PDFs queued and waiting for a worker",
+                [({}, self.queue.qsize())],
+            ),
+            Family(
+                "pdf2md_documents_in_progress",
+                "gauge",
+                "PDFs being converted",
+                [({}, busy)],
+            ),
+            Family(
+                "pdf2md_workers",
+                "gauge",
+                "Size of the worker pool",
+                [({}, len(self._workers))],
+            ),
+            Family(
+                "pdf2md_tracked_files",
+                "gauge",
+                "PDFs queued or in progress (the handler's seen set)",
+                [({}, tracked)],
+            ),
+            Family(
+                "pdf2md_trace_timestamps",
+                "gauge",
+                "Files with arrival times kept for their trace, by table",
+                [
+                    ({"table": "first_seen"}, first_seen),
+                    ({"table": "queued_at"}, queued_at),
+                ],
+            ),
+        ]
+        if self.stability is not None:
+            families.append(
+                Family(
+                    "pdf2md_files_awaiting_stability",
+                    "gauge",
+                    "New PDFs waiting to finish being written",
+                    [({}, self.stability.pending())],
+                )
+            )
+        return families
+
+    def arrived(self, path: Path, source: str, complete: bool = False) -> None:
+        """A PDF appeared or changed; queue it now or once it is stable.
+
+        complete means the writer is known to be done with the file (it was
+        closed after writing or renamed into place).
+        """
+        if self.stability is None:
+            self.enqueue(path, source)
+            return
+        with self.lock:
+            if path in self.seen:
+                return  # already queued or being converted
+            self._first_seen.setdefault(path, time.time())
+        if complete:
+            self.stability.completed(path, source)
+        else:
+            self.stability.changed(path, source)
+
+    def removed(self, path: Path) -> None:
+        """Forget a PDF that is no longer in the input folder."""
+        with self.lock:
+            self.seen.discard(path)  # Remove from seen set when deleted
+        self._unseen(path)
+        if self.stability is not None:
+            self.stability.forget(path)
+
+    def _unseen(self, path: Path) -> None:
+        """Forget when a PDF that will not be queued (now) was first seen."""
+        with self.lock:
+            self._first_seen.pop(path, None)
 
     def on_deleted(self, event: FileSystemEvent) -> None:
         if not event.is_directory and str(event.src_path).endswith(".pdf"):
             path = Path(str(event.src_path))
-            with self.lock:
-                self.seen.discard(path)  # Remove from seen set when deleted
+            self.removed(path)
             logger.warning(f"PDF deleted before processing: {path}")
 
     def on_created(self, event: FileSystemEvent) -> None:
         if not event.is_directory and str(event.src_path).endswith(".pdf"):
-            path = Path(str(event.src_path))
-            with self.lock:
-                if path not in self.seen:
-                    self.seen.add(path)
-                    logger.info(f"Detected new PDF: {path}")
-                    try:
-                        self.callback(str(path))
-                    except Exception as e:
-                        logger.error(f"Error in callback for new PDF {path}: {e}")
-                        # Remove from seen on callback error so it can be retried
-                        self.seen.discard(path)
+            self.arrived(Path(str(event.src_path)), "new")
+
+    def on_modified(self, event: FileSystemEvent) -> None:
+        if self.stability is None or event.is_directory:
+            return
+        if str(event.src_path).endswith(".pdf"):
+            self.arrived(Path(str(event.src_path)), "new")
+
+    def on_closed(self, event: FileSystemEvent) -> None:
+        # Closed after writing (inotify only): the copy is done
+        if self.stability is None or event.is_directory:
+            return
+        if str(event.src_path).endswith(".pdf"):
+            self.arrived(Path(str(event.src_path)), "new", complete=True)
 
     def on_moved(self, event: FileSystemEvent) -> None:
-        # Handle renames/moves into the directory as well
+        # Handle renames/moves into the directory as well; a file renamed into
+        # place was written completely under another name first
         if not event.is_directory and str(event.dest_path).endswith(".pdf"):
-            path = Path(str(event.dest_path))
-            with self.lock:
-                if path not in self.seen:
-                    self.seen.add(path)
-                    logger.info(f"Detected moved PDF: {path}")
-                    try:
-                        self.callback(str(path))
-                    except Exception as e:
-                        logger.error(f"Error in callback for moved PDF {path}: {e}")
-                        # Remove from seen on callback error so it can be retried
-                        self.seen.discard(path)
+            self.arrived(Path(str(event.dest_path)), "moved", complete=True)
 
     def clear_seen_file(self, path: str) -> None:
         """Remove a file from the seen set after successful processing"""
@@ -61,42 +308,135 @@ class PDFHandler(FileSystemEventHandler):
             self.seen.discard(Path(path))
 
 
-def _process_existing_pdfs(
-    input_dir: Path, handler: PDFHandler, callback: Callable[[str], None]
-) -> None:
-    """Scan input directory for existing PDF files and queue them for processing."""
-    import threading
+class DirectoryPoller:
+    """Finds new PDFs by diffing directory listings, for network shares.
+
+    SMB and NFS mounts often don't deliver filesystem events for changes made
+    by other machines. The poller keeps an index of (size, mtime_ns) per PDF
+    and every interval seconds diffs it against an os.scandir listing, passing
+    new and changed PDFs to handler.arrived() and removed ones to
+    handler.removed(), the same path events take.
+
+    To stay cheap on folders with 100k+ entries, a directory is only listed
+    when its own mtime changed (files were added, removed or renamed), and only
+    new entries are stat'ed. Every full_scan_every polls all entries are
+    listed and stat'ed anyway, to catch files rewritten in place and changes
+    hidden by coarse mtime resolution.
+    """
 
+    def __init__(
+        self,
+        handler: PDFHandler,
+        directories: list[Path],
+        interval: float = 5.0,
+        full_scan_every: int = 12,
+    ) -> None:
+        self.handler = handler
+        self.directories = directories
+        self.interval = interval
+        self.full_scan_every = max(1, full_scan_every)
+        self.index: dict[Path, tuple[int, int]] = {}
+        self._dir_mtimes: dict[Path, int] = {}
+        self._polls = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Index the current contents, then poll in a background thread."""
+        for directory in self.directories:
+            self._scan(directory, full=True, report=False)
+        logger.info(
+            f"Polling {len(self.directories)} folder(s) every {self.interval}s "
+            f"({len(self.index)} PDFs indexed)"
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="pdf2md-poller", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self, timeout: float | None = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self) -> None:
+        """Diff every directory against the index once."""
+        self._polls += 1
+        full = self._polls % self.full_scan_every == 0
+        for directory in self.directories:
+            try:
+                self._scan(directory, full)
+            except OSError as e:
+                # Share unreachable: keep the index and try again next time
+                logger.warning(f"Could not list {directory}: {e}")
+
+    def _scan(self, directory: Path, full: bool, report: bool = True) -> None:
+        mtime = os.stat(directory).st_mtime_ns
+        if not full and self._dir_mtimes.get(directory) == mtime:
+            return
+        self._dir_mtimes[directory] = mtime
+        listed: set[Path] = set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".pdf"):
+                    continue
+                path = directory / entry.name
+                listed.add(path)
+                if not full and path in self.index:
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue  # removed while listing
+                signature = (st.st_size, st.st_mtime_ns)
+                old = self.index.get(path)
+                self.index[path] = signature
+                if report and old != signature:
+                    self.handler.arrived(path, "new" if old is None else "changed")
+        for path in [p for p in self.index if p.parent == directory]:
+            if path not in listed:
+                del self.index[path]
+                if report:
+                    self.handler.removed(path)
+
+
+def _resume_jobs(handler: PDFHandler, max_attempts: int) -> None:
+    """Queue the jobs the job store still had queued or running."""
+    if handler.jobs is None:
+        return
+    try:
+        paths = handler.jobs.unfinished(max_attempts)
+    except Exception as e:
+        logger.error(f"Could not read unfinished jobs: {e}")
+        return
+    if paths:
+        logger.info(f"Resuming {len(paths)} unfinished job(s) from the job store")
+    for path in paths:
+        handler.arrived(path, "resumed")
+
+
+def _process_existing_pdfs(input_dir: Path, handler: PDFHandler) -> None:
+    """Scan input directory for existing PDF files and queue them for processing."""
     try:
         existing_pdfs = list(input_dir.glob("*.pdf"))
+        if handler.policy is not None and handler.policy.priority_dir:
+            # Globbing a missing folder finds nothing
+            existing_pdfs += list(
+                (input_dir / handler.policy.priority_dir).glob("*.pdf")
+            )
         if existing_pdfs:
             logger.info(f"Found {len(existing_pdfs)} existing PDF files to process")
             for pdf_path in existing_pdfs:
                 if pdf_path.is_file():
-                    with handler.lock:
-                        if pdf_path not in handler.seen:
-                            handler.seen.add(pdf_path)
-                            logger.info(
-                                f"Queuing existing PDF for processing: {pdf_path}"
-                            )
-
-                            # Process each file in a separate thread to avoid blocking
-                            def process_file(file_path: str, path_obj: Path) -> None:
-                                try:
-                                    callback(file_path)
-                                except Exception as e:
-                                    logger.error(
-                                        f"Error processing existing PDF {file_path}: {e}"
-                                    )
-                                    # Remove from seen on callback error so it can be retried
-                                    with handler.lock:
-                                        handler.seen.discard(path_obj)
-
-                            thread = threading.Thread(
-                                target=process_file, args=(str(pdf_path), pdf_path)
-                            )
-                            thread.daemon = True
-                            thread.start()
+                    handler.arrived(pdf_path, "existing")
         else:
             logger.info("No existing PDF files found in input directory")
     except Exception as e:
@@ -108,10 +448,28 @@ def monitor_folder(
     callback: Callable[..., Any],
     stop_event: threading.Event | None = None,
     poll_interval: float = 1.0,
+    num_workers: int = 2,
+    max_queue_size: int = 1000,
+    policy: SchedulingPolicy | None = None,
+    quiet_period: float | None = None,
+    scan_interval: float | None = None,
+    jobs: JobStore | None = None,
+    max_attempts: int = 3,
 ) -> None:
     """
     Watches input_dir for new PDF files and calls callback(path) for each new file.
     Also processes any existing PDF files in the directory on startup.
+    Callbacks run on a pool of num_workers threads fed by a queue holding at most
+    max_queue_size pending files, ordered by policy if one is given (in which
+    case its priority subfolder is watched as well, if it exists at startup).
+    With a quiet_period, files are queued only once they have finished being
+    written (see StabilityTracker); otherwise the callback has to wait for that
+    itself. With a scan_interval, the folders are polled (see DirectoryPoller)
+    instead of relying on native filesystem events. With a job store, jobs it
+    still had queued or running are queued again first, before the folder is
+    scanned for PDFs that arrived while the service was stopped; jobs the
+    service died during max_attempts times are given up on. Jobs still in
+    flight when it stops are marked interrupted, which doesn't count.
     If stop_event is provided, stops when set.
     """
     input_dir = Path(input_dir)
@@ -129,17 +487,34 @@ def monitor_folder(
             # Old signature: callback(path)
             callback(path)
 
-    handler = PDFHandler(wrapped_callback)
+    handler = PDFHandler(
+        wrapped_callback, num_workers, max_queue_size, policy, quiet_period, jobs=jobs
+    )
     handler_ref["handler"] = handler
+    handler.start_workers()
+    REGISTRY.add_collector("monitor", handler.collect_metrics)
 
-    # Process existing PDF files before starting file system monitoring
-    _process_existing_pdfs(input_dir, handler, wrapped_callback)
-
-    observer = Observer()
-    observer.schedule(handler, str(input_dir), recursive=False)
+    directories = [input_dir]
+    if policy is not None and policy.priority_dir:
+        # Only an existing one: the input folder is often a shared folder that
+        # is not ours to add folders to
+        priority_dir = input_dir / policy.priority_dir
+        if priority_dir.is_dir():
+            directories.append(priority_dir)
+    observer: BaseObserver | DirectoryPoller
+    if scan_interval is not None:
+        observer = DirectoryPoller(handler, directories, scan_interval)
+    else:
+        observer = Observer()
+        for directory in directories:
+            observer.schedule(handler, str(directory), recursive=False)
     observer.start()
     logger.info(f"Started monitoring folder: {input_dir}")
     try:
+        # Queue existing PDFs after the observer is running, so files that arrive
+        # while a large backlog is being queued are not missed.
+        _resume_jobs(handler, max_attempts)
+        _process_existing_pdfs(input_dir, handler)
         while True:
             if stop_event and stop_event.is_set():
                 logger.info("Stop event set, stopping folder monitor.")
@@ -151,4 +526,16 @@ def monitor_folder(
     finally:
         observer.stop()
         observer.join()
+        handler.stop_workers(timeout=30)
+        if jobs is not None:
+            try:
+                interrupted = jobs.interrupted()
+            except Exception as e:
+                logger.error(f"Could not mark interrupted jobs: {e}")
+            else:
+                if interrupted:
+                    logger.info(
+                        f"{interrupted} job(s) interrupted; resuming on restart"
+                    )
+        REGISTRY.remove_collector("monitor")
         logger.info(f"Stopped monitoring folder: {input_dir}")
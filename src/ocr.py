@@ -1,71 +1,352 @@
 import asyncio
+import concurrent.futures
 import json
 import logging
+import random
+import threading
+from collections import Counter
+from collections.abc import Awaitable, Callable, Collection
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any
 
-from openai import APIConnectionError, APIError, APITimeoutError, OpenAI
-from pypdf import PdfReader
+from openai import APIConnectionError, APIError, APITimeoutError, AsyncOpenAI
+
+from src.cache import PageCache
+from src.checkpoint import CheckpointStore
+from src.concurrency import PageScheduler
+from src.dedupe import file_sha256
+from src.endpoints import EndpointPool, EndpointSpec
+from src.metrics import ERRORS, PAGES, REGISTRY, STAGE_SECONDS, Family
+from src.render import PageRenderer
+from src.session import DocumentSession
+from src.text_layer import extract_text_layer_pages
+from src.tracing import TRACER, Span, current_span
+from src.writer import MarkdownStreamWriter, page_separator
 
 logger = logging.getLogger("pdf2md.ocr")
 
+# Every failed page is rendered as a bold placeholder starting with this marker
+ERROR_MARKER = "**[ERROR"
+
+# Attempts per page before it gets an error placeholder
+PAGE_MAX_RETRIES = 3
+
+
+def has_error_markers(markdown: str) -> bool:
+    """True if markdown contains an OCR error placeholder for at least one page."""
+    return ERROR_MARKER in markdown
+
+
+# Retry jitter only; SystemRandom keeps bandit's B311 quiet without a nosec
+_JITTER = random.SystemRandom()
+
+
+def _backoff_delay(attempt: int, base: float = 2.0, cap: float = 30.0) -> float:
+    """Exponential backoff for retry `attempt` (1-based) with jitter, so pages that
+    failed together don't all hit LM Studio again at the same instant."""
+    delay = min(cap, base * 2.0 ** (attempt - 1))
+    return delay / 2 + _JITTER.uniform(0, delay / 2)
+
+
+@dataclass
+class PageResult:
+    """How one page of a document was converted."""
+
+    page: int
+    source: str  # 'ocr', 'text-layer', or the source of a checkpointed page
+    ok: bool
+    seconds: float  # time spent converting it (0 for restored pages)
+    chars: int
+
+
+@dataclass
+class DocumentResult:
+    """Outcome of OCR'ing one PDF into a markdown file."""
+
+    output_path: Path
+    num_pages: int
+    page_failures: int
+    error: str | None = None  # set when the PDF itself could not be read
+    pages: list[PageResult] = field(default_factory=list)
+
+    @property
+    def clean(self) -> bool:
+        """True if every page converted without an error placeholder."""
+        return self.error is None and self.page_failures == 0
+
 
 class OcrProcessor:
     def __init__(
-        self, base_url: str, api_key: str, model_name: str, timeout: int = 120
+        self,
+        base_url: str,
+        api_key: str,
+        model_name: str,
+        timeout: int = 120,
+        page_concurrency: int = 1,
+        cache_dir: str = "",
+        cache_max_bytes: int = 1024 * 1024 * 1024,
+        text_layer_threshold: float = 0.0,
+        checkpoint_dir: str = "",
+        endpoints: tuple[EndpointSpec, ...] = (),
+        endpoint_failure_threshold: int = 3,
+        endpoint_probe_interval: float = 30.0,
+        adaptive_max_concurrency: int = 0,
+        latency_target: float = 60.0,
+        render_workers: int = 0,
+        read_ahead: int = 0,
+        image_dims: tuple[int, ...] = (1024,),
+        anchor_text_len: int = 6000,
+        min_result_chars: int = 25,
+        page_slots: int = 0,
+        circuit_breaker: bool = False,
+        circuit_max_outage: float = 0.0,
     ):
         self.base_url = base_url
         self.api_key = api_key
         self.model_name = model_name
         self.timeout = timeout
-        self.client = OpenAI(base_url=base_url, api_key=api_key, timeout=timeout)
+        # Upper bound on pages of a single PDF sent to LM Studio at the same time
+        self.page_concurrency = max(1, page_concurrency)
+        # With page_slots > 0, pages of every document share that many inference
+        # slots round-robin, replacing the per-document page_concurrency bound.
+        self.scheduler = PageScheduler(page_slots) if page_slots > 0 else None
+        # Optional content-addressed cache of page results (disabled if no dir)
+        self.cache = PageCache(cache_dir, cache_max_bytes) if cache_dir else None
+        # Pages whose embedded text scores at least this skip the model (0 = off)
+        self.text_layer_threshold = text_layer_threshold
+        # Page requests are spread over one or more LM Studio servers (base_url
+        # alone if no endpoints are given); retries stay in process_page.
+        if circuit_breaker and endpoint_failure_threshold > PAGE_MAX_RETRIES:
+            # Otherwise a page spends all its attempts before the circuit opens
+            logger.warning(
+                f"Endpoint failure threshold {endpoint_failure_threshold} is above "
+                f"the {PAGE_MAX_RETRIES} attempts per page; using "
+                f"{PAGE_MAX_RETRIES} so the circuit breaker opens in time"
+            )
+            endpoint_failure_threshold = PAGE_MAX_RETRIES
+        self.pool = EndpointPool(
+            endpoints or (EndpointSpec(base_url),),
+            api_key,
+            timeout,
+            failure_threshold=endpoint_failure_threshold,
+            probe_interval=endpoint_probe_interval,
+            adaptive_max_concurrency=adaptive_max_concurrency,
+            latency_target=latency_target,
+            circuit_breaker=circuit_breaker,
+            probe_model=model_name,
+            max_outage=circuit_max_outage,
+        )
+        # Page rendering runs in its own process pool when render_workers > 0,
+        # and up to read_ahead rendered pages per document wait for inference.
+        self.renderer = PageRenderer(render_workers)
+        self.read_ahead = max(0, read_ahead)
+        # Image resolutions (longest side, px) tried in order, cheapest first;
+        # a page only moves up a step when its result looks poor.
+        self.image_dims = tuple(sorted(set(image_dims))) or (1024,)
+        self.anchor_text_len = anchor_text_len
+        self.min_result_chars = min_result_chars
+        # Optional per-page checkpoints so interrupted documents can resume;
+        # pages saved under other settings than these are not reused.
+        self.checkpoints = (
+            CheckpointStore(
+                checkpoint_dir,
+                settings={
+                    "model": model_name,
+                    "image_dims": self.image_dims,
+                    "anchor_text_len": anchor_text_len,
+                    "min_result_chars": min_result_chars,
+                    "text_layer_threshold": text_layer_threshold,
+                },
+            )
+            if checkpoint_dir
+            else None
+        )
+        self.resolution_stats: dict[str, Counter[Any]] = {
+            "pages": Counter(),  # final resolution of each OCR'd page
+            "escalations": Counter(),  # why pages were re-run higher
+        }
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Client of the first (or only) endpoint."""
+        return self.pool.endpoints[0].client
+
+    def metrics_snapshot(self) -> dict[str, Any]:
+        """Copies of the state /metrics reports; call on the thread running
+        this processor's loop, which is the one changing that state."""
+        return {
+            "endpoints": self.pool.stats(),
+            "circuit_open": (
+                self.pool.circuit_open if self.pool.circuit_breaker else None
+            ),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "slots": (
+                (self.scheduler.in_use, self.scheduler.waiting())
+                if self.scheduler is not None
+                else None
+            ),
+            "escalations": dict(self.resolution_stats["escalations"]),
+        }
 
     async def process_page(
-        self, pdf_path: str, page_num: int, max_retries: int = 3
+        self,
+        pdf_path: str,
+        page_num: int,
+        max_retries: int = PAGE_MAX_RETRIES,
+        prepared_query: dict[str, Any] | None = None,
+        session: DocumentSession | None = None,
     ) -> str | None:
-        """OCR a single page, return markdown or None on error. Retries transient errors."""
+        """OCR a single page, return markdown or None on error. Retries transient errors.
+
+        The page is first sent at the cheapest image resolution in image_dims
+        and re-run one step higher only while the result looks poor (no
+        natural_text, invalid JSON, or shorter than min_result_chars).
+        prepared_query, if given, was rendered by the render stage at the
+        first resolution.
+        """
+        fallback: str | None = None
+        md: str | None = None
+        for step, image_dim in enumerate(self.image_dims):
+            md, poor = await self._process_page_at(
+                pdf_path,
+                page_num,
+                image_dim,
+                max_retries,
+                prepared_query if step == 0 else None,
+                session,
+            )
+            if md is not None and not md.startswith(ERROR_MARKER):
+                fallback = md
+            if poor is None or step == len(self.image_dims) - 1:
+                self.resolution_stats["pages"][image_dim] += 1
+                break
+            next_dim = self.image_dims[step + 1]
+            self.resolution_stats["escalations"][poor] += 1
+            logger.info(
+                f"Page {page_num} of {pdf_path} looks poor at {image_dim}px ({poor}); "
+                f"retrying at {next_dim}px"
+            )
+        if md is None or md.startswith(ERROR_MARKER):
+            # A weak result at a lower resolution beats an error at a higher one
+            return fallback if fallback is not None else md
+        return md
+
+    async def _process_page_at(
+        self,
+        pdf_path: str,
+        page_num: int,
+        image_dim: int,
+        max_retries: int,
+        query: dict[str, Any] | None,
+        session: DocumentSession | None,
+    ) -> tuple[str | None, str | None]:
+        """OCR a page at one image resolution.
+
+        Returns the markdown (or error placeholder) and, if the result looks
+        like the resolution was too low, the reason. The page is rendered once
+        (by the session, if given) and retries resend the same query.
+        """
         import time
 
-        delay = 2
-        for attempt in range(1, max_retries + 1):
+        attempt = 0
+        while attempt < max_retries:
+            attempt += 1
             start_time = time.time()
+            outage = False
             try:
-                from olmocr.pipeline import build_page_query
-
-                query = await build_page_query(
-                    pdf_path,
-                    page=page_num,
-                    target_longest_image_dim=1024,
-                    target_anchor_text_len=6000,
-                )
+                if query is None:
+                    if session is not None:
+                        query = await session.query(
+                            page_num, image_dim, self.anchor_text_len
+                        )
+                    else:
+                        query = await self.renderer.build_query(
+                            pdf_path,
+                            page_num,
+                            target_longest_image_dim=image_dim,
+                            target_anchor_text_len=self.anchor_text_len,
+                        )
                 query["model"] = self.model_name
-                response = self.client.chat.completions.create(**query)
+                cache_key = None
+                if self.cache is not None:
+                    # Hashing the page image and the cache's file I/O (maybe
+                    # on a share) would stall every other page on the loop
+                    cache_key = await asyncio.to_thread(
+                        self.cache.make_key, query, self.model_name
+                    )
+                    cached = await asyncio.to_thread(self.cache.get, cache_key)
+                    if cached is not None:
+                        logger.info(f"OCR cache hit for page {page_num} of {pdf_path}")
+                        if (span := current_span()) is not None:
+                            span.set(cache="hit")
+                        return cached, self._short_result(cached)
+                if self.pool.circuit_open:
+                    # LM Studio is down: wait for it rather than fail the page
+                    with TRACER.span("circuit_wait"):
+                        endpoint = await self.pool.acquire()
+                else:
+                    endpoint = await self.pool.acquire()
+                error: BaseException | None = None
+                sent = time.monotonic()
+                try:
+                    with TRACER.span(
+                        "request",
+                        endpoint=endpoint.url,
+                        attempt=attempt,
+                        image_dim=image_dim,
+                    ):
+                        response = await endpoint.client.chat.completions.create(
+                            **query
+                        )
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    outage = await self.pool.release(endpoint, error, sent)
+                    STAGE_SECONDS.observe(time.monotonic() - sent, stage="inference")
                 duration = time.time() - start_time
                 logger.info(
-                    f"OCR page {page_num} took {duration:.2f}s (attempt {attempt})"
+                    f"OCR page {page_num} took {duration:.2f}s on {endpoint.url} "
+                    f"(attempt {attempt})"
                 )
                 if response is None:
+                    ERRORS.inc(type="empty_response")
                     logger.error(
                         f"LM Studio API returned None for page {page_num} of {pdf_path}. Query: {query}"
                     )
                     return (
-                        f"**[ERROR: LM Studio API returned None for page {page_num}]**"
+                        f"**[ERROR: LM Studio API returned None for page {page_num}]**",
+                        None,
                     )
                 if not hasattr(response, "choices") or not response.choices:
+                    ERRORS.inc(type="missing_choices")
                     logger.error(
                         f"LM Studio API response missing 'choices' for page {page_num} of {pdf_path}. Response: {response}"
                     )
-                    return f"**[ERROR: LM Studio API response missing 'choices' for page {page_num}]**"
+                    return (
+                        f"**[ERROR: LM Studio API response missing 'choices' for page {page_num}]**",
+                        None,
+                    )
                 choice = response.choices[0]
                 if not hasattr(choice, "message") or not hasattr(
                     choice.message, "content"
                 ):
+                    ERRORS.inc(type="missing_content")
                     logger.error(
                         f"LM Studio API response missing 'message.content' for page {page_num} of {pdf_path}. Response: {response}"
                     )
-                    return f"**[ERROR: LM Studio API response missing 'message.content' for page {page_num}]**"
-                model_obj = json.loads(choice.message.content)
+                    return (
+                        f"**[ERROR: LM Studio API response missing 'message.content' for page {page_num}]**",
+                        None,
+                    )
+                with STAGE_SECONDS.time(stage="parse"), TRACER.span("parse"):
+                    model_obj = json.loads(choice.message.content)
                 if "natural_text" in model_obj and model_obj["natural_text"]:
-                    return str(model_obj["natural_text"]).strip()
+                    text = str(model_obj["natural_text"]).strip()
+                    if self.cache is not None and cache_key is not None:
+                        await asyncio.to_thread(self.cache.put, cache_key, text)
+                    return text, self._short_result(text)
                 elif "natural_text" in model_obj and model_obj["natural_text"] is None:
                     # Handle case where model classifies page as diagram but might contain extractable text
                     # Log the classification but attempt to provide useful information
@@ -87,77 +368,601 @@ class OcrProcessor:
                     logger.warning(
                         f"Page {page_num} classified as {classification_str} with no extractable text - this might be a misclassification for forms or structured documents"
                     )
-                    return f"**[Page {page_num}: Classified as {classification_str} - no text extracted. This may be a form or structured document that requires manual review.]**"
+                    return (
+                        f"**[Page {page_num}: Classified as {classification_str} - no text extracted. This may be a form or structured document that requires manual review.]**",
+                        "no natural_text",
+                    )
                 else:
+                    ERRORS.inc(type="missing_natural_text")
                     logger.error(
                         f"LM Studio API response JSON missing 'natural_text' for page {page_num} of {pdf_path}. JSON: {model_obj}"
                     )
-                    return f"**[ERROR: LM Studio API response JSON missing 'natural_text' for page {page_num}]**"
+                    return (
+                        f"**[ERROR: LM Studio API response JSON missing 'natural_text' for page {page_num}]**",
+                        None,
+                    )
             except (APITimeoutError, APIConnectionError, APIError) as e:
+                ERRORS.inc(type=type(e).__name__)
+                if outage:
+                    # The outage, not this page, is to blame: don't spend an
+                    # attempt; the next one waits until LM Studio is back.
+                    # Failures on trial after a probe do count, so a page
+                    # that always fails still runs out of attempts
+                    logger.warning(
+                        f"LM Studio is down (page {page_num} of {pdf_path}: {e}); "
+                        "the page waits for it to come back"
+                    )
+                    attempt -= 1
+                    continue
                 logger.warning(
                     f"Transient error on page {page_num} (attempt {attempt}/{max_retries}): {e}"
                 )
                 if attempt < max_retries:
-                    time.sleep(delay)
-                    delay *= 2  # Exponential backoff
+                    await asyncio.sleep(_backoff_delay(attempt))
                     continue
                 else:
                     logger.error(
                         f"Max retries exceeded for page {page_num} of {pdf_path}"
                     )
-                    return f"**[ERROR: Max retries exceeded for page {page_num}]**"
+                    return (
+                        f"**[ERROR: Max retries exceeded for page {page_num}]**",
+                        None,
+                    )
             except json.JSONDecodeError as e:
+                ERRORS.inc(type="invalid_json")
                 logger.error(
                     f"Failed to parse LM Studio API response as JSON for page {page_num} of {pdf_path}: {e}."
                 )
-                return f"**[ERROR: LM Studio API response not valid JSON for page {page_num}]**"
+                return (
+                    f"**[ERROR: LM Studio API response not valid JSON for page {page_num}]**",
+                    "invalid JSON",
+                )
             except Exception as e:
+                ERRORS.inc(type=type(e).__name__)
                 logger.error(f"Failed to OCR page {page_num} of {pdf_path}: {e}")
-                return f"**[ERROR: Exception during OCR page {page_num}: {e}]**"
+                return f"**[ERROR: Exception during OCR page {page_num}: {e}]**", None
+        return None, None
+
+    def _short_result(self, text: str) -> str | None:
+        if len(self.image_dims) > 1 and len(text) < self.min_result_chars:
+            return "short result"
         return None
 
-    async def process_pdf_to_markdown(
-        self, pdf_path: str, delimiter: str = "delimited"
-    ) -> str:
+    async def _ocr_document(
+        self,
+        session: DocumentSession,
+        doc_hash: str | None,
+        emit: Callable[[int, str], Awaitable[None]],
+        only: Collection[int] | None = None,
+    ) -> list[PageResult]:
+        """OCR every page of an open document (or just the pages in only),
+        awaiting emit(page_num, markdown) as each page finishes (in completion
+        order). Returns the result of every page, in completion order.
+
+        With checkpointing enabled, pages already checkpointed for doc_hash (the
+        PDF's content hash, computed if not given) are reused instead of OCR'd,
+        and every newly finished page is checkpointed immediately.
+        """
         import time
 
-        pdf_path_obj = Path(pdf_path)
-        try:
-            with open(pdf_path_obj, "rb") as pdf_file:
-                reader = PdfReader(pdf_file)
-                num_pages = len(reader.pages)
-        except Exception as e:
-            logger.error(f"Failed to read PDF {pdf_path}: {e}")
-            return f"**[ERROR: Failed to read PDF {pdf_path}: {e}]**"
+        pdf_path = session.pdf_path
+        num_pages = session.page_count
+        text_pages: dict[int, str] = {}
+        if self.text_layer_threshold > 0:
+            try:
+                # pypdf parsing is CPU-bound; keep it off the shared event loop
+                with TRACER.span("text_layer"):
+                    text_pages = await asyncio.to_thread(
+                        extract_text_layer_pages,
+                        session.local_path,
+                        self.text_layer_threshold,
+                        session.reader,
+                        only,
+                    )
+            except Exception as e:
+                logger.warning(f"Text layer scoring failed for {pdf_path}: {e}")
+
+        checkpointed: dict[int, tuple[str, str]] = {}
+        if self.checkpoints is not None:
+            try:
+                if doc_hash is None:
+                    doc_hash = await asyncio.to_thread(file_sha256, session.local_path)
+                checkpointed = await asyncio.to_thread(self.checkpoints.load, doc_hash)
+            except Exception as e:
+                logger.warning(f"Could not load checkpoints for {pdf_path}: {e}")
+            if checkpointed:
+                logger.info(
+                    f"Resuming {pdf_path}: {len(checkpointed)} of {num_pages} pages "
+                    "restored from checkpoint"
+                )
 
-        markdown_chunks: list[str] = []
         page_failures = 0
+        results: list[PageResult] = []
+
+        async def finish(
+            page_num: int, md: str | None, source: str, seconds: float = 0.0
+        ) -> None:
+            nonlocal page_failures
+            ok = md is not None and not md.startswith(ERROR_MARKER)
+            results.append(PageResult(page_num, source, ok, seconds, len(md or "")))
+            PAGES.inc(source=source, result="ok" if ok else "error")
+            if md is None or md.startswith(ERROR_MARKER):
+                md = md or f"**[ERROR: Failed to OCR page {page_num}]**"
+                page_failures += 1
+            elif (
+                self.checkpoints is not None
+                and doc_hash is not None
+                and page_num not in checkpointed
+            ):
+                await asyncio.to_thread(
+                    self.checkpoints.save_page, doc_hash, page_num, md, source
+                )
+            if self.text_layer_threshold > 0:
+                # Record which path produced each page so the savings are measurable
+                md = f"<!-- page {page_num}: {source} -->\n{md}"
+            await emit(page_num, md)
+
         total_start = time.time()
+        wanted = set(range(1, num_pages + 1) if only is None else only)
+        for page_num in sorted(checkpointed.keys() & wanted):
+            text, source = checkpointed[page_num]
+            await finish(page_num, text, source)
+        ocr_pages: list[int] = []
         for page_num in range(1, num_pages + 1):
-            page_start = time.time()
-            md = await self.process_page(str(pdf_path), page_num)
-            page_time = time.time() - page_start
-            if md is not None and not md.startswith("**[ERROR"):
-                markdown_chunks.append(md)
+            if page_num not in wanted or page_num in checkpointed:
+                continue
+            if page_num in text_pages:
+                await finish(page_num, text_pages[page_num], "text-layer")
             else:
-                markdown_chunks.append(
-                    md or f"**[ERROR: Failed to OCR page {page_num}]**"
-                )
-                page_failures += 1
-            logger.info(f"Page {page_num} processed in {page_time:.2f}s")
+                ocr_pages.append(page_num)
+
+        # Render stage -> bounded buffer -> inference stage. With read-ahead the
+        # render stage builds queries for upcoming pages while earlier pages are
+        # being inferred; without it, pages are queued unrendered and
+        # process_page renders each one itself.
+        buffer: asyncio.Queue[tuple[int, dict[str, Any] | None, Span] | None] = (
+            asyncio.Queue(maxsize=max(1, self.read_ahead))
+        )
+        pending = iter(ocr_pages)
+        slots = self.scheduler.slots if self.scheduler else self.page_concurrency
+        consumers = min(slots, len(ocr_pages))
+
+        async def render_stage() -> None:
+            for page_num in pending:
+                # Spans the page from rendering to its result being written
+                page_span = TRACER.start_span("page", page=page_num)
+                query: dict[str, Any] | None = None
+                if self.read_ahead > 0:
+                    try:
+                        with TRACER.activate(page_span):
+                            query = await session.query(
+                                page_num, self.image_dims[0], self.anchor_text_len
+                            )
+                    except Exception as e:
+                        # process_page renders it again and reports the error
+                        logger.warning(
+                            f"Could not pre-render page {page_num} of {pdf_path}: {e}"
+                        )
+                await buffer.put((page_num, query, page_span))
+
+        async def producer() -> None:
+            renderers = self.renderer.workers if self.read_ahead > 0 else 1
+            await asyncio.gather(*(render_stage() for _ in range(max(1, renderers))))
+            for _ in range(consumers):
+                await buffer.put(None)
+
+        async def inference_stage() -> None:
+            while (item := await buffer.get()) is not None:
+                page_num, query, page_span = item
+                error: BaseException | None = None
+                try:
+                    with TRACER.activate(page_span):
+                        if self.scheduler is not None:
+                            # Wait for this document's turn at a shared inference slot
+                            with TRACER.span("slot_wait"):
+                                await self.scheduler.acquire(session)
+                        page_start = time.time()
+                        try:
+                            md = await self.process_page(
+                                pdf_path,
+                                page_num,
+                                prepared_query=query,
+                                session=session,
+                            )
+                        finally:
+                            session.release(page_num)
+                            if self.scheduler is not None:
+                                self.scheduler.release()
+                        page_time = time.time() - page_start
+                        logger.info(f"Page {page_num} processed in {page_time:.2f}s")
+                        page_span.set(
+                            ok=md is not None and not md.startswith(ERROR_MARKER)
+                        )
+                        await finish(page_num, md, "ocr", page_time)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    TRACER.end_span(page_span, error)
+
+        if ocr_pages:
+            tasks = [asyncio.create_task(producer())] + [
+                asyncio.create_task(inference_stage()) for _ in range(consumers)
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
         total_time = time.time() - total_start
         logger.info(
             f"OCR for {pdf_path} completed: {num_pages} pages in {total_time:.2f}s ({page_failures} errors)"
         )
-        if page_failures == num_pages:
-            markdown_chunks.insert(
-                0, f"**[ERROR: All {num_pages} pages failed OCR for {pdf_path}]**\n"
+        if self.text_layer_threshold > 0:
+            logger.info(
+                f"Text layer fast path for {pdf_path}: {len(text_pages)} of "
+                f"{num_pages} pages skipped the model"
+            )
+        if self.cache is not None:
+            stats = self.cache.stats()
+            logger.info(
+                f"Page cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['entries']} entries ({stats['bytes'] / 1_048_576:.1f} MB)"
             )
-        if delimiter == "delimited":
-            sep = "\n\n---\n\n"
-            return sep.join(markdown_chunks)
-        else:
-            return "\n\n".join(markdown_chunks)
+        if len(self.image_dims) > 1:
+            pages = self.resolution_stats["pages"]
+            escalations = self.resolution_stats["escalations"]
+            by_dim = ", ".join(f"{pages[dim]} at {dim}px" for dim in self.image_dims)
+            reasons = ", ".join(f"{n} {why}" for why, n in escalations.most_common())
+            logger.info(
+                f"Image resolution so far: {by_dim}; "
+                f"{sum(escalations.values())} escalations"
+                + (f" ({reasons})" if reasons else "")
+            )
+        if len(self.pool.endpoints) > 1 or self.pool.endpoints[0].limiter:
+            usage = ", ".join(
+                f"{e['url']} {e['requests']} requests"
+                + (f", limit {e['limit']}" if e["limit"] else "")
+                + ("" if e["healthy"] else " (out of rotation)")
+                for e in self.pool.stats()
+            )
+            logger.info(f"LM Studio endpoints: {usage}")
+        return results
+
+    @staticmethod
+    def _all_failed_header(pdf_path: str, num_pages: int) -> str:
+        return f"**[ERROR: All {num_pages} pages failed OCR for {pdf_path}]**\n"
+
+    async def process_pdf_to_markdown(
+        self, pdf_path: str, delimiter: str = "delimited", doc_hash: str | None = None
+    ) -> str:
+        """OCR every page of pdf_path and return the assembled markdown.
+
+        Holds the whole document in memory; the service uses
+        process_pdf_to_file instead, which streams pages to disk.
+        """
+        session = DocumentSession(pdf_path, self.renderer)
+        try:
+            with TRACER.span("open"):
+                await session.open()
+        except Exception as e:
+            logger.error(f"Failed to read PDF {pdf_path}: {e}")
+            return f"**[ERROR: Failed to read PDF {pdf_path}: {e}]**"
+
+        chunks: dict[int, str] = {}
+
+        async def collect(page_num: int, md: str) -> None:
+            chunks[page_num] = md
+
+        try:
+            results = await self._ocr_document(session, doc_hash, collect)
+        finally:
+            await session.close()
+        num_pages = session.page_count
+        markdown_chunks = [chunks[page_num] for page_num in range(1, num_pages + 1)]
+        if sum(not r.ok for r in results) == num_pages:
+            markdown_chunks.insert(0, self._all_failed_header(pdf_path, num_pages))
+        return page_separator(delimiter).join(markdown_chunks)
+
+    async def process_pages(
+        self, pdf_path: str, pages: Collection[int], doc_hash: str | None = None
+    ) -> dict[int, str]:
+        """OCR only the given pages of pdf_path.
+
+        Returns each page's markdown exactly as process_pdf_to_file would have
+        written it (error placeholders included), for splicing into an
+        existing output. Raises if the PDF cannot be read.
+        """
+        session = DocumentSession(pdf_path, self.renderer)
+        with TRACER.span("open"):
+            await session.open()
+        chunks: dict[int, str] = {}
+
+        async def collect(page_num: int, md: str) -> None:
+            chunks[page_num] = md
+
+        try:
+            await self._ocr_document(session, doc_hash, collect, only=pages)
+        finally:
+            await session.close()
+        return chunks
+
+    async def process_pdf_to_file(
+        self,
+        pdf_path: str,
+        output_path: str | Path,
+        delimiter: str = "delimited",
+        doc_hash: str | None = None,
+    ) -> DocumentResult:
+        """OCR pdf_path straight into output_path.
+
+        Pages are streamed, in page order, into a temp file next to output_path
+        as soon as they finish, and the temp file is renamed into place only
+        once the whole document is done. Nothing is written to output_path if
+        OCR is interrupted or raises.
+        """
+        writer = await asyncio.to_thread(MarkdownStreamWriter, output_path, delimiter)
+        session = DocumentSession(pdf_path, self.renderer)
+        try:
+            try:
+                with TRACER.span("open"):
+                    await session.open()
+            except Exception as e:
+                logger.error(f"Failed to read PDF {pdf_path}: {e}")
+                await asyncio.to_thread(
+                    writer.add_page,
+                    1,
+                    f"**[ERROR: Failed to read PDF {pdf_path}: {e}]**",
+                )
+                await asyncio.to_thread(writer.commit)
+                return DocumentResult(
+                    output_path=Path(output_path),
+                    num_pages=0,
+                    page_failures=0,
+                    error=str(e),
+                )
+
+            async def write(page_num: int, md: str) -> None:
+                with STAGE_SECONDS.time(stage="write"), TRACER.span("write"):
+                    await asyncio.to_thread(writer.add_page, page_num, md)
+
+            results = await self._ocr_document(session, doc_hash, write)
+            page_failures = sum(not r.ok for r in results)
+            num_pages = session.page_count
+            header = (
+                self._all_failed_header(pdf_path, num_pages)
+                if page_failures == num_pages
+                else None
+            )
+            with STAGE_SECONDS.time(stage="write"), TRACER.span("commit"):
+                await asyncio.to_thread(writer.commit, header)
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            await session.close()
+        return DocumentResult(
+            output_path=Path(output_path),
+            num_pages=num_pages,
+            page_failures=page_failures,
+            pages=sorted(results, key=lambda r: r.page),
+        )
+
+
+class OcrEngine:
+    """Long-lived OCR worker shared by all documents.
+
+    Owns one event loop running on a background thread and one OcrProcessor, so
+    every PDF reuses the same endpoint pool and its AsyncOpenAI clients (and
+    their keep-alive connections) instead of paying client and loop startup per document.
+    submit() may be called from any thread.
+    """
+
+    def __init__(self, processor: OcrProcessor) -> None:
+        self.processor = processor
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="pdf2md-ocr-engine", daemon=True
+        )
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(
+        self, pdf_path: str, delimiter: str = "delimited", doc_hash: str | None = None
+    ) -> concurrent.futures.Future[str]:
+        """Schedule OCR of pdf_path on the engine loop and return a future for the markdown."""
+        if self._closed:
+            raise RuntimeError("OcrEngine is closed")
+        return asyncio.run_coroutine_threadsafe(
+            self.processor.process_pdf_to_markdown(
+                pdf_path, delimiter=delimiter, doc_hash=doc_hash
+            ),
+            self._loop,
+        )
+
+    def submit_to_file(
+        self,
+        pdf_path: str,
+        output_path: str | Path,
+        delimiter: str = "delimited",
+        doc_hash: str | None = None,
+    ) -> concurrent.futures.Future[DocumentResult]:
+        """Schedule OCR of pdf_path into output_path on the engine loop."""
+        if self._closed:
+            raise RuntimeError("OcrEngine is closed")
+        return asyncio.run_coroutine_threadsafe(
+            self.processor.process_pdf_to_file(
+                pdf_path, output_path, delimiter=delimiter, doc_hash=doc_hash
+            ),
+            self._loop,
+        )
+
+    def submit_pages(
+        self, pdf_path: str, pages: Collection[int], doc_hash: str | None = None
+    ) -> concurrent.futures.Future[dict[int, str]]:
+        """Schedule OCR of some pages of pdf_path on the engine loop."""
+        if self._closed:
+            raise RuntimeError("OcrEngine is closed")
+        return asyncio.run_coroutine_threadsafe(
+            self.processor.process_pages(pdf_path, pages, doc_hash=doc_hash),
+            self._loop,
+        )
+
+    def metrics_snapshot(self, timeout: float = 5.0) -> dict[str, Any]:
+        """The processor's metrics_snapshot(), taken on the engine loop."""
+        if threading.current_thread() is self._thread:
+            return self.processor.metrics_snapshot()
+        future: concurrent.futures.Future[dict[str, Any]] = concurrent.futures.Future()
+
+        def take() -> None:
+            try:
+                future.set_result(self.processor.metrics_snapshot())
+            except Exception as e:
+                future.set_exception(e)
+
+        self._loop.call_soon_threadsafe(take)
+        return future.result(timeout)
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """Close the pooled clients, stop the render workers and the engine loop."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            asyncio.run_coroutine_threadsafe(
+                self.processor.pool.close(), self._loop
+            ).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error closing OCR client: {e}")
+        self.processor.renderer.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._loop.close()
+
+
+_engines: dict[tuple[Any, ...], OcrEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_ocr_engine(
+    base_url: str, api_key: str, model_name: str, timeout: int = 120, **options: Any
+) -> OcrEngine:
+    """Return the shared OcrEngine for these settings, creating it on first use.
+
+    Extra keyword options are passed through to OcrProcessor.
+    """
+    key = (base_url, api_key, model_name, timeout, tuple(sorted(options.items())))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            processor = OcrProcessor(base_url, api_key, model_name, timeout, **options)
+            engine = OcrEngine(processor)
+            _engines[key] = engine
+            logger.info(f"Started OCR engine for {base_url} (model {model_name})")
+        return engine
+
+
+def _collect_engine_metrics() -> list[Family]:
+    """Endpoint, cache and scheduler state of every engine, for /metrics."""
+    with _engines_lock:
+        engines = list(_engines.values())
+    in_flight = Family(
+        "pdf2md_inflight_requests", "gauge", "OCR requests in flight per endpoint"
+    )
+    limit = Family(
+        "pdf2md_endpoint_concurrency_limit",
+        "gauge",
+        "Current in-flight cap per endpoint (adaptive limit; 0 = uncapped)",
+    )
+    healthy = Family(
+        "pdf2md_endpoint_healthy", "gauge", "1 if the endpoint is in rotation"
+    )
+    requests = Family(
+        "pdf2md_endpoint_requests_total", "counter", "OCR requests per endpoint"
+    )
+    failures = Family(
+        "pdf2md_endpoint_failures_total",
+        "counter",
+        "Timeouts, connection errors, 5xx and no-model responses per endpoint",
+    )
+    cache_hits = Family("pdf2md_cache_hits_total", "counter", "Page cache hits")
+    cache_misses = Family("pdf2md_cache_misses_total", "counter", "Page cache misses")
+    slots = Family(
+        "pdf2md_page_slots_in_use", "gauge", "Shared page inference slots in use"
+    )
+    slot_waiting = Family(
+        "pdf2md_pages_waiting_for_slot",
+        "gauge",
+        "Rendered pages waiting for a shared inference slot",
+    )
+    circuit = Family(
+        "pdf2md_circuit_open",
+        "gauge",
+        "1 while OCR requests are held back because every endpoint is down",
+    )
+    escalations = Family(
+        "pdf2md_resolution_escalations_total",
+        "counter",
+        "Pages re-run at a higher image resolution, by reason",
+    )
+    for engine in engines:
+        try:
+            # The engine loop changes this state while /metrics is served from
+            # another thread, so it is copied on the loop
+            snapshot = engine.metrics_snapshot()
+        except Exception as e:
+            logger.debug(f"Skipping metrics of an OCR engine: {e!r}")
+            continue
+        for stat in snapshot["endpoints"]:
+            labels = {"endpoint": stat["url"]}
+            in_flight.samples.append((labels, stat["in_flight"]))
+            limit.samples.append((labels, stat["limit"]))
+            healthy.samples.append((labels, int(stat["healthy"])))
+            requests.samples.append((labels, stat["requests"]))
+            failures.samples.append((labels, stat["failures"]))
+        if snapshot["circuit_open"] is not None:
+            circuit.samples.append(({}, int(snapshot["circuit_open"])))
+        if snapshot["cache"] is not None:
+            cache_hits.samples.append(({}, snapshot["cache"]["hits"]))
+            cache_misses.samples.append(({}, snapshot["cache"]["misses"]))
+        if snapshot["slots"] is not None:
+            in_use, waiting = snapshot["slots"]
+            slots.samples.append(({}, in_use))
+            slot_waiting.samples.append(({}, waiting))
+        for reason, n in snapshot["escalations"].items():
+            escalations.samples.append(({"reason": str(reason)}, n))
+    families = [
+        in_flight,
+        limit,
+        healthy,
+        requests,
+        failures,
+        circuit,
+        cache_hits,
+        cache_misses,
+        slots,
+        slot_waiting,
+        escalations,
+    ]
+    return [family for family in families if family.samples]
+
+
+REGISTRY.add_collector("ocr", _collect_engine_metrics)
+
+
+def shutdown_ocr_engines() -> None:
+    """Close every engine created by get_ocr_engine (used on service shutdown)."""
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.close()
 
 
 # Synchronous wrapper for use in callback
@@ -170,6 +975,42 @@ def ocr_pdf_to_markdown_sync(
     model_name: str,
     timeout: int,
     delimiter: str,
+    doc_hash: str | None = None,
+    **options: Any,
 ) -> str:
-    processor = OcrProcessor(base_url, api_key, model_name, timeout)
-    return asyncio.run(processor.process_pdf_to_markdown(pdf_path, delimiter=delimiter))
+    """OCR pdf_path on the shared engine for these settings and block for the result."""
+    engine = get_ocr_engine(base_url, api_key, model_name, timeout, **options)
+    return engine.submit(pdf_path, delimiter=delimiter, doc_hash=doc_hash).result()
+
+
+def ocr_pdf_to_file_sync(
+    pdf_path: str,
+    output_path: str | Path,
+    base_url: str,
+    api_key: str,
+    model_name: str,
+    timeout: int,
+    delimiter: str,
+    doc_hash: str | None = None,
+    **options: Any,
+) -> DocumentResult:
+    """OCR pdf_path into output_path on the shared engine and block until it is written."""
+    engine = get_ocr_engine(base_url, api_key, model_name, timeout, **options)
+    return engine.submit_to_file(
+        pdf_path, output_path, delimiter=delimiter, doc_hash=doc_hash
+    ).result()
+
+
+def ocr_pages_sync(
+    pdf_path: str,
+    pages: Collection[int],
+    base_url: str,
+    api_key: str,
+    model_name: str,
+    timeout: int,
+    doc_hash: str | None = None,
+    **options: Any,
+) -> dict[int, str]:
+    """OCR some pages of pdf_path on the shared engine and block for their markdown."""
+    engine = get_ocr_engine(base_url, api_key, model_name, timeout, **options)
+    return engine.submit_pages(pdf_path, pages, doc_hash=doc_hash).result()
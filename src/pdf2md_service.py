@@ -1,13 +1,30 @@
+import functools
 import logging
+import os
 import shutil
+import sqlite3
 import threading
 import time
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
-from src.config import load_config
+from src.checkpoint import CheckpointStore
+from src.config import Config, load_config
+from src.dedupe import DocumentIndex, file_sha256
+from src.endpoints import parse_endpoints
+from src.jobstore import DONE, DUPLICATE, FAILED, REMOVED, JobStore
+from src.metrics import DOCUMENTS, ERRORS, STAGE_SECONDS, start_metrics_server
 from src.monitor import monitor_folder
-from src.ocr import ocr_pdf_to_markdown_sync
+from src.ocr import (
+    has_error_markers,
+    ocr_pages_sync,
+    ocr_pdf_to_file_sync,
+    shutdown_ocr_engines,
+)
+from src.repair import RepairResult, repair_output
+from src.scheduling import SchedulingPolicy
+from src.tracing import TRACER
+from src.writer import copy_output, load_umask, remove_partial_files
 
 if TYPE_CHECKING:
     from src.monitor import PDFHandler
@@ -53,66 +70,364 @@ def wait_for_file_stable(
     return False
 
 
+_document_indexes: dict[str, DocumentIndex] = {}
+_document_indexes_lock = threading.Lock()
+
+
+def _get_document_index(index_path: str) -> DocumentIndex | None:
+    """Return the shared DocumentIndex for index_path (None if dedupe is disabled)."""
+    if not index_path:
+        return None
+    with _document_indexes_lock:
+        index = _document_indexes.get(index_path)
+        if index is None:
+            index = DocumentIndex(index_path)
+            _document_indexes[index_path] = index
+        return index
+
+
+def ocr_options(cfg: Config) -> dict[str, Any]:
+    """OcrProcessor settings from the config (shared by conversion and repair,
+    so both use the same engine)."""
+    return {
+        "page_concurrency": cfg.OCR_PAGE_CONCURRENCY,
+        "page_slots": cfg.PAGE_SLOTS,
+        "cache_dir": cfg.CACHE_DIR,
+        "cache_max_bytes": cfg.CACHE_MAX_MB * 1024 * 1024,
+        "text_layer_threshold": cfg.TEXT_LAYER_THRESHOLD,
+        "checkpoint_dir": cfg.CHECKPOINT_DIR,
+        "endpoints": parse_endpoints(cfg.LM_STUDIO_ENDPOINTS, cfg.LM_STUDIO_API),
+        "endpoint_failure_threshold": cfg.ENDPOINT_FAILURE_THRESHOLD,
+        "endpoint_probe_interval": cfg.ENDPOINT_PROBE_INTERVAL,
+        "circuit_breaker": cfg.CIRCUIT_BREAKER,
+        "circuit_max_outage": cfg.CIRCUIT_MAX_OUTAGE,
+        "adaptive_max_concurrency": cfg.ADAPTIVE_MAX_CONCURRENCY,
+        "latency_target": cfg.ADAPTIVE_LATENCY_TARGET,
+        "render_workers": cfg.RENDER_WORKERS,
+        "read_ahead": cfg.RENDER_READ_AHEAD,
+        "image_dims": cfg.IMAGE_DIMS,
+        "anchor_text_len": cfg.ANCHOR_TEXT_LEN,
+        "min_result_chars": cfg.MIN_RESULT_CHARS,
+    }
+
+
 def on_new_pdf(path: str, handler: "PDFHandler | None" = None) -> None:
+    with TRACER.span("convert", path=path):
+        _convert(path, handler)
+
+
+def _convert(path: str, handler: "PDFHandler | None") -> None:
     cfg = load_config()
     pdf_path = Path(path)
     output_path = Path(cfg.OUTPUT_DIR) / (pdf_path.stem + ".md")
-    logger.info(f"Waiting for file to be stable: {pdf_path}")
-    if not wait_for_file_stable(pdf_path):
-        logger.error(f"File did not stabilize in time or was deleted: {pdf_path}")
-        return
+    jobs = handler.jobs if handler is not None else None
+    if handler is None or handler.stability is None:
+        # Nothing upstream checked that the file is complete; poll it here
+        logger.info(f"Waiting for file to be stable: {pdf_path}")
+        with STAGE_SECONDS.time(stage="stability_wait"), TRACER.span("stability_wait"):
+            stable = wait_for_file_stable(pdf_path)
+        if not stable:
+            logger.error(f"File did not stabilize in time or was deleted: {pdf_path}")
+            DOCUMENTS.inc(status=FAILED)
+            ERRORS.inc(type="unstable_file")
+            if jobs is not None:
+                jobs.finished(pdf_path, FAILED, error="File did not stabilize")
+            return
     logger.info(f"Processing PDF to markdown: {pdf_path} -> {output_path}")
     api_key = cfg.LM_STUDIO_API_KEY
     model_name = cfg.LM_STUDIO_MODEL
     try:
         if not pdf_path.exists():
             logger.error(f"File was deleted before processing: {pdf_path}")
+            DOCUMENTS.inc(status=REMOVED)
+            if jobs is not None:
+                jobs.finished(pdf_path, REMOVED)
             return
-        md = ocr_pdf_to_markdown_sync(
-            str(pdf_path),
-            base_url=cfg.LM_STUDIO_API,
-            api_key=api_key,
-            model_name=model_name,
-            timeout=120,
-            delimiter=cfg.MD_PAGE_DELIMITER,
+        index = _get_document_index(cfg.DEDUPE_INDEX)
+        pdf_sha256 = None
+        if index is not None or cfg.CHECKPOINT_DIR:
+            with TRACER.span("hash"):
+                pdf_sha256 = file_sha256(pdf_path)
+        existing = (
+            index.lookup(pdf_sha256)
+            if index is not None and pdf_sha256 is not None
+            else None
         )
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(md)
-        logger.info(f"Wrote markdown to {output_path}")
+        if existing is not None:
+            # Identical content was converted before: reuse its markdown
+            if existing.resolve() != output_path.resolve():
+                copy_output(existing, output_path)
+            logger.info(
+                f"{pdf_path} is a duplicate of an already converted PDF; "
+                f"reused {existing} for {output_path}"
+            )
+            DOCUMENTS.inc(status=DUPLICATE)
+            if jobs is not None:
+                jobs.finished(pdf_path, DUPLICATE, output=output_path)
+        else:
+            with STAGE_SECONDS.time(stage="document"):
+                result = ocr_pdf_to_file_sync(
+                    str(pdf_path),
+                    output_path,
+                    base_url=cfg.LM_STUDIO_API,
+                    api_key=api_key,
+                    model_name=model_name,
+                    timeout=120,
+                    delimiter=cfg.MD_PAGE_DELIMITER,
+                    doc_hash=pdf_sha256,
+                    **ocr_options(cfg),
+                )
+            logger.info(f"Wrote markdown to {output_path}")
+            status = FAILED if result.error is not None else DONE
+            DOCUMENTS.inc(status=status)
+            if jobs is not None:
+                jobs.finished(
+                    pdf_path,
+                    status,
+                    output=output_path,
+                    num_pages=result.num_pages,
+                    pages=result.pages,
+                    error=result.error,
+                )
+            if cfg.CHECKPOINT_DIR and pdf_sha256 is not None:
+                # The output is safely on disk; page checkpoints are no longer needed
+                CheckpointStore(cfg.CHECKPOINT_DIR).clear(pdf_sha256)
+            # Only clean results are reusable for duplicates
+            if index is not None and pdf_sha256 is not None:
+                if not result.clean:
+                    logger.info(f"Not indexing {output_path}: it contains OCR errors")
+                else:
+                    index.record(pdf_sha256, output_path, pdf_path.name)
         # Move PDF to DONE_DIR
         done_path = Path(cfg.DONE_DIR) / pdf_path.name
         try:
-            shutil.move(str(pdf_path), str(done_path))
+            with STAGE_SECONDS.time(stage="move"), TRACER.span("move"):
+                shutil.move(str(pdf_path), str(done_path))
             logger.info(f"Moved PDF to {done_path}")
             # Clear from seen set after successful processing
             if handler:
                 handler.clear_seen_file(str(pdf_path))
         except FileNotFoundError:
             logger.error(f"PDF was deleted before it could be moved: {pdf_path}")
+            ERRORS.inc(type="move_failed")
         except Exception as e:
             logger.error(f"Error moving PDF to done dir: {e}")
+            ERRORS.inc(type="move_failed")
     except Exception as e:
         logger.error(f"Error processing {pdf_path}: {e}")
+        DOCUMENTS.inc(status=FAILED)
+        ERRORS.inc(type=type(e).__name__)
+        if jobs is not None:
+            jobs.finished(pdf_path, FAILED, error=str(e))
+
+
+def scheduling_policy(cfg: Config) -> SchedulingPolicy:
+    """The queue ordering configured by PDF2MD_SCHEDULING and friends."""
+    if cfg.SCHEDULING not in ("sjf", "fifo"):
+        raise RuntimeError(
+            f"Invalid PDF2MD_SCHEDULING {cfg.SCHEDULING!r}; expected 'sjf' or 'fifo'"
+        )
+    return SchedulingPolicy(
+        shortest_first=cfg.SCHEDULING == "sjf",
+        aging=cfg.SCHEDULING_AGING,
+        priority_dir=cfg.PRIORITY_DIR,
+        priority_prefix=cfg.PRIORITY_PREFIX,
+    )
+
+
+def print_history(jobs: JobStore, hours: float) -> None:
+    """Print hourly throughput and page statistics for the last `hours`."""
+    since = time.time() - hours * 3600
+    counts = ", ".join(f"{n} {status}" for status, n in sorted(jobs.counts().items()))
+    print(f"Jobs: {counts or 'none'}")
+    print(
+        f"{'hour':<17} {'docs':>5} {'failed':>6} {'pages':>6} {'avg s':>7} {'max s':>7}"
+    )
+    for row in jobs.throughput(since):
+        hour = time.strftime("%Y-%m-%d %H:00", time.localtime(row["bucket"]))
+        print(
+            f"{hour:<17} {row['documents']:>5} {row['failed']:>6} {row['pages']:>6} "
+            f"{row['avg_seconds'] or 0:>7.1f} {row['max_seconds'] or 0:>7.1f}"
+        )
+    for row in jobs.page_stats(since):
+        print(
+            f"{row['source']}: {row['pages']} pages, {row['failed']} failed, "
+            f"{row['avg_seconds']:.2f}s average"
+        )
+
+
+def repair_outputs(
+    cfg: Config, outputs: list[Path] | None = None
+) -> list[RepairResult]:
+    """Re-OCR the failed pages of outputs (default: every output in OUTPUT_DIR
+    with error placeholders) from their PDFs in DONE_DIR."""
+    if outputs is None:
+        outputs = [
+            path
+            for path in sorted(Path(cfg.OUTPUT_DIR).glob("*.md"))
+            if has_error_markers(path.read_text(encoding="utf-8"))
+        ]
+    index = _get_document_index(cfg.DEDUPE_INDEX)
+
+    def ocr_pages(
+        pdf_path: str, pages: list[int], doc_hash: str | None = None
+    ) -> dict[int, str]:
+        return ocr_pages_sync(
+            pdf_path,
+            pages,
+            base_url=cfg.LM_STUDIO_API,
+            api_key=cfg.LM_STUDIO_API_KEY,
+            model_name=cfg.LM_STUDIO_MODEL,
+            timeout=120,
+            doc_hash=doc_hash,
+            **ocr_options(cfg),
+        )
+
+    results = []
+    for output_path in outputs:
+        pdf_path = Path(cfg.DONE_DIR) / (output_path.stem + ".pdf")
+        if not pdf_path.exists():
+            logger.warning(f"Cannot repair {output_path}: {pdf_path} not found")
+            results.append(RepairResult(output_path, pdf_path, error="PDF not found"))
+            continue
+        with TRACER.span("repair", path=str(pdf_path)):
+            pdf_sha256 = None
+            if index is not None or cfg.CHECKPOINT_DIR:
+                with TRACER.span("hash"):
+                    pdf_sha256 = file_sha256(pdf_path)
+            result = repair_output(
+                output_path,
+                pdf_path,
+                cfg.MD_PAGE_DELIMITER,
+                functools.partial(ocr_pages, doc_hash=pdf_sha256),
+            )
+        if result.error is not None:
+            logger.error(f"Could not repair {output_path}: {result.error}")
+        elif pdf_sha256 is not None:
+            if cfg.CHECKPOINT_DIR:
+                # As after a conversion: the output is on disk, the pages are done
+                CheckpointStore(cfg.CHECKPOINT_DIR).clear(pdf_sha256)
+            if result.repaired and not result.still_failed and index is not None:
+                # Clean now, so reusable for duplicates like any clean output
+                index.record(pdf_sha256, output_path, pdf_path.name)
+        results.append(result)
+    return results
+
+
+def print_repairs(results: list[RepairResult]) -> None:
+    for r in results:
+        if r.error is not None:
+            print(f"{r.output_path}: not repaired ({r.error})")
+        elif not r.failed:
+            print(f"{r.output_path}: no failed pages")
+        else:
+            still = f", still failing: {r.still_failed}" if r.still_failed else ""
+            print(
+                f"{r.output_path}: repaired {len(r.repaired)} of "
+                f"{len(r.failed)} failed pages{still}"
+            )
+
+
+def run_monitor(
+    cfg: Config, stop_event: threading.Event, jobs: JobStore | None = None
+) -> None:
+    """Convert PDFs arriving in cfg.INPUT_DIR with on_new_pdf until stop_event is set."""
+    monitor_folder(
+        cfg.INPUT_DIR,
+        on_new_pdf,
+        stop_event,
+        num_workers=cfg.WORKERS,
+        max_queue_size=cfg.MAX_QUEUE_SIZE,
+        policy=scheduling_policy(cfg),
+        quiet_period=cfg.STABLE_QUIET_PERIOD,
+        scan_interval=cfg.SCAN_INTERVAL if cfg.MONITOR_MODE == "polling" else None,
+        jobs=jobs,
+        max_attempts=cfg.JOB_MAX_ATTEMPTS,
+    )
 
 
 def main() -> None:
     import sys
 
     cfg = load_config()
+    # Before any threads start writing outputs
+    load_umask()
     # Healthcheck CLI
     if len(sys.argv) > 1 and sys.argv[1] == "--healthcheck":
         print("OK")
         return
+    jobs = None
+    if cfg.JOB_STORE:
+        try:
+            jobs = JobStore(cfg.JOB_STORE)
+        except (OSError, sqlite3.Error) as e:
+            # Without it jobs aren't resumed from the store, but the input
+            # folder scan on startup still finds every waiting PDF
+            logger.warning(
+                f"Cannot open the job store {cfg.JOB_STORE} ({e}); "
+                "running without job history"
+            )
+    # Throughput report CLI: --history [hours]
+    if len(sys.argv) > 1 and sys.argv[1] == "--history":
+        if jobs is None:
+            raise RuntimeError("No job store (PDF2MD_JOB_STORE); no history to show")
+        print_history(jobs, float(sys.argv[2]) if len(sys.argv) > 2 else 24)
+        return
+    # Repair CLI: --repair [output.md ...]
+    if len(sys.argv) > 1 and sys.argv[1] == "--repair":
+        TRACER.configure(cfg.TRACE_FILE)
+        try:
+            print_repairs(repair_outputs(cfg, [Path(p) for p in sys.argv[2:]] or None))
+        finally:
+            shutdown_ocr_engines()
+            TRACER.close()
+        return
+    if cfg.MONITOR_MODE not in ("events", "polling"):
+        raise RuntimeError(
+            f"Invalid PDF2MD_MONITOR_MODE {cfg.MONITOR_MODE!r}; "
+            "expected 'events' or 'polling'"
+        )
+    if cfg.PAGE_SLOTS > 0 and "PDF2MD_OCR_PAGE_CONCURRENCY" in os.environ:
+        # The shared slots replace the per-PDF limit; it only applies without them
+        logger.warning(
+            "PDF2MD_OCR_PAGE_CONCURRENCY is deprecated and ignored while "
+            f"PDF2MD_PAGE_SLOTS is {cfg.PAGE_SLOTS}; set PDF2MD_PAGE_SLOTS "
+            "instead, or to 0 to keep a per-PDF limit"
+        )
+    # Outputs are renamed into place when complete; leftovers are from a crash
+    remove_partial_files(cfg.OUTPUT_DIR)
+    # Checkpoints of PDFs that were deleted or never finished
+    if cfg.CHECKPOINT_DIR and cfg.CHECKPOINT_MAX_AGE_DAYS > 0:
+        CheckpointStore(cfg.CHECKPOINT_DIR).prune(cfg.CHECKPOINT_MAX_AGE_DAYS * 86400)
+    TRACER.configure(cfg.TRACE_FILE)
+    metrics_server = None
+    if cfg.METRICS_PORT:
+        try:
+            metrics_server = start_metrics_server(cfg.METRICS_PORT, cfg.METRICS_HOST)
+        except OSError as e:
+            # Metrics are optional; a taken port must not stop the service
+            logger.warning(
+                f"Cannot serve metrics on {cfg.METRICS_HOST}:{cfg.METRICS_PORT} "
+                f"({e}); running without them"
+            )
     logger.info(f"Monitoring: {cfg.INPUT_DIR}")
     stop_event = threading.Event()
     try:
-        monitor_folder(cfg.INPUT_DIR, on_new_pdf, stop_event)
+        run_monitor(cfg, stop_event, jobs)
     except KeyboardInterrupt:
         logger.info("Stopping monitor...")
         stop_event.set()
     except Exception as e:
         logger.exception(f"Unhandled exception in service: {e}")
         stop_event.set()
+    finally:
+        shutdown_ocr_engines()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+        TRACER.close()
+        if jobs is not None:
+            jobs.close()
 
 
 if __name__ == "__main__":
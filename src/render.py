@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, cast
+
+from pypdf import PdfReader
+
+from src.metrics import STAGE_SECONDS
+from src.tracing import TRACER
+
+logger = logging.getLogger("pdf2md.render")
+
+# Same values olmocr.pipeline.build_page_query puts in every query. These, and
+# page_anchor_text's use of olmocr's private anchor helpers, mirror the olmocr
+# version pinned in pyproject.toml; tests/test_render.py checks they still agree.
+MAX_TOKENS = 3000
+TEMPERATURE = 0.8
+
+
+# Parsed documents kept open per process, so each worker parses a PDF once
+# rather than once per page. Keyed by path, mtime and size.
+_READER_CACHE_SIZE = 4
+_readers: OrderedDict[tuple[str, int, int], tuple[IO[bytes], PdfReader]] = OrderedDict()
+
+
+def _close_stale_readers(pdf_path: str, key: tuple[str, int, int]) -> None:
+    """Close cached readers of deleted files and older versions of pdf_path.
+
+    Sessions delete their local copy when they end; a handle left open on it
+    would keep its descriptor and disk space until the worker exits.
+    """
+    stale = [
+        k
+        for k in _readers
+        if (k[0] == pdf_path and k != key) or not os.path.exists(k[0])
+    ]
+    for k in stale:
+        handle, _ = _readers.pop(k)
+        handle.close()
+
+
+def open_cached_reader(pdf_path: str) -> PdfReader:
+    """Return a PdfReader for pdf_path, reusing this process's parse if unchanged.
+
+    At most _READER_CACHE_SIZE readers stay open; those of files that have
+    since been deleted or changed are closed on the next call.
+    """
+    st = os.stat(pdf_path)
+    key = (pdf_path, st.st_mtime_ns, st.st_size)
+    _close_stale_readers(pdf_path, key)
+    entry = _readers.get(key)
+    if entry is not None:
+        _readers.move_to_end(key)
+        return entry[1]
+    # A file handle (not a path) so pypdf reads objects lazily instead of
+    # loading the whole file into memory
+    handle = open(pdf_path, "rb")
+    reader = PdfReader(handle)
+    _readers[key] = (handle, reader)
+    while len(_readers) > _READER_CACHE_SIZE:
+        _, (old_handle, _) = _readers.popitem(last=False)
+        old_handle.close()
+    return reader
+
+
+def page_anchor_text(reader: PdfReader, page_num: int, target_length: int) -> str:
+    """olmocr's "pdfreport" anchor text for a page of an already parsed PDF.
+
+    Mirrors olmocr.prompts.anchor._pdf_report, which re-parses the whole file
+    for every page.
+    """
+    from olmocr.prompts.anchor import (
+        BoundingBox,
+        ImageElement,
+        PageReport,
+        TextElement,
+        _linearize_pdf_report,
+        _mult,
+        _transform_point,
+    )
+
+    page = reader.pages[page_num - 1]
+    resources = page.get("/Resources", {})
+    xobjects = resources.get("/XObject", {})
+    text_elements: list[Any] = []
+    image_elements: list[Any] = []
+
+    def visitor_body(
+        text: str, cm: list[float], tm: list[float], font_dict: Any, font_size: Any
+    ) -> None:
+        txt2user = _mult(tm, cm)
+        text_elements.append(TextElement(text, txt2user[4], txt2user[5]))
+
+    def visitor_op(op: bytes, args: Any, cm: list[float], tm: list[float]) -> None:
+        if op == b"Do":
+            xobject_name = args[0]
+            xobject = xobjects.get(xobject_name)
+            if xobject and xobject["/Subtype"] == "/Image":
+                x0, y0 = _transform_point(0, 0, cm)
+                x1, y1 = _transform_point(1, 1, cm)
+                image_elements.append(
+                    ImageElement(
+                        xobject_name,
+                        BoundingBox(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)),
+                    )
+                )
+
+    page.extract_text(visitor_text=visitor_body, visitor_operand_before=visitor_op)
+    report = PageReport(
+        mediabox=BoundingBox.from_rectangle(page.mediabox),
+        text_elements=text_elements,
+        image_elements=image_elements,
+    )
+    return str(_linearize_pdf_report(report, max_length=target_length))
+
+
+def build_page_query_timed(
+    pdf_path: str,
+    page_num: int,
+    target_longest_image_dim: int,
+    target_anchor_text_len: int,
+) -> tuple[dict[str, Any], dict[str, tuple[float, float]]]:
+    """Render a page and extract its anchor text into an OCR query.
+
+    Produces the same query as olmocr.pipeline.build_page_query, but
+    synchronously, so it can run inside a worker process. Also returns the
+    (start, end) Unix times of rasterizing the page and extracting its
+    anchor text.
+    """
+    from olmocr.data.renderpdf import render_pdf_to_base64png
+
+    started = time.time()
+    image_base64 = render_pdf_to_base64png(
+        pdf_path, page_num, target_longest_image_dim=target_longest_image_dim
+    )
+    rendered = time.time()
+    anchor_text = page_anchor_text(
+        open_cached_reader(pdf_path), page_num, target_anchor_text_len
+    )
+    timings = {"rasterize": (started, rendered), "anchor_text": (rendered, time.time())}
+    return page_query(image_base64, anchor_text), timings
+
+
+def page_query(image_base64: str, anchor_text: str) -> dict[str, Any]:
+    """The OCR query olmocr.pipeline.build_page_query builds from these parts."""
+    from olmocr.prompts import build_finetuning_prompt
+
+    return {
+        "model": "",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": build_finetuning_prompt(anchor_text)},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/png;base64,{image_base64}"},
+                    },
+                ],
+            }
+        ],
+        "max_tokens": MAX_TOKENS,
+        "temperature": TEMPERATURE,
+    }
+
+
+class PageRenderer:
+    """Builds page queries (page image plus anchor text) for the OCR model.
+
+    With workers > 0 the CPU-bound work runs in a dedicated process pool, so
+    pages can be rendered ahead while earlier pages are being inferred. With
+    workers == 0 pages are rasterized in a thread, and their anchor text is
+    taken from the caller's parsed reader if given, or from olmocr's own
+    build_page_query (which re-parses the PDF) if not.
+    """
+
+    def __init__(self, workers: int = 0) -> None:
+        self.workers = max(0, workers)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: worker processes must not inherit the engine's threads/loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Started {self.workers} page render worker process(es)")
+        return self._executor
+
+    async def build_query(
+        self,
+        pdf_path: str,
+        page_num: int,
+        target_longest_image_dim: int = 1024,
+        target_anchor_text_len: int = 6000,
+        reader: PdfReader | None = None,
+        reader_lock: "threading.Lock | None" = None,
+    ) -> dict[str, Any]:
+        """Build the OCR query for one page (the model name is left to the caller).
+
+        reader, used only without workers, is an existing parse of pdf_path;
+        reader_lock must be held while using it, as pypdf is not thread-safe.
+        """
+        with (
+            STAGE_SECONDS.time(stage="render"),
+            TRACER.span("render", image_dim=target_longest_image_dim),
+        ):
+            if self.workers == 0 and reader is not None:
+                return await self._build_query_from_reader(
+                    pdf_path,
+                    page_num,
+                    target_longest_image_dim,
+                    target_anchor_text_len,
+                    reader,
+                    reader_lock or threading.Lock(),
+                )
+            if self.workers == 0:
+                from olmocr.pipeline import build_page_query
+
+                query = await build_page_query(
+                    pdf_path,
+                    page=page_num,
+                    target_longest_image_dim=target_longest_image_dim,
+                    target_anchor_text_len=target_anchor_text_len,
+                )
+                return cast(dict[str, Any], query)
+            loop = asyncio.get_running_loop()
+            query, timings = await loop.run_in_executor(
+                self._get_executor(),
+                build_page_query_timed,
+                pdf_path,
+                page_num,
+                target_longest_image_dim,
+                target_anchor_text_len,
+            )
+            # Timed in the worker process; the rest of the span is pool wait
+            for step, (start, end) in timings.items():
+                TRACER.record(step, start, end)
+            return query
+
+    @staticmethod
+    async def _build_query_from_reader(
+        pdf_path: str,
+        page_num: int,
+        target_longest_image_dim: int,
+        target_anchor_text_len: int,
+        reader: PdfReader,
+        reader_lock: "threading.Lock",
+    ) -> dict[str, Any]:
+        from olmocr.data.renderpdf import render_pdf_to_base64png
+
+        def rasterize() -> str:
+            started = time.time()
+            image_base64 = render_pdf_to_base64png(
+                pdf_path, page_num, target_longest_image_dim=target_longest_image_dim
+            )
+            TRACER.record("rasterize", started, time.time())
+            return str(image_base64)
+
+        def anchor_text() -> str:
+            with reader_lock:
+                started = time.time()
+                text = page_anchor_text(reader, page_num, target_anchor_text_len)
+                TRACER.record("anchor_text", started, time.time())
+                return text
+
+        image_base64, text = await asyncio.gather(
+            asyncio.to_thread(rasterize), asyncio.to_thread(anchor_text)
+        )
+        return page_query(image_base64, text)
+
+    def close(self) -> None:
+        """Shut down the worker processes, dropping renders not yet started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
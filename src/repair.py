@@ -0,0 +1,149 @@
+import logging
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from pypdf import PdfReader
+
+from src.ocr import ERROR_MARKER
+from src.writer import MarkdownStreamWriter, page_separator
+
+logger = logging.getLogger("pdf2md.repair")
+
+# Written at the top of every page when the text layer fast path is enabled
+_PAGE_COMMENT = re.compile(r"^<!-- page (\d+): [^\n]*-->$", re.MULTILINE)
+# Placed before the first page when every page failed
+_ALL_FAILED_PREFIX = "**[ERROR: All "
+
+
+def split_pages(
+    markdown: str, delimiter: str, num_pages: int
+) -> tuple[str | None, list[str]] | None:
+    """Split an output written with delimiter into its header and pages.
+
+    Pages are found by their `<!-- page N: ... -->` comments when present,
+    otherwise by the page separator. Returns None when the boundaries cannot
+    be told apart reliably: concat outputs without page comments, or a page
+    whose own text contains the separator (the count then does not match
+    num_pages).
+    """
+    separator = page_separator(delimiter)
+    marks = list(_PAGE_COMMENT.finditer(markdown))
+    if marks:
+        if [int(m.group(1)) for m in marks] != list(range(1, num_pages + 1)):
+            return None
+        starts = [m.start() for m in marks] + [len(markdown)]
+        pages = [markdown[a:b] for a, b in zip(starts, starts[1:], strict=False)]
+        pages = [page.removesuffix(separator) for page in pages[:-1]] + pages[-1:]
+        head = markdown[: starts[0]].removesuffix(separator)
+        return (head or None), pages
+    if delimiter != "delimited":
+        return None
+    pages = markdown.split(separator)
+    header = None
+    if len(pages) == num_pages + 1 and pages[0].startswith(_ALL_FAILED_PREFIX):
+        header = pages.pop(0)
+    if len(pages) != num_pages:
+        return None
+    return header, pages
+
+
+def _match_page_comment(new: str, old: str) -> str:
+    """new with a page comment exactly when old has one (new's own, if any).
+
+    The comment depends on the text layer threshold of the run that wrote the
+    page, which may differ between the original run and the repair.
+    """
+    new_comment = _PAGE_COMMENT.match(new)
+    body = new.partition("\n")[2] if new_comment else new
+    old_comment = _PAGE_COMMENT.match(old)
+    if old_comment is None:
+        return body
+    return f"{(new_comment or old_comment).group(0)}\n{body}"
+
+
+def is_failed_page(page: str) -> bool:
+    """True if a page of an output is an OCR error placeholder."""
+    if _PAGE_COMMENT.match(page):
+        page = page.partition("\n")[2]
+    return page.startswith(ERROR_MARKER)
+
+
+@dataclass
+class RepairResult:
+    """What repairing one output did."""
+
+    output_path: Path
+    pdf_path: Path
+    failed: list[int] = field(default_factory=list)  # error pages found
+    repaired: list[int] = field(default_factory=list)  # of those, now converted
+    error: str | None = None  # set when the output could not be repaired
+
+    @property
+    def still_failed(self) -> list[int]:
+        return [page for page in self.failed if page not in self.repaired]
+
+
+def repair_output(
+    output_path: str | Path,
+    pdf_path: str | Path,
+    delimiter: str,
+    ocr_pages: Callable[[str, list[int]], dict[int, str]],
+) -> RepairResult:
+    """Re-OCR the failed pages of output_path from pdf_path and splice them in.
+
+    ocr_pages(pdf_path, pages) returns the new markdown of each page. Pages
+    that fail again keep the error placeholder they already had. Repaired
+    pages get a `<!-- page N -->` comment only if the output's pages have
+    them, so the output stays splittable. The output is only rewritten,
+    atomically, if at least one page was repaired.
+    """
+    output_path, pdf_path = Path(output_path), Path(pdf_path)
+    result = RepairResult(output_path, pdf_path)
+    try:
+        markdown = output_path.read_text(encoding="utf-8")
+        num_pages = len(PdfReader(pdf_path).pages)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        return result
+    parts = split_pages(markdown, delimiter, num_pages)
+    if parts is None:
+        result.error = (
+            f"cannot find the {num_pages} page boundaries "
+            f"(written with a different delimiter or a different PDF?)"
+        )
+        return result
+    _, pages = parts  # the only header is the all-pages-failed notice
+    result.failed = [n for n, page in enumerate(pages, start=1) if is_failed_page(page)]
+    if not result.failed:
+        return result
+    logger.info(
+        f"Repairing {output_path}: re-running pages {result.failed} of {pdf_path}"
+    )
+    try:
+        new_pages = ocr_pages(str(pdf_path), result.failed)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        return result
+    for page_num in result.failed:
+        md = new_pages.get(page_num)
+        if md is not None and not is_failed_page(md):
+            pages[page_num - 1] = _match_page_comment(md, pages[page_num - 1])
+            result.repaired.append(page_num)
+    if not result.repaired:
+        return result
+    writer = MarkdownStreamWriter(output_path, delimiter)
+    try:
+        for page_num, page in enumerate(pages, start=1):
+            writer.add_page(page_num, page)
+        # Without the all-pages-failed notice, which no longer applies
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+    logger.info(
+        f"Repaired {len(result.repaired)} of {len(result.failed)} failed pages "
+        f"in {output_path}"
+    )
+    return result
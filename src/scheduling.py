@@ -0,0 +1,130 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Generic, TypeVar
+
+logger = logging.getLogger("pdf2md.scheduling")
+
+T = TypeVar("T")
+
+URGENT = 0
+NORMAL = 1
+
+# Rough size of a scanned page
+_BYTES_PER_PAGE_ESTIMATE = 100_000
+
+
+def estimate_page_count(path: Path) -> float:
+    """Page count of a PDF estimated from its size.
+
+    Runs where files are queued, on the thread that checks every pending
+    file for stability, so it only stats the file: parsing a large or
+    half-copied PDF over a share would hold up all the others. The real
+    page count is read when a worker opens the PDF.
+    """
+    try:
+        return path.stat().st_size / _BYTES_PER_PAGE_ESTIMATE
+    except OSError:
+        return 1.0
+
+
+@dataclass(frozen=True)
+class SchedulingPolicy:
+    """How queued PDFs are ordered.
+
+    Urgent PDFs (in the priority_dir subfolder of the input folder, or named
+    with priority_prefix) go before all others. Within each class, PDFs with
+    fewer (estimated) pages go first when shortest_first is set. A waiting PDF's page
+    count is reduced by aging pages for every minute it has waited, so large
+    PDFs are not starved by a steady stream of small ones.
+    """
+
+    shortest_first: bool = True
+    aging: float = 10.0  # pages per minute of waiting
+    priority_dir: str = "priority"
+    priority_prefix: str = "priority_"
+
+    def priority(self, path: Path) -> int:
+        if self.priority_dir and path.parent.name == self.priority_dir:
+            return URGENT
+        if self.priority_prefix and path.name.startswith(self.priority_prefix):
+            return URGENT
+        return NORMAL
+
+    def cost(self, path: Path) -> float:
+        return estimate_page_count(path) if self.shortest_first else 0.0
+
+
+class JobQueue(Generic[T]):
+    """A bounded, thread-safe queue that hands out the cheapest job first.
+
+    Jobs are ordered by priority, then by cost minus aging for every minute
+    waited, then by arrival. With every job at the same priority and cost it
+    is a plain FIFO queue. Mirrors the parts of queue.Queue the worker pool
+    uses (put blocks while full; get, get_nowait, task_done, join, qsize).
+    """
+
+    def __init__(self, maxsize: int = 0, aging: float = 0.0) -> None:
+        self.maxsize = maxsize
+        self.aging = aging
+        self._items: dict[int, tuple[int, float, float, T]] = {}
+        self._seq = itertools.count()
+        self._unfinished = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+
+    def put(self, item: T, priority: int = NORMAL, cost: float = 0.0) -> None:
+        """Add a job, blocking while the queue is full."""
+        with self._not_full:
+            while 0 < self.maxsize <= len(self._items):
+                self._not_full.wait()
+            self._items[next(self._seq)] = (priority, cost, time.monotonic(), item)
+            self._unfinished += 1
+            self._not_empty.notify()
+
+    def get(self) -> T:
+        """Remove and return the best job, blocking while the queue is empty."""
+        with self._not_empty:
+            while not self._items:
+                self._not_empty.wait()
+            return self._pop()
+
+    def get_nowait(self) -> T:
+        with self._lock:
+            if not self._items:
+                raise queue.Empty
+            return self._pop()
+
+    def _pop(self) -> T:
+        now = time.monotonic()
+
+        def key(seq: int) -> tuple[int, float, int]:
+            priority, cost, queued_at, _ = self._items[seq]
+            return priority, cost - self.aging * (now - queued_at) / 60, seq
+
+        _, _, _, item = self._items.pop(min(self._items, key=key))
+        self._not_full.notify()
+        return item
+
+    def task_done(self) -> None:
+        with self._all_done:
+            self._unfinished -= 1
+            if self._unfinished <= 0:
+                self._unfinished = 0
+                self._all_done.notify_all()
+
+    def join(self) -> None:
+        """Block until every job put so far has been marked done."""
+        with self._all_done:
+            while self._unfinished:
+                self._all_done.wait()
+
+    def qsize(self) -> int:
+        with self._lock:
+            return len(self._items)
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import IO, Any
+
+from pypdf import PdfReader
+
+from src.render import PageRenderer
+
+logger = logging.getLogger("pdf2md.session")
+
+
+class DocumentSession:
+    """A PDF opened once for the whole of its conversion.
+
+    open() copies the PDF to a local temp file in one sequential read (cheap
+    next to re-reading it page by page over a network share) and parses it
+    once. Page count, text layer scoring and, when rendering on the OCR
+    loop, anchor text use that parse; render worker processes each parse
+    the local copy once and keep it for the document's later pages. A
+    page's rendered query is kept until release(), so retries resend it
+    instead of rendering the page again.
+    """
+
+    def __init__(self, pdf_path: str, renderer: PageRenderer) -> None:
+        self.pdf_path = str(pdf_path)
+        self.renderer = renderer
+        self.local_path = self.pdf_path
+        self.page_count = 0
+        self._reader: PdfReader | None = None
+        self._handle: IO[bytes] | None = None
+        self._reader_lock = threading.Lock()
+        self._tmp_dir: str | None = None
+        self._queries: dict[tuple[int, int, int], dict[str, Any]] = {}
+
+    async def open(self) -> "DocumentSession":
+        """Copy and parse the PDF; raises if it cannot be read."""
+        await asyncio.to_thread(self._open_sync)
+        return self
+
+    def _open_sync(self) -> None:
+        self._tmp_dir = tempfile.mkdtemp(prefix="pdf2md-")
+        try:
+            self.local_path = os.path.join(self._tmp_dir, "document.pdf")
+            shutil.copyfile(self.pdf_path, self.local_path)
+            self._handle = open(self.local_path, "rb")
+            self._reader = PdfReader(self._handle)
+            self.page_count = len(self._reader.pages)
+        except BaseException:
+            self._close_sync()
+            raise
+
+    @property
+    def reader(self) -> PdfReader:
+        """The parsed document (only valid between open() and close())."""
+        if self._reader is None:
+            raise RuntimeError(f"Document session for {self.pdf_path} is not open")
+        return self._reader
+
+    async def query(
+        self,
+        page_num: int,
+        target_longest_image_dim: int = 1024,
+        target_anchor_text_len: int = 6000,
+    ) -> dict[str, Any]:
+        """The OCR query for a page, rendered on first use and then reused."""
+        key = (page_num, target_longest_image_dim, target_anchor_text_len)
+        query = self._queries.get(key)
+        if query is None:
+            query = await self.renderer.build_query(
+                self.local_path,
+                page_num,
+                target_longest_image_dim=target_longest_image_dim,
+                target_anchor_text_len=target_anchor_text_len,
+                reader=self._reader,
+                reader_lock=self._reader_lock,
+            )
+            self._queries[key] = query
+        return query
+
+    def release(self, page_num: int) -> None:
+        """Drop a finished page's rendered queries to free their images."""
+        for key in [key for key in self._queries if key[0] == page_num]:
+            del self._queries[key]
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._close_sync)
+
+    def _close_sync(self) -> None:
+        self._queries.clear()
+        self._reader = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        self.local_path = self.pdf_path
+
+    async def __aenter__(self) -> "DocumentSession":
+        return await self.open()
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
@@ -0,0 +1,177 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.metrics import STAGE_SECONDS
+
+logger = logging.getLogger("pdf2md.stability")
+
+
+@dataclass
+class _Pending:
+    source: str
+    first_seen: float
+    deadline: float
+    signature: tuple[int, int] | None  # (size, mtime_ns) at the last event/check
+    complete: bool  # the writer is known to be done (closed or renamed in)
+
+
+def _signature(path: Path) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class StabilityTracker:
+    """Decides when files that are still being written are complete.
+
+    Filesystem events drive it: every create/modify event records the file's
+    size and mtime and pushes its deadline quiet_period into the future
+    (debounce). At the deadline the file is stable if it is non-empty and its
+    size and mtime have not changed since the last event. Where events are
+    missed (some network shares, platforms without modify events) the file is
+    rechecked every quiet_period. A file closed after writing or moved into
+    place is known to be complete and only needs to be non-empty.
+
+    A single timer thread serves every pending file from a heap of deadlines,
+    so waiting files cost no threads. on_stable(path, source) is called on
+    that thread and may block (e.g. on a full job queue). Files that don't
+    settle within max_wait seconds, or disappear first, are dropped and
+    on_dropped(path), if given, is called on the same thread.
+    """
+
+    def __init__(
+        self,
+        on_stable: Callable[[Path, str], object],
+        quiet_period: float = 2.0,
+        max_wait: float = 300.0,
+        on_dropped: Callable[[Path], object] | None = None,
+    ) -> None:
+        self.on_stable = on_stable
+        self.on_dropped = on_dropped
+        self.quiet_period = quiet_period
+        self.max_wait = max_wait
+        self._pending: dict[Path, _Pending] = {}
+        self._heap: list[tuple[float, int, Path]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+    def start(self) -> None:
+        """Start the timer thread (idempotent)."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="pdf2md-stability", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stop the timer thread; files still pending are forgotten."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._pending.clear()
+            self._heap.clear()
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def changed(self, path: Path, source: str = "new") -> None:
+        """A file was created or written to; wait for it to go quiet."""
+        self._arm(path, source, complete=False)
+
+    def completed(self, path: Path, source: str = "new") -> None:
+        """A file was closed after writing or renamed into place."""
+        self._arm(path, source, complete=True)
+
+    def forget(self, path: Path) -> None:
+        """Stop tracking a file (e.g. it was deleted)."""
+        with self._cond:
+            self._pending.pop(path, None)
+
+    def _arm(self, path: Path, source: str, complete: bool) -> None:
+        now = time.monotonic()
+        signature = _signature(path)
+        with self._cond:
+            entry = self._pending.get(path)
+            if entry is None:
+                entry = _Pending(source, now, now, signature, complete)
+                self._pending[path] = entry
+            entry.signature = signature
+            entry.complete = entry.complete or complete
+            entry.deadline = now if complete else now + self.quiet_period
+            heapq.heappush(self._heap, (entry.deadline, next(self._seq), path))
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if self._heap:
+                        delay = self._heap[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+                deadline, _, path = heapq.heappop(self._heap)
+                entry = self._pending.get(path)
+                if entry is None or entry.deadline != deadline:
+                    continue  # forgotten, or re-armed by a later event
+            self._check(path, entry)
+
+    def _check(self, path: Path, entry: _Pending) -> None:
+        signature = _signature(path)
+        now = time.monotonic()
+        with self._cond:
+            if self._pending.get(path) is not entry:
+                return
+            if signature is None:
+                del self._pending[path]
+                logger.warning(f"File disappeared before it was complete: {path}")
+                stable = False
+            elif signature[0] > 0 and (entry.complete or signature == entry.signature):
+                del self._pending[path]
+                stable = True
+            elif now - entry.first_seen >= self.max_wait:
+                del self._pending[path]
+                logger.error(f"Timed out waiting for file to stabilize: {path}")
+                stable = False
+            else:
+                entry.signature = signature
+                entry.complete = False
+                entry.deadline = now + self.quiet_period
+                heapq.heappush(self._heap, (entry.deadline, next(self._seq), path))
+                return
+        if not stable:
+            if self.on_dropped is not None:
+                try:
+                    self.on_dropped(path)
+                except Exception as e:
+                    logger.error(f"Error handling dropped file {path}: {e}")
+            return
+        logger.debug(f"{path} is stable after {now - entry.first_seen:.2f}s")
+        STAGE_SECONDS.observe(now - entry.first_seen, stage="stability_wait")
+        try:
+            self.on_stable(path, entry.source)
+        except Exception as e:
+            logger.error(f"Error handling stable file {path}: {e}")
@@ -0,0 +1,147 @@
+import logging
+import re
+from collections.abc import Collection
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pypdf import PageObject, PdfReader
+
+logger = logging.getLogger("pdf2md.text_layer")
+
+# Pages with less extractable text than this are treated as scanned/empty
+MIN_TEXT_CHARS = 50
+
+_CID_RE = re.compile(r"\(cid:\d+\)")
+_HYPHEN_BREAK_RE = re.compile(r"(\w)-\n(\w)")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+@dataclass
+class TextLayerScore:
+    """How trustworthy a page's embedded text layer looks (score in 0..1)."""
+
+    text_chars: int
+    garbage_ratio: float  # share of characters that are junk (U+FFFD, (cid:N), ...)
+    unmapped_font_ratio: float  # share of fonts with no way to map glyphs to text
+    image_coverage: float  # share of the page area painted by images
+    score: float
+
+
+def _is_garbage_char(ch: str) -> bool:
+    code = ord(ch)
+    return (
+        ch == "\ufffd"
+        or 0xE000 <= code <= 0xF8FF  # private use area: glyph ids, not text
+        or (code < 32 and ch not in "\t\n\r")
+    )
+
+
+def _font_is_unmapped(font: Any) -> bool:
+    # Composite and Type3 fonts without a ToUnicode CMap extract as glyph ids
+    return "/ToUnicode" not in font and font.get("/Subtype") in ("/Type0", "/Type3")
+
+
+def _resolve(obj: Any) -> Any:
+    return obj.get_object() if hasattr(obj, "get_object") else obj
+
+
+def score_page(page: PageObject) -> tuple[TextLayerScore, str]:
+    """Score the extractable text of one page and return it with the text."""
+    resources = _resolve(page.get("/Resources")) or {}
+    fonts = _resolve(resources.get("/Font")) or {}
+    xobjects = _resolve(resources.get("/XObject")) or {}
+    image_area = 0.0
+
+    def visitor_op(op: bytes, args: Any, cm: list[float], tm: list[float]) -> None:
+        nonlocal image_area
+        if op == b"Do" and args:
+            xobject = _resolve(xobjects.get(args[0]))
+            if xobject is not None and xobject.get("/Subtype") == "/Image":
+                # Images are drawn into the unit square mapped by the current CTM
+                image_area += abs(cm[0] * cm[3] - cm[1] * cm[2])
+
+    text = page.extract_text(visitor_operand_before=visitor_op) or ""
+
+    width = float(page.mediabox.width)
+    height = float(page.mediabox.height)
+    page_area = width * height if width > 0 and height > 0 else 1.0
+    image_coverage = min(1.0, image_area / page_area)
+
+    cid_chars = sum(len(m) for m in _CID_RE.findall(text))
+    visible = [ch for ch in _CID_RE.sub("", text) if not ch.isspace()]
+    text_chars = len(visible)
+    garbage = sum(1 for ch in visible if _is_garbage_char(ch)) + cid_chars
+    garbage_ratio = (
+        garbage / (text_chars + cid_chars) if text_chars + cid_chars else 1.0
+    )
+
+    font_objects = [_resolve(font) for font in fonts.values()]
+    unmapped = sum(1 for font in font_objects if _font_is_unmapped(font))
+    unmapped_font_ratio = unmapped / len(font_objects) if font_objects else 1.0
+
+    if text_chars < MIN_TEXT_CHARS or not font_objects:
+        score = 0.0
+    else:
+        # Invisible OCR layers on top of full-page scans are usually worse than
+        # what the model produces, so heavy image coverage pulls the score down.
+        score = (
+            (1.0 - garbage_ratio)
+            * (1.0 - unmapped_font_ratio)
+            * (1.0 - 0.5 * image_coverage)
+        )
+    return (
+        TextLayerScore(
+            text_chars=text_chars,
+            garbage_ratio=round(garbage_ratio, 4),
+            unmapped_font_ratio=round(unmapped_font_ratio, 4),
+            image_coverage=round(image_coverage, 4),
+            score=round(score, 4),
+        ),
+        text,
+    )
+
+
+def text_to_markdown(text: str) -> str:
+    """Turn extracted page text into plain markdown paragraphs."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = [line.rstrip() for line in text.split("\n")]
+    text = "\n".join(lines)
+    text = _HYPHEN_BREAK_RE.sub(r"\1\2", text)  # re-join words split across lines
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+def extract_text_layer_pages(
+    pdf_path: str | Path,
+    threshold: float,
+    reader: PdfReader | None = None,
+    only: Collection[int] | None = None,
+) -> dict[int, str]:
+    """Return markdown for every page whose text layer scores at least threshold.
+
+    Keys are 1-based page numbers. Pages that fail scoring are left out, so
+    they go through OCR as usual. An already parsed reader for pdf_path may
+    be passed to avoid parsing the file again. With only, just those pages
+    are scored.
+    """
+    if reader is None:
+        with open(pdf_path, "rb") as pdf_file:
+            return extract_text_layer_pages(
+                pdf_path, threshold, PdfReader(pdf_file), only
+            )
+    pages: dict[int, str] = {}
+    for page_num, page in enumerate(reader.pages, start=1):
+        if only is not None and page_num not in only:
+            continue
+        try:
+            score, text = score_page(page)
+        except Exception as e:
+            logger.warning(
+                f"Could not score text layer of page {page_num} of {pdf_path}: {e}"
+            )
+            continue
+        logger.debug(f"Text layer of page {page_num} of {pdf_path}: {score}")
+        if score.score >= threshold:
+            pages[page_num] = text_to_markdown(text)
+    return pages
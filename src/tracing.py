@@ -0,0 +1,304 @@
+import argparse
+import contextvars
+import json
+import logging
+import secrets
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any
+
+logger = logging.getLogger("pdf2md.tracing")
+
+# The span new spans are children of; follows asyncio tasks (each task starts
+# with a copy of its creator's context) and run_coroutine_threadsafe calls
+_current: contextvars.ContextVar["Span | None"] = contextvars.ContextVar(
+    "pdf2md_span", default=None
+)
+
+
+@dataclass
+class Span:
+    """One timed step of a document's conversion."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start: float  # Unix time
+    attrs: dict[str, Any] = field(default_factory=dict)
+    end: float | None = None
+    error: str | None = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def to_record(self) -> dict[str, Any]:
+        end = self.end if self.end is not None else time.time()
+        record: dict[str, Any] = {
+            "trace": self.trace_id,
+            "span": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration": round(end - self.start, 6),
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        if self.attrs:
+            record["attrs"] = self.attrs
+        return record
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+class Tracer:
+    """Writes finished spans as JSON lines to a trace file.
+
+    Spans started while another is current (in the same thread or asyncio
+    task, or in a coroutine submitted from it) become its children, so every
+    document gets one span tree. Without a trace file spans are still timed
+    but nothing is written.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self._lock = threading.Lock()
+        self._file: IO[str] | None = None
+        self.path: Path | None = None
+        if path:
+            self.configure(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def configure(self, path: str | Path | None) -> None:
+        """Append spans to path from now on (None or "" stops writing)."""
+        self.close()
+        if not path:
+            return
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        logger.info(f"Writing trace spans to {self.path}")
+
+    def start_span(self, name: str, parent: Span | None = None, **attrs: Any) -> Span:
+        """Start a span under parent (default: the current span).
+
+        The span is not made current; use activate() or span() for that.
+        """
+        if parent is None:
+            parent = _current.get()
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+            attrs=attrs,
+        )
+
+    def end_span(self, span: Span, error: BaseException | str | None = None) -> None:
+        span.end = time.time()
+        if error is not None:
+            span.error = (
+                error
+                if isinstance(error, str)
+                else f"{type(error).__name__}: {error}".rstrip(": ")
+            )
+        self._write(span)
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        """Make span current for the with-block (without ending it)."""
+        token = _current.set(span)
+        try:
+            yield span
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Span]:
+        """Time the with-block as a child of the current span."""
+        span = self.start_span(name, **attrs)
+        token = _current.set(span)
+        error: BaseException | None = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            self.end_span(span, error)
+
+    def record(self, name: str, start: float, end: float, **attrs: Any) -> None:
+        """Write a span timed elsewhere (e.g. in a worker process) under the
+        current span."""
+        span = self.start_span(name, **attrs)
+        span.start = start
+        span.end = end
+        self._write(span)
+
+    def _write(self, span: Span) -> None:
+        if self._file is None:
+            return
+        line = json.dumps(span.to_record(), default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+
+
+TRACER = Tracer()
+
+
+# Offline viewer: python -m src.tracing <trace file>
+
+
+def load_traces(path: str | Path) -> dict[str, list[dict[str, Any]]]:
+    """Span records of a trace file grouped by trace, in file order."""
+    traces: dict[str, list[dict[str, Any]]] = {}
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+            traces.setdefault(record["trace"], []).append(record)
+    return traces
+
+
+def _root(records: list[dict[str, Any]]) -> dict[str, Any]:
+    ids = {r["span"] for r in records}
+    roots = [r for r in records if r["parent"] not in ids]
+    return max(roots, key=lambda r: r["duration"])
+
+
+def trace_seconds(records: list[dict[str, Any]]) -> float:
+    """Wall time from the first span's start to the last span's end."""
+    start = min(float(r["start"]) for r in records)
+    return max(float(r["start"] + r["duration"]) for r in records) - start
+
+
+def format_trace(records: list[dict[str, Any]]) -> str:
+    """A trace as an indented tree: offset from its start, duration, span."""
+    children: dict[str | None, list[dict[str, Any]]] = {}
+    for record in records:
+        children.setdefault(record["parent"], []).append(record)
+    root = _root(records)
+    origin = min(r["start"] for r in records)
+    lines: list[str] = []
+
+    def walk(record: dict[str, Any], depth: int) -> None:
+        attrs = " ".join(f"{k}={v}" for k, v in record.get("attrs", {}).items())
+        error = f"  ERROR {record['error']}" if "error" in record else ""
+        lines.append(
+            f"{record['start'] - origin:+9.3f}s {record['duration']:9.3f}s  "
+            f"{'  ' * depth}{record['name']}" + (f" [{attrs}]" if attrs else "") + error
+        )
+        for child in sorted(children.get(record["span"], []), key=lambda r: r["start"]):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def stage_totals(records: list[dict[str, Any]]) -> dict[str, float]:
+    """Seconds spent in each innermost span name of a trace, largest first.
+
+    Only spans without children count, so time is not counted twice (pages
+    run concurrently, so the total can exceed the document's duration).
+    """
+    parents = {record["parent"] for record in records}
+    totals: dict[str, float] = {}
+    for record in records:
+        if record["span"] in parents:
+            continue
+        totals[record["name"]] = totals.get(record["name"], 0.0) + record["duration"]
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def to_chrome_trace(traces: dict[str, list[dict[str, Any]]]) -> dict[str, Any]:
+    """Traces in the Chrome trace event format (chrome://tracing, Perfetto)."""
+    events = []
+    for tid, records in enumerate(traces.values(), start=1):
+        root = _root(records)
+        label = root.get("attrs", {}).get("path", root["name"])
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": tid,
+                "args": {"name": label},
+            }
+        )
+        for record in records:
+            events.append(
+                {
+                    "name": record["name"],
+                    "ph": "X",
+                    "pid": 1,
+                    "tid": tid,
+                    "ts": int(record["start"] * 1_000_000),
+                    "dur": int(record["duration"] * 1_000_000),
+                    "args": {
+                        **record.get("attrs", {}),
+                        **({"error": record["error"]} if "error" in record else {}),
+                    },
+                }
+            )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.tracing", description="Show document traces"
+    )
+    parser.add_argument("trace_file", help="trace file written by the service")
+    parser.add_argument(
+        "--slowest", type=int, default=5, help="show the N slowest documents"
+    )
+    parser.add_argument(
+        "--match", default="", help="only documents whose path contains this"
+    )
+    parser.add_argument(
+        "--chrome", metavar="OUT", help="write a Chrome/Perfetto trace file instead"
+    )
+    args = parser.parse_args(argv)
+
+    traces = load_traces(args.trace_file)
+    if args.match:
+        traces = {
+            trace_id: records
+            for trace_id, records in traces.items()
+            if args.match in str(_root(records).get("attrs", {}).get("path", ""))
+        }
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as handle:
+            json.dump(to_chrome_trace(traces), handle)
+        print(f"Wrote {len(traces)} traces to {args.chrome}")
+        return
+    slowest = sorted(traces.values(), key=trace_seconds, reverse=True)
+    for records in slowest[: args.slowest]:
+        print(format_trace(records))
+        totals = ", ".join(
+            f"{name} {s:.2f}s" for name, s in stage_totals(records).items()
+        )
+        print(f"  time per stage: {totals}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import logging
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger("pdf2md.writer")
+
+PARTIAL_SUFFIX = ".partial"
+
+# Partial files are named .<output>~<host>~<pid>~<random>.partial, so an
+# instance sharing OUTPUT_DIR can tell whose they are
+_PARTIAL_OWNER = re.compile(r"~(?P<host>[^~]+)~(?P<pid>\d+)~[^~]*\.partial$")
+
+# Mode bits cleared from outputs' 0666; load_umask() sets the process's own
+_UMASK = 0o022
+
+
+def load_umask() -> int:
+    """Read the process umask for the mode given to outputs.
+
+    os.umask() can only be read by setting it, which briefly affects files
+    created by every thread, so this is called once from main() before any
+    other threads start.
+    """
+    global _UMASK
+    _UMASK = os.umask(0)
+    os.umask(_UMASK)
+    return _UMASK
+
+
+def page_separator(delimiter: str) -> str:
+    """Text placed between pages for the configured MD_PAGE_DELIMITER."""
+    return "\n\n---\n\n" if delimiter == "delimited" else "\n\n"
+
+
+def _partial_file(output_path: Path) -> tuple[int, str]:
+    """Create the hidden temp file for output_path, in the same directory.
+
+    mkstemp() creates it as 0600; it gets the mode open() would have given the
+    output (0644 under the usual umask 022), since os.replace() keeps it.
+    """
+    fd, tmp_name = tempfile.mkstemp(
+        dir=output_path.parent,
+        prefix=f".{output_path.name}~{socket.gethostname()}~{os.getpid()}~",
+        suffix=PARTIAL_SUFFIX,
+    )
+    try:
+        os.fchmod(fd, 0o666 & ~_UMASK)
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp_name)
+        raise
+    return fd, tmp_name
+
+
+class MarkdownStreamWriter:
+    """Streams pages into a hidden temp file next to the output, in page order.
+
+    Pages may be added in any order as they finish; each one is written as soon
+    as every page before it has been written, so only out-of-order pages are
+    held in memory. commit() renames the temp file over the output path in one
+    atomic step, so readers of the output directory never see a partial file.
+    """
+
+    def __init__(self, output_path: str | Path, delimiter: str = "delimited") -> None:
+        self.output_path = Path(output_path)
+        self.separator = page_separator(delimiter)
+        fd, tmp_name = _partial_file(self.output_path)
+        self._tmp_path = Path(tmp_name)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._pending: dict[int, str] = {}
+        self._next_page = 1
+        self._done = False
+        self.pages_written = 0
+
+    def add_page(self, page_num: int, text: str) -> None:
+        """Add page page_num (1-based); writes it and any pages it unblocks."""
+        with self._lock:
+            self._pending[page_num] = text
+            while self._next_page in self._pending:
+                if self.pages_written:
+                    self._file.write(self.separator)
+                self._file.write(self._pending.pop(self._next_page))
+                self._next_page += 1
+                self.pages_written += 1
+
+    def commit(self, header: str | None = None) -> Path:
+        """Flush, fsync and atomically move the file into place.
+
+        If header is given it is placed before the first page (followed by the
+        page separator), e.g. a notice that every page failed.
+        """
+        with self._lock:
+            if self._pending:
+                missing = self._next_page
+                self.abort()
+                raise RuntimeError(
+                    f"Cannot commit {self.output_path}: page {missing} was never added"
+                )
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            if header is not None:
+                self._prepend(header + self.separator)
+            os.replace(self._tmp_path, self.output_path)
+            self._done = True
+        return self.output_path
+
+    def _prepend(self, text: str) -> None:
+        fd, tmp_name = _partial_file(self.output_path)
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            out.write(text)
+            with open(self._tmp_path, encoding="utf-8") as body:
+                shutil.copyfileobj(body, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_name, self._tmp_path)
+
+    def abort(self) -> None:
+        """Discard the partial file (safe to call more than once)."""
+        if self._done:
+            return
+        self._done = True
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        try:
+            self._tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove partial output {self._tmp_path}: {e}")
+
+
+def copy_output(source: str | Path, output_path: str | Path) -> Path:
+    """Copy an existing output to output_path through a partial file, atomically."""
+    output_path = Path(output_path)
+    fd, tmp_name = _partial_file(output_path)
+    try:
+        with os.fdopen(fd, "wb") as out, open(source, "rb") as src:
+            shutil.copyfileobj(src, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_name, output_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return output_path
+
+
+def _pid_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_partial_files(output_dir: str | Path, max_age: float = 86400.0) -> int:
+    """Delete partial outputs left behind by an interrupted run; returns the count.
+
+    OUTPUT_DIR may be shared by instances on other machines, so only partial
+    files of a process on this host that is no longer running are removed,
+    plus any not modified for max_age seconds (whose writer is long gone).
+    """
+    host = socket.gethostname()
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in Path(output_dir).glob(f".*{PARTIAL_SUFFIX}"):
+        try:
+            owner = _PARTIAL_OWNER.search(path.name)
+            abandoned = (
+                owner is not None
+                and owner["host"] == host
+                and not _pid_running(int(owner["pid"]))
+            )
+            if not abandoned and path.stat().st_mtime >= cutoff:
+                continue
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass  # committed or removed by its owner meanwhile
+        except OSError as e:
+            logger.warning(f"Could not remove stale partial output {path}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} stale partial output(s) from {output_dir}")
+    return removed
@@ -0,0 +1,17 @@
+import pytest
+from pypdf import PdfWriter
+
+
+@pytest.fixture
+def blank_pdf():
+    """Write a PDF of blank pages: blank_pdf(path, pages) returns path."""
+
+    def write(path, pages):
+        writer = PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(width=72, height=72)
+        with open(path, "wb") as f:
+            writer.write(f)
+        return path
+
+    return write
@@ -0,0 +1,126 @@
+import json
+
+import openai
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_server import FakeServer, FakeServerOptions
+from benchmarks.run import BenchmarkOptions, format_report, percentile, run_benchmark
+from benchmarks.soak import SoakOptions, find_growth, run_soak
+from benchmarks.soak import format_report as soak_report
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**options):
+        server = FakeServer(FakeServerOptions(**options)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def _complete(server):
+    client = openai.OpenAI(base_url=server.url, api_key="x", max_retries=0)
+    return client.chat.completions.create(
+        model="fake", messages=[{"role": "user", "content": "page"}]
+    )
+
+
+def test_fake_server_answers_with_olmocr_json(fake_server):
+    server = fake_server(latency=0.01, chars=100, seed=1)
+
+    response = _complete(server)
+
+    page = json.loads(response.choices[0].message.content)
+    assert len(page["natural_text"]) <= 100 and page["natural_text"]
+    assert server.stats()["requests"] == 1
+
+
+def test_fake_server_injects_failures(fake_server):
+    server = fake_server(latency=0.0, error_rate=1.0)
+
+    with pytest.raises(openai.InternalServerError):
+        _complete(server)
+    assert server.stats()["errors"] == 1
+
+
+def test_generate_corpus_skews_towards_short_documents(tmp_path):
+    corpus = generate_corpus(tmp_path, 20, min_pages=1, max_pages=6, seed=3)
+
+    assert len(corpus) == 20
+    assert all(path.exists() for path in corpus)
+    assert all(1 <= pages <= 6 for pages in corpus.values())
+    assert sorted(corpus.values())[10] <= 3
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([2.0], 95) == 2.0
+    assert percentile([], 50) == 0.0
+
+
+def test_run_benchmark_drives_the_service_end_to_end(tmp_path):
+    options = BenchmarkOptions(
+        documents=3,
+        max_pages=3,
+        render="skip",
+        timeout=60,
+        server=FakeServerOptions(latency=0.01, max_concurrency=2, seed=0),
+    )
+
+    results = run_benchmark(options, tmp_path)
+
+    assert results["finished"] == 3 and results["failed"] == 0
+    assert results["server"]["requests"] == results["pages"]
+    assert results["server"]["max_in_flight"] <= 2
+    assert results["page_latency"]["p50"] > 0
+    assert len(list((tmp_path / "output").glob("*.md"))) == 3
+    assert len(list((tmp_path / "done").glob("*.pdf"))) == 3
+
+    report = format_report(results, baseline={**results, "pages_per_sec": 1e9})
+    assert "pages/sec" in report and "worse" in report
+
+
+def _samples(values):
+    return [{"t": float(i * 60), "series": float(v)} for i, v in enumerate(values)]
+
+
+def test_find_growth_ignores_a_sawtooth_and_flags_a_rising_floor():
+    sawtooth = [0, 5, 9, 2, 0, 7, 3, 0, 8, 1, 0, 6, 4, 0, 9, 0] * 2
+    leak = [n // 2 + (n % 3) for n in range(32)]
+
+    assert find_growth(_samples(sawtooth)) == {}
+    growth = find_growth(_samples(leak))["series"]
+    assert growth["end"] > growth["start"]
+    assert growth["per_hour"] > 0
+    assert find_growth(_samples([1, 2])) == {}  # too few samples to tell
+
+
+def test_run_soak_samples_process_and_service_state(tmp_path):
+    options = SoakOptions(
+        duration=2.0,
+        rate=4.0,
+        sample_interval=0.5,
+        max_pages=2,
+        # Files must settle well within the 2 s run for one to reach done
+        env={"PDF2MD_STABLE_QUIET_PERIOD": "0.1"},
+        server=FakeServerOptions(latency=0.01),
+    )
+
+    results = run_soak(options, tmp_path / "work", tmp_path / "samples.jsonl")
+
+    assert results["documents"].get("done", 0) >= 1
+    last = results["samples"][-1]
+    assert last["rss_mb"] > 0 and last["open_fds"] > 0 and last["threads"] > 1
+    assert "pdf2md_tracked_files" in last
+    assert "pdf2md_trace_timestamps{table=first_seen}" in last
+    lines = (tmp_path / "samples.jsonl").read_text().splitlines()
+    assert len(lines) == len(results["samples"])
+    assert "pdf2md_tracked_files" in soak_report(results)
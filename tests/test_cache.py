@@ -0,0 +1,110 @@
+import os
+import time
+from unittest.mock import patch
+
+from src.cache import PageCache
+
+
+def _query(image="AAAA", anchor="anchor text", temperature=0.8):
+    return {
+        "model": "test-model",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": f"RAW_TEXT_START\n{anchor}\nRAW_TEXT_END"},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/png;base64,{image}"},
+                    },
+                ],
+            }
+        ],
+        "max_tokens": 3000,
+        "temperature": temperature,
+    }
+
+
+def test_make_key_depends_on_page_content_and_parameters():
+    """Image, anchor text, model and sampling parameters all change the key."""
+    base = PageCache.make_key(_query(), "model-a")
+    assert base == PageCache.make_key(_query(), "model-a")
+    assert base != PageCache.make_key(_query(image="BBBB"), "model-a")
+    assert base != PageCache.make_key(_query(anchor="other"), "model-a")
+    assert base != PageCache.make_key(_query(temperature=0.1), "model-a")
+    assert base != PageCache.make_key(_query(), "model-b")
+
+
+def test_get_put_and_counters(tmp_path):
+    """Misses and hits are counted and stored text round-trips."""
+    cache = PageCache(tmp_path / "cache", max_bytes=1024)
+    key = PageCache.make_key(_query(), "model")
+
+    assert cache.get(key) is None
+    cache.put(key, "# Page text ü")
+    assert cache.get(key) == "# Page text ü"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert stats["bytes"] == len("# Page text ü".encode())
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    """Once over the size cap, the least recently used entries go first."""
+    cache = PageCache(tmp_path / "cache", max_bytes=30)
+    cache.put("aa1", "x" * 10)
+    cache.put("bb2", "y" * 10)
+    cache.put("cc3", "z" * 10)
+    # Touch the oldest entry so it becomes most recently used
+    assert cache.get("aa1") == "x" * 10
+
+    cache.put("dd4", "w" * 10)
+
+    assert cache.get("bb2") is None
+    assert cache.get("aa1") == "x" * 10
+    assert cache.get("cc3") == "z" * 10
+    assert cache.get("dd4") == "w" * 10
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 30
+    assert not (tmp_path / "cache" / "bb" / "bb2.txt").exists()
+
+
+def test_cache_persists_and_restores_recency(tmp_path):
+    """A new instance reloads entries and keeps LRU order from file mtimes."""
+    cache_dir = tmp_path / "cache"
+    cache = PageCache(cache_dir, max_bytes=100)
+    cache.put("aa1", "old")
+    cache.put("bb2", "new")
+    now = time.time()
+    os.utime(cache_dir / "aa" / "aa1.txt", (now - 100, now - 100))
+
+    reloaded = PageCache(cache_dir, max_bytes=100)
+    assert reloaded.stats()["entries"] == 2
+    assert reloaded.get("bb2") == "new"
+
+    # Shrinking the cap evicts the older entry on startup
+    small = PageCache(cache_dir, max_bytes=3)
+    assert small.get("aa1") is None
+    assert small.get("bb2") == "new"
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path):
+    """A full disk (say) leaves neither an entry nor its temp file behind."""
+    cache = PageCache(tmp_path / "cache", max_bytes=100)
+    with patch("src.cache.os.replace", side_effect=OSError("No space left")):
+        cache.put("aa1", "text")
+
+    assert cache.get("aa1") is None
+    assert list((tmp_path / "cache").rglob("*")) == [tmp_path / "cache" / "aa"]
+
+
+def test_unreadable_entry_counts_as_miss(tmp_path):
+    """An entry deleted behind the cache's back is dropped, not fatal."""
+    cache = PageCache(tmp_path / "cache", max_bytes=100)
+    cache.put("aa1", "text")
+    (tmp_path / "cache" / "aa" / "aa1.txt").unlink()
+
+    assert cache.get("aa1") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,66 @@
+import os
+import time
+from unittest.mock import patch
+
+from src.checkpoint import CheckpointStore
+
+
+def test_save_load_and_clear(tmp_path):
+    """Pages round-trip with their source and are removed by clear()."""
+    store = CheckpointStore(tmp_path / "checkpoints")
+    assert store.load("abc") == {}
+
+    store.save_page("abc", 2, "# Page 2")
+    store.save_page("abc", 10, "Text layer page", source="text-layer")
+    store.save_page("def", 1, "Other document")
+
+    assert store.load("abc") == {
+        2: ("# Page 2", "ocr"),
+        10: ("Text layer page", "text-layer"),
+    }
+
+    store.clear("abc")
+    assert store.load("abc") == {}
+    assert store.load("def") == {1: ("Other document", "ocr")}
+
+
+def test_save_page_overwrites_and_skips_bad_files(tmp_path):
+    """Re-saving a page replaces it; corrupt checkpoint files are ignored."""
+    store = CheckpointStore(tmp_path)
+    store.save_page("abc", 1, "first try")
+    store.save_page("abc", 1, "second try")
+    (tmp_path / "abc" / "00002.json").write_text("{truncated")
+
+    assert store.load("abc") == {1: ("second try", "ocr")}
+    assert not list((tmp_path / "abc").glob("*.tmp"))
+
+    # A failed write (a full disk, say) is only logged and leaves no temp file
+    with patch("src.checkpoint.os.replace", side_effect=OSError("No space left")):
+        store.save_page("abc", 3, "lost")
+    assert not list((tmp_path / "abc").glob("*.tmp"))
+
+
+def test_prune_drops_documents_untouched_for_too_long(tmp_path):
+    store = CheckpointStore(tmp_path / "checkpoints")
+    store.save_page("old", 1, "abandoned")
+    store.save_page("new", 1, "in progress")
+    week_ago = time.time() - 8 * 86400
+    os.utime(tmp_path / "checkpoints" / "old", (week_ago, week_ago))
+
+    assert store.prune(7 * 86400) == 1
+
+    assert store.load("old") == {}
+    assert store.load("new") == {1: ("in progress", "ocr")}
+    assert CheckpointStore(tmp_path / "missing").prune(0) == 0
+
+
+def test_load_ignores_pages_saved_under_other_settings(tmp_path):
+    """Pages from a run with another model or image sizes are not reused."""
+    settings = {"model": "a", "image_dims": (1024,)}
+    CheckpointStore(tmp_path, settings).save_page("abc", 1, "model a")
+    CheckpointStore(tmp_path).save_page("abc", 2, "no settings")
+
+    assert CheckpointStore(tmp_path, settings).load("abc") == {1: ("model a", "ocr")}
+    other = {"model": "b", "image_dims": (1024,)}
+    assert CheckpointStore(tmp_path, other).load("abc") == {}
+    assert CheckpointStore(tmp_path).load("abc") == {2: ("no settings", "ocr")}
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+from openai import APITimeoutError
+
+from src.concurrency import AimdLimiter
+from src.endpoints import EndpointPool, EndpointSpec
+
+
+def test_limiter_grows_additively_when_saturated():
+    limiter = AimdLimiter("lm", initial_limit=2, max_limit=4)
+    now = time.monotonic()
+    # About one step per round of `limit` successes
+    for _ in range(3):
+        limiter.on_success(1.0, now, in_flight=2)
+    assert limiter.limit == 3
+    for _ in range(20):
+        limiter.on_success(1.0, now, in_flight=limiter.limit)
+    assert limiter.limit == 4  # capped at max_limit
+
+
+def test_limiter_does_not_grow_when_limit_is_not_used():
+    limiter = AimdLimiter("lm", initial_limit=2)
+    for _ in range(10):
+        limiter.on_success(1.0, time.monotonic(), in_flight=1)
+    assert limiter.limit == 2
+
+
+def test_limiter_halves_once_per_overload_burst():
+    limiter = AimdLimiter("lm", initial_limit=8, max_limit=8)
+    sent = time.monotonic()
+    # Four requests sent together all time out: one decrease, not four
+    for _ in range(4):
+        limiter.on_overload(sent, "APITimeoutError")
+    assert limiter.limit == 4
+    assert limiter.decreases == 1
+    # A request sent after the cut can cut again
+    limiter.on_overload(time.monotonic() + 1, "APITimeoutError")
+    assert limiter.limit == 2
+    for _ in range(5):
+        limiter.on_overload(time.monotonic() + 10, "APITimeoutError")
+    assert limiter.limit == 1  # never below min_limit
+
+
+def test_limiter_treats_slow_responses_as_overload():
+    limiter = AimdLimiter("lm", initial_limit=4, latency_target=10.0)
+    limiter.on_success(25.0, time.monotonic(), in_flight=4)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_applies_adaptive_limit():
+    pool = EndpointPool(
+        (EndpointSpec("http://a", max_concurrency=3),),
+        "key",
+        adaptive_max_concurrency=16,
+    )
+    endpoint = pool.endpoints[0]
+    assert endpoint.limiter is not None
+    assert endpoint.limiter.max_limit == 3  # the endpoint's own cap wins
+    assert pool.stats()[0]["limit"] == 2
+
+    started = time.monotonic()
+    await pool.acquire()
+    await pool.acquire()
+    assert not endpoint.has_capacity()
+    await pool.release(endpoint, APITimeoutError("timeout"), started)
+    assert pool.stats()[0]["limit"] == 1
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_page_scheduler_round_robins_between_documents():
+    import asyncio
+
+    from src.concurrency import PageScheduler
+
+    scheduler = PageScheduler(1)
+    await scheduler.acquire("held")
+    granted: list[str] = []
+
+    async def page(document):
+        await scheduler.acquire(document)
+        granted.append(document)
+
+    tasks = [asyncio.create_task(page("big")) for _ in range(3)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(page("small")) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert scheduler.waiting() == 5
+
+    for _ in range(5):
+        scheduler.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    assert granted == ["big", "small", "big", "small", "big"]
+    assert scheduler.in_use == 1
+
+
+@pytest.mark.asyncio
+async def test_page_scheduler_cancelled_waiter_gives_up_its_turn():
+    import asyncio
+
+    from src.concurrency import PageScheduler
+
+    scheduler = PageScheduler(1)
+    await scheduler.acquire("a")
+    waiter = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+
+    assert scheduler.waiting() == 0
+    scheduler.release()
+    assert scheduler.in_use == 0
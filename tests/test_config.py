@@ -47,12 +47,69 @@ def test_config_defaults(monkeypatch):
     monkeypatch.delenv("PDF2MD_LM_STUDIO_API_KEY", raising=False)
     monkeypatch.delenv("PDF2MD_LOG_FILE", raising=False)
     monkeypatch.delenv("PDF2MD_MD_PAGE_DELIMITER", raising=False)
+    monkeypatch.delenv("PDF2MD_OCR_PAGE_CONCURRENCY", raising=False)
+    monkeypatch.delenv("PDF2MD_PAGE_SLOTS", raising=False)
+    monkeypatch.delenv("PDF2MD_CACHE_DIR", raising=False)
+    monkeypatch.delenv("PDF2MD_DEDUPE_INDEX", raising=False)
+    monkeypatch.delenv("PDF2MD_CHECKPOINT_DIR", raising=False)
+    monkeypatch.delenv("PDF2MD_LM_STUDIO_ENDPOINTS", raising=False)
+    monkeypatch.delenv("PDF2MD_ADAPTIVE_MAX_CONCURRENCY", raising=False)
+    monkeypatch.delenv("PDF2MD_IMAGE_DIMS", raising=False)
+    monkeypatch.delenv("PDF2MD_METRICS_PORT", raising=False)
+    monkeypatch.delenv("PDF2MD_TRACE_FILE", raising=False)
+    monkeypatch.delenv("PDF2MD_CIRCUIT_BREAKER", raising=False)
+    monkeypatch.delenv("PDF2MD_CIRCUIT_MAX_OUTAGE", raising=False)
 
     cfg = load_config()
     assert cfg.LM_STUDIO_MODEL == "allenai_olmocr-7b-0225-preview"
     assert cfg.LM_STUDIO_API_KEY == "lm-studio"
     assert cfg.LOG_FILE == "app.log"
     assert cfg.MD_PAGE_DELIMITER == "delimited"
+    assert cfg.OCR_PAGE_CONCURRENCY == 2
+    assert cfg.PAGE_SLOTS == 8
+    assert cfg.CACHE_DIR == ""
+    assert cfg.DEDUPE_INDEX == "/tmp/out/.pdf2md-index.jsonl"
+    assert cfg.CHECKPOINT_DIR == "/tmp/out/.pdf2md-checkpoints"
+    assert cfg.CHECKPOINT_MAX_AGE_DAYS == 7.0
+    assert cfg.STABLE_QUIET_PERIOD == 2.0
+    assert cfg.JOB_STORE == os.path.join(os.getcwd(), ".pdf2md-jobs.sqlite3")
+    assert cfg.LM_STUDIO_ENDPOINTS == ""
+    assert cfg.ENDPOINT_FAILURE_THRESHOLD == 3
+    assert cfg.ADAPTIVE_MAX_CONCURRENCY == 8
+    assert cfg.IMAGE_DIMS == (1024,)
+    assert cfg.ANCHOR_TEXT_LEN == 6000
+    assert cfg.METRICS_PORT == 0
+    assert cfg.TRACE_FILE == ""
+    assert cfg.CIRCUIT_BREAKER is True
+    assert cfg.CIRCUIT_MAX_OUTAGE == 900.0
+
+
+def test_config_page_concurrency(monkeypatch):
+    monkeypatch.setenv("PDF2MD_INPUT_DIR", "/tmp/in")
+    monkeypatch.setenv("PDF2MD_OUTPUT_DIR", "/tmp/out")
+    monkeypatch.setenv("PDF2MD_DONE_DIR", "/tmp/done")
+    monkeypatch.setenv("PDF2MD_OCR_PAGE_CONCURRENCY", "6")
+
+    cfg = load_config()
+    assert cfg.OCR_PAGE_CONCURRENCY == 6
+
+    monkeypatch.setenv("PDF2MD_OCR_PAGE_CONCURRENCY", "many")
+    with pytest.raises(RuntimeError, match="PDF2MD_OCR_PAGE_CONCURRENCY"):
+        load_config()
+
+
+def test_config_image_dims(monkeypatch):
+    monkeypatch.setenv("PDF2MD_INPUT_DIR", "/tmp/in")
+    monkeypatch.setenv("PDF2MD_OUTPUT_DIR", "/tmp/out")
+    monkeypatch.setenv("PDF2MD_DONE_DIR", "/tmp/done")
+    monkeypatch.setenv("PDF2MD_IMAGE_DIMS", "1024, 1536")
+
+    assert load_config().IMAGE_DIMS == (1024, 1536)
+
+    for bad in ("", "1024,big", "0"):
+        monkeypatch.setenv("PDF2MD_IMAGE_DIMS", bad)
+        with pytest.raises(RuntimeError, match="PDF2MD_IMAGE_DIMS"):
+            load_config()
 
 
 def test_get_env_var_with_default():
@@ -81,3 +138,17 @@ def test_get_env_var_required_missing():
         match="Missing required environment variable: NON_EXISTENT_REQUIRED",
     ):
         get_env_var("NON_EXISTENT_REQUIRED", required=True)
+
+
+def test_get_env_bool(monkeypatch):
+    from src.config import get_env_bool
+
+    monkeypatch.setenv("TEST_FLAG", "off")
+    assert get_env_bool("TEST_FLAG", True) is False
+    monkeypatch.setenv("TEST_FLAG", "Yes")
+    assert get_env_bool("TEST_FLAG", False) is True
+    monkeypatch.delenv("TEST_FLAG")
+    assert get_env_bool("TEST_FLAG", True) is True
+    monkeypatch.setenv("TEST_FLAG", "maybe")
+    with pytest.raises(RuntimeError, match="Invalid boolean"):
+        get_env_bool("TEST_FLAG", False)
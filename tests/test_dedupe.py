@@ -0,0 +1,64 @@
+import hashlib
+import json
+
+from src.dedupe import DocumentIndex, file_sha256
+
+
+def test_file_sha256_matches_hashlib(tmp_path):
+    """Chunked hashing matches a one-shot hash of the file."""
+    path = tmp_path / "doc.pdf"
+    data = b"%PDF-1.4 " + b"x" * 5000
+    path.write_bytes(data)
+
+    assert file_sha256(path, chunk_size=1024) == hashlib.sha256(data).hexdigest()
+
+
+def test_record_and_lookup(tmp_path):
+    """A recorded document is found by hash and survives a reload."""
+    output = tmp_path / "doc.md"
+    output.write_text("# Converted")
+    index_path = tmp_path / "index.jsonl"
+
+    index = DocumentIndex(index_path)
+    assert index.lookup("abc") is None
+    index.record("abc", output, "doc.pdf")
+    assert index.lookup("abc") == output
+
+    reloaded = DocumentIndex(index_path)
+    assert len(reloaded) == 1
+    assert reloaded.lookup("abc") == output
+
+
+def test_lookup_ignores_changed_or_missing_output(tmp_path):
+    """An output that was overwritten or deleted is not reused."""
+    output = tmp_path / "doc.md"
+    output.write_text("# Converted")
+    index = DocumentIndex(tmp_path / "index.jsonl")
+    index.record("abc", output, "doc.pdf")
+
+    output.write_text("# Some other document with the same name")
+    assert index.lookup("abc") is None
+
+    index.record("def", output, "other.pdf")
+    output.unlink()
+    assert index.lookup("def") is None
+
+
+def test_later_entries_win_and_bad_lines_are_skipped(tmp_path):
+    """Replaying the log keeps the latest entry per hash and skips junk."""
+    first = tmp_path / "first.md"
+    second = tmp_path / "second.md"
+    first.write_text("one")
+    second.write_text("two")
+    index_path = tmp_path / "index.jsonl"
+
+    index = DocumentIndex(index_path)
+    index.record("abc", first, "first.pdf")
+    index.record("abc", second, "second.pdf")
+    with open(index_path, "a") as f:
+        f.write("not json\n")
+        f.write(json.dumps({"unexpected": True}) + "\n")
+
+    reloaded = DocumentIndex(index_path)
+    assert len(reloaded) == 1
+    assert reloaded.lookup("abc") == second
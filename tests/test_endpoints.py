@@ -0,0 +1,237 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    BadRequestError,
+    NotFoundError,
+)
+
+from src.endpoints import (
+    EndpointPool,
+    EndpointSpec,
+    is_endpoint_failure,
+    parse_endpoints,
+)
+
+
+def test_parse_endpoints():
+    assert parse_endpoints("", "http://default/v1") == (
+        EndpointSpec("http://default/v1"),
+    )
+    assert parse_endpoints(
+        "http://a:1234/v1|2|4, http://b:1234/v1, http://c:1234/v1||1", "unused"
+    ) == (
+        EndpointSpec("http://a:1234/v1", 2.0, 4),
+        EndpointSpec("http://b:1234/v1", 1.0, 0),
+        EndpointSpec("http://c:1234/v1", 1.0, 1),
+    )
+    with pytest.raises(RuntimeError, match="Invalid weight"):
+        parse_endpoints("http://a|heavy", "unused")
+    with pytest.raises(RuntimeError, match="positive"):
+        parse_endpoints("http://a|0", "unused")
+
+
+@pytest.mark.asyncio
+async def test_pool_routes_by_weighted_load_and_capacity():
+    pool = EndpointPool(
+        (
+            EndpointSpec("http://a", weight=2, max_concurrency=2),
+            EndpointSpec("http://b"),
+        ),
+        "key",
+    )
+    urls = [(await pool.acquire()).url for _ in range(3)]
+    # a (weight 2) takes two requests before b is less loaded; a is then full
+    assert sorted(urls) == ["http://a", "http://a", "http://b"]
+
+    a = pool.endpoints[0]
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.01)
+    # b (1 in flight, weight 1) vs a at capacity: b still wins without waiting
+    assert waiter.done()
+    assert waiter.result().url == "http://b"
+
+    await pool.release(a, None)
+    assert (await pool.acquire()).url == "http://a"
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_waits_while_all_endpoints_are_full():
+    pool = EndpointPool((EndpointSpec("http://a", max_concurrency=1),), "key")
+    first = await pool.acquire()
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    await pool.release(first, None)
+    assert (await asyncio.wait_for(waiter, 1)) is first
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_benches_failing_endpoint_and_probes_it_back():
+    pool = EndpointPool(
+        (EndpointSpec("http://a"), EndpointSpec("http://b")),
+        "key",
+        failure_threshold=2,
+        probe_interval=0.05,
+    )
+    a, b = pool.endpoints
+    a.client.models.list = AsyncMock(side_effect=[APITimeoutError("down"), None])
+
+    # Request errors (4xx) don't count against the endpoint
+    await pool.acquire()
+    bad_request = BadRequestError(
+        "bad image",
+        response=httpx.Response(400, request=httpx.Request("POST", "http://a")),
+        body=None,
+    )
+    await pool.release(a, bad_request)
+    assert a.healthy
+
+    for _ in range(2):
+        await pool.acquire()
+        await pool.release(a, APITimeoutError("timeout"))
+    assert not a.healthy
+    # All traffic goes to b while a is out of rotation
+    assert [(await pool.acquire()).url for _ in range(3)] == ["http://b"] * 3
+
+    await asyncio.sleep(0.2)
+    assert a.healthy
+    assert a.client.models.list.await_count == 2
+    assert (await pool.acquire()).url == "http://a"
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_keeps_using_endpoints_when_all_are_down():
+    pool = EndpointPool((EndpointSpec("http://a"),), "key", failure_threshold=1)
+    a = await pool.acquire()
+    await pool.release(a, APITimeoutError("timeout"))
+    assert not a.healthy
+    # Callers still get an endpoint; their own retry/backoff sees the errors
+    assert await pool.acquire() is a
+    await pool.release(a, None)
+    assert a.healthy
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_holds_requests_until_a_probe_succeeds():
+    pool = EndpointPool(
+        (EndpointSpec("http://a"),),
+        "key",
+        failure_threshold=2,
+        probe_interval=0.05,
+        circuit_breaker=True,
+    )
+    a = pool.endpoints[0]
+    a.client.models.list = AsyncMock(side_effect=[APITimeoutError("down"), None, None])
+    for _ in range(2):
+        await pool.acquire()
+        await pool.release(a, APITimeoutError("timeout"))
+    assert pool.circuit_open
+
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.07)
+    assert not waiter.done()  # the first probe failed too
+    assert await asyncio.wait_for(waiter, 1) is a
+    assert not pool.circuit_open
+
+    # On trial: one request at a time, and one more failure opens the circuit
+    # again but counts against the request
+    second = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not second.done()
+    error = APIConnectionError(request=httpx.Request("POST", "http://a"))
+    assert await pool.release(a, error) is False
+    assert pool.circuit_open
+    second.cancel()
+    await pool.close()
+
+
+def _status_error(cls, status, message):
+    response = httpx.Response(status, request=httpx.Request("POST", "http://a"))
+    return cls(message, response=response, body={"error": message})
+
+
+def test_unloaded_model_is_an_endpoint_failure():
+    """LM Studio's no-model answers mean the server can't OCR, like a 5xx."""
+    assert is_endpoint_failure(
+        _status_error(
+            NotFoundError,
+            404,
+            "No models loaded. Please load a model in the developer page.",
+        )
+    )
+    assert is_endpoint_failure(
+        _status_error(BadRequestError, 400, "Model 'olmocr' not found")
+    )
+    assert not is_endpoint_failure(
+        _status_error(BadRequestError, 400, "Invalid image_url")
+    )
+
+
+@pytest.mark.asyncio
+async def test_probe_checks_that_the_model_is_loaded():
+    """With probe_model, recovery needs a completion, not just a model list."""
+    pool = EndpointPool(
+        (EndpointSpec("http://a"),),
+        "key",
+        failure_threshold=1,
+        probe_interval=0.05,
+        circuit_breaker=True,
+        probe_model="olmocr",
+    )
+    a = pool.endpoints[0]
+    a.client.models.list = AsyncMock()
+    a.client.chat.completions.create = AsyncMock(
+        side_effect=[_status_error(NotFoundError, 404, "No models loaded"), None]
+    )
+    await pool.acquire()
+    no_model = _status_error(NotFoundError, 404, "No models loaded")
+    assert await pool.release(a, no_model) is True
+    assert pool.circuit_open
+
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.07)
+    assert not waiter.done()  # the first probe found no model either
+    assert await asyncio.wait_for(waiter, 1) is a
+    a.client.models.list.assert_not_called()
+    probe = a.client.chat.completions.create.await_args
+    assert probe.kwargs["model"] == "olmocr"
+    assert probe.kwargs["max_tokens"] == 1
+    await pool.release(a, None)
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_circuit_gives_up_waiting_after_max_outage(caplog):
+    """A model that never loads fails requests after max_outage, not never."""
+    pool = EndpointPool(
+        (EndpointSpec("http://a"),),
+        "key",
+        failure_threshold=1,
+        probe_interval=60,
+        circuit_breaker=True,
+        probe_model="olmocr",
+        max_outage=0.1,
+    )
+    a = await pool.acquire()
+    no_model = _status_error(BadRequestError, 400, "Model 'olmocr' not found")
+    with caplog.at_level("ERROR", logger="pdf2md.endpoints"):
+        assert await pool.release(a, no_model) is True
+        assert "has not loaded model 'olmocr'" in caplog.text
+        assert pool.circuit_open
+
+        # The waiter is let through once the outage has lasted max_outage
+        assert await asyncio.wait_for(pool.acquire(), 1) is a
+        assert not pool.circuit_open
+        assert "down for over 0.1s" in caplog.text
+    # ...and its failure now counts against the request
+    assert await pool.release(a, no_model) is False
+    await pool.close()
@@ -45,8 +45,8 @@ def test_end_to_end_pipeline(integration_env, monkeypatch):
 
     with patch.object(
         OcrProcessor,
-        "process_pdf_to_markdown",
-        new=AsyncMock(return_value="# Dummy Markdown\n\n---\n\nPage 2"),
+        "process_page",
+        new=AsyncMock(return_value="# Dummy Markdown"),
     ):
         from src.pdf2md_service import on_new_pdf
 
@@ -57,6 +57,8 @@ def test_end_to_end_pipeline(integration_env, monkeypatch):
     with open(md_files[0]) as f:
         content = f.read()
     assert "Dummy Markdown" in content
+    # The temp file was renamed into place, not left behind
+    assert list(output_dir.glob("*.partial")) == []
     # Check PDF moved
     assert not pdf_path.exists()
     moved_pdfs = list(done_dir.glob("*.pdf"))
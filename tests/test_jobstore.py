@@ -0,0 +1,105 @@
+import time
+
+from src.jobstore import (
+    ABANDONED,
+    DONE,
+    FAILED,
+    INTERRUPTED,
+    QUEUED,
+    REMOVED,
+    RUNNING,
+    JobStore,
+)
+from src.ocr import PageResult
+
+
+def test_job_lifecycle_records_pages(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    pdf = tmp_path / "a.pdf"
+
+    job_id = store.enqueued(pdf)
+    assert store.enqueued(pdf) == job_id  # still queued: same job
+    assert store.status(pdf) == QUEUED
+    assert store.started(pdf) == job_id
+    assert store.status(pdf) == RUNNING
+
+    store.finished(
+        pdf,
+        DONE,
+        output=tmp_path / "a.md",
+        num_pages=2,
+        pages=[
+            PageResult(1, "ocr", True, 3.0, 120),
+            PageResult(2, "text-layer", False, 0.0, 0),
+        ],
+    )
+
+    assert store.status(pdf) == DONE
+    assert store.counts() == {DONE: 1}
+    assert store.enqueued(pdf) != job_id  # finished: queuing again is a new job
+    stats = {row["source"]: row for row in store.page_stats(0)}
+    assert stats["ocr"]["pages"] == 1 and stats["ocr"]["avg_seconds"] == 3.0
+    assert stats["text-layer"]["failed"] == 1
+    store.close()
+
+
+def test_unfinished_jobs_survive_a_restart(tmp_path):
+    db = tmp_path / "jobs.sqlite3"
+    queued, running, gone, crashy = (tmp_path / f"{n}.pdf" for n in "qrgc")
+    for pdf in (queued, running, crashy):
+        pdf.write_bytes(b"%PDF")
+    store = JobStore(db)
+    for pdf in (running, queued, gone, crashy):
+        store.enqueued(pdf)
+    store.started(running)
+    for _ in range(2):  # the service dies while converting it, twice
+        store.started(crashy)
+        store.close()
+        store = JobStore(db)
+        store.unfinished(max_attempts=3)
+    store.started(crashy)
+    store.close()
+
+    store = JobStore(db)
+    assert store.unfinished(max_attempts=3) == [running, queued]
+    assert store.status(gone) == REMOVED
+    assert store.status(crashy) == ABANDONED
+    assert store.abandoned(crashy)
+    store.close()
+
+
+def test_clean_stops_dont_count_and_changed_files_start_afresh(tmp_path):
+    db = tmp_path / "jobs.sqlite3"
+    slow, crashy = tmp_path / "slow.pdf", tmp_path / "crashy.pdf"
+    for pdf in (slow, crashy):
+        pdf.write_bytes(b"%PDF")
+    store = JobStore(db)
+    for _ in range(3):
+        store.started(slow)
+        assert store.interrupted() == 1  # a clean shutdown mid-conversion
+        assert store.status(slow) == INTERRUPTED
+        assert store.unfinished(max_attempts=1) == [slow]
+    assert store.status(slow) == QUEUED
+
+    store.started(crashy)
+    assert store.unfinished(max_attempts=1) == [slow]
+    assert store.abandoned(crashy)
+    crashy.write_bytes(b"%PDF corrected")
+    assert not store.abandoned(crashy)  # a different file under the same name
+    store.close()
+
+
+def test_throughput_buckets_finished_jobs(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    for name, status in (("a", DONE), ("b", DONE), ("c", FAILED)):
+        pdf = tmp_path / f"{name}.pdf"
+        store.started(pdf)
+        store.finished(pdf, status, num_pages=4)
+
+    rows = store.throughput(time.time() - 3600)
+
+    assert sum(row["documents"] for row in rows) == 3
+    assert sum(row["failed"] for row in rows) == 1
+    assert sum(row["pages"] for row in rows) == 12
+    assert store.throughput(time.time() + 60) == []
+    store.close()
@@ -0,0 +1,129 @@
+import urllib.request
+
+import pytest
+
+from src.metrics import (
+    REGISTRY,
+    Family,
+    Registry,
+    process_stats,
+    start_metrics_server,
+)
+
+
+def test_counter_renders_per_label_combination():
+    registry = Registry()
+    pages = registry.counter("pages_total", "Pages", ("source", "result"))
+    pages.inc(source="ocr", result="ok")
+    pages.inc(2, source="ocr", result="ok")
+    pages.inc(source="cache", result="ok")
+
+    text = registry.render()
+
+    assert "# HELP pages_total Pages\n# TYPE pages_total counter\n" in text
+    assert 'pages_total{source="ocr",result="ok"} 3\n' in text
+    assert 'pages_total{source="cache",result="ok"} 1\n' in text
+    assert pages.value(source="ocr", result="ok") == 3
+
+
+def test_counter_rejects_wrong_labels():
+    registry = Registry()
+    errors = registry.counter("errors_total", "Errors", ("type",))
+    with pytest.raises(ValueError):
+        errors.inc(kind="timeout")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    stage = registry.histogram("stage_seconds", "Stages", ("stage",))
+    for value in (0.03, 0.3, 3.0, 5000.0):
+        stage.observe(value, stage="render")
+
+    text = registry.render()
+
+    assert 'stage_seconds_bucket{stage="render",le="0.01"} 0\n' in text
+    assert 'stage_seconds_bucket{stage="render",le="0.05"} 1\n' in text
+    assert 'stage_seconds_bucket{stage="render",le="0.5"} 2\n' in text
+    assert 'stage_seconds_bucket{stage="render",le="5"} 3\n' in text
+    assert 'stage_seconds_bucket{stage="render",le="900"} 3\n' in text
+    assert 'stage_seconds_bucket{stage="render",le="+Inf"} 4\n' in text
+    assert 'stage_seconds_sum{stage="render"} 5003.33\n' in text
+    assert 'stage_seconds_count{stage="render"} 4\n' in text
+
+
+def test_histogram_times_blocks_that_raise():
+    registry = Registry()
+    stage = registry.histogram("stage_seconds", "Stages", ("stage",))
+    with pytest.raises(RuntimeError), stage.time(stage="write"):
+        raise RuntimeError("disk full")
+    assert stage.count(stage="write") == 1
+
+
+def test_collectors_are_read_at_scrape_time():
+    registry = Registry()
+    depth = {"n": 1}
+
+    def collect():
+        return [Family("queue_depth", "gauge", "Queued", [({}, depth["n"])])]
+
+    def broken():
+        raise RuntimeError("gone")
+
+    registry.add_collector("queue", collect)
+    registry.add_collector("broken", broken)
+    assert "queue_depth 1\n" in registry.render()
+    depth["n"] = 5
+    assert "queue_depth 5\n" in registry.render()  # a broken collector is skipped
+
+    registry.remove_collector("queue")
+    assert "queue_depth" not in registry.render()
+
+
+def test_metrics_server_serves_text_format():
+    registry = Registry()
+    registry.counter("documents_total", "Documents", ("status",)).inc(status="done")
+    server = start_metrics_server(0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode()
+            content_type = response.headers["Content-Type"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert 'documents_total{status="done"} 1\n' in body
+
+
+def test_process_metrics_report_memory_fds_and_threads(tmp_path):
+    before = process_stats()
+    with open(tmp_path / "a", "w"), open(tmp_path / "b", "w"):
+        during = process_stats()
+
+    assert before["rss_bytes"] > 1_000_000
+    assert during["open_fds"] == before["open_fds"] + 2
+    assert before["threads"] >= 1
+    names = {family.name for family in REGISTRY.collect()}
+    assert {"process_resident_memory_bytes", "process_open_fds"} <= names
+
+
+def test_resident_memory_falls_back_to_getrusage(monkeypatch):
+    """Without procfs the peak from getrusage is used; no process is started."""
+    import builtins
+    import subprocess
+
+    real_open = builtins.open
+
+    def no_procfs(path, *args, **kwargs):
+        if str(path).startswith("/proc/"):
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    def no_subprocesses(*args, **kwargs):
+        raise AssertionError("scrapes must not start processes")
+
+    monkeypatch.setattr(builtins, "open", no_procfs)
+    monkeypatch.setattr(subprocess, "Popen", no_subprocesses)
+
+    assert process_stats()["rss_bytes"] > 1_000_000
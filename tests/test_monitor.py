@@ -144,6 +144,7 @@ def test_pdf_handler_on_created_callback_exception():
     """Test PDFHandler handles callback exceptions on creation."""
     callback = MagicMock(side_effect=Exception("Callback error"))
     handler = PDFHandler(callback)
+    handler.start_workers()
 
     # Create mock event
     mock_event = MagicMock()
@@ -151,6 +152,10 @@ def test_pdf_handler_on_created_callback_exception():
     mock_event.src_path = "/test/file.pdf"
 
     handler.on_created(mock_event)
+    handler.queue.join()
+    handler.stop_workers()
+
+    callback.assert_called_once_with("/test/file.pdf")
 
     # File should be removed from seen set after error
     test_path = Path("/test/file.pdf")
@@ -181,6 +186,7 @@ def test_pdf_handler_on_moved():
     """Test PDFHandler on_moved method."""
     callback = MagicMock()
     handler = PDFHandler(callback)
+    handler.start_workers()
 
     # Create mock event
     mock_event = MagicMock()
@@ -188,6 +194,8 @@ def test_pdf_handler_on_moved():
     mock_event.dest_path = "/test/moved.pdf"
 
     handler.on_moved(mock_event)
+    handler.queue.join()
+    handler.stop_workers()
 
     # Callback should be called
     callback.assert_called_once_with("/test/moved.pdf")
@@ -200,6 +208,7 @@ def test_pdf_handler_on_moved_callback_exception():
     """Test PDFHandler handles callback exceptions on move."""
     callback = MagicMock(side_effect=Exception("Callback error"))
     handler = PDFHandler(callback)
+    handler.start_workers()
 
     # Create mock event
     mock_event = MagicMock()
@@ -207,6 +216,8 @@ def test_pdf_handler_on_moved_callback_exception():
     mock_event.dest_path = "/test/moved.pdf"
 
     handler.on_moved(mock_event)
+    handler.queue.join()
+    handler.stop_workers()
 
     # File should be removed from seen set after error
     test_path = Path("/test/moved.pdf")
@@ -328,8 +339,6 @@ def test_monitor_folder_with_handler_callback():
 
 def test_process_existing_pdfs():
     """Test _process_existing_pdfs function queues existing PDF files for processing."""
-    import time
-
     from src.monitor import _process_existing_pdfs
 
     detected = []
@@ -338,6 +347,7 @@ def test_process_existing_pdfs():
         detected.append(path)
 
     handler = PDFHandler(callback)
+    handler.start_workers()
 
     with patch("pathlib.Path.glob") as mock_glob:
         # Create mock Path objects
@@ -352,10 +362,11 @@ def test_process_existing_pdfs():
         mock_glob.return_value = [pdf1_path, pdf2_path]
 
         input_dir = Path("/fake/path")
-        _process_existing_pdfs(input_dir, handler, callback)
+        _process_existing_pdfs(input_dir, handler)
 
-        # Give threads a moment to start processing
-        time.sleep(0.1)
+        # Wait for the worker pool to drain the queue
+        handler.queue.join()
+        handler.stop_workers()
 
         # Should have processed both files (eventually)
         assert len(detected) == 2
@@ -382,7 +393,7 @@ def test_process_existing_pdfs_no_files():
         mock_glob.return_value = []
 
         input_dir = Path("/fake/path")
-        _process_existing_pdfs(input_dir, handler, callback)
+        _process_existing_pdfs(input_dir, handler)
 
         # Should have processed no files
         assert len(detected) == 0
@@ -391,14 +402,13 @@ def test_process_existing_pdfs_no_files():
 
 def test_process_existing_pdfs_callback_error():
     """Test _process_existing_pdfs handles callback errors gracefully."""
-    import time
-
     from src.monitor import _process_existing_pdfs
 
     def error_callback(path):
         raise Exception("Callback error")
 
     handler = PDFHandler(error_callback)
+    handler.start_workers()
 
     with patch("pathlib.Path.glob") as mock_glob:
         pdf_path = MagicMock(spec=Path)
@@ -409,12 +419,13 @@ def test_process_existing_pdfs_callback_error():
 
         input_dir = Path("/fake/path")
         # Should not raise exception
-        _process_existing_pdfs(input_dir, handler, error_callback)
+        _process_existing_pdfs(input_dir, handler)
 
-        # Give thread time to process and handle error
-        time.sleep(0.2)
+        # Wait for the worker to run the callback and handle the error
+        handler.queue.join()
+        handler.stop_workers()
 
-        # File should not be in seen set after error (error handling happens in thread)
+        # File should not be in seen set after error (error handling happens in worker)
         assert pdf_path not in handler.seen
 
 
@@ -458,3 +469,353 @@ def test_monitor_folder_old_callback_signature():
 
         # Check that callback was called without handler
         assert detected == ["/fake/path/test.pdf"]
+
+
+def test_pdf_handler_events_only_enqueue():
+    """Event handlers return immediately; the callback runs on a worker thread."""
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def slow_callback(path):
+        calls.append((path, threading.current_thread().name))
+        started.set()
+        release.wait(timeout=5)
+
+    handler = PDFHandler(slow_callback, num_workers=1)
+    handler.start_workers()
+    try:
+        first = MagicMock(is_directory=False, src_path="/test/one.pdf")
+        second = MagicMock(is_directory=False, src_path="/test/two.pdf")
+
+        start = time.monotonic()
+        handler.on_created(first)
+        assert started.wait(timeout=2)
+        # The worker is busy, but further events are still accepted immediately
+        handler.on_created(second)
+        assert time.monotonic() - start < 1
+        assert handler.queue.qsize() == 1
+    finally:
+        release.set()
+        handler.queue.join()
+        handler.stop_workers()
+
+    assert [path for path, _ in calls] == ["/test/one.pdf", "/test/two.pdf"]
+    assert all(name.startswith("pdf2md-worker-") for _, name in calls)
+
+
+def test_pdf_handler_worker_pool_is_bounded():
+    """A burst of files is drained by a fixed number of worker threads."""
+    from src.monitor import _process_existing_pdfs
+
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+    done = []
+
+    def callback(path):
+        nonlocal active, max_active
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+            done.append(path)
+
+    handler = PDFHandler(callback, num_workers=3, max_queue_size=5)
+    handler.start_workers()
+    threads_before = threading.active_count()
+
+    pdfs = []
+    for i in range(40):
+        pdf = MagicMock(spec=Path)
+        pdf.__str__.return_value = f"/fake/path/file{i}.pdf"
+        pdf.is_file.return_value = True
+        pdfs.append(pdf)
+
+    with patch("pathlib.Path.glob", return_value=pdfs):
+        # Blocks while the queue is full instead of buffering everything
+        _process_existing_pdfs(Path("/fake/path"), handler)
+        assert handler.queue.qsize() <= 5
+        assert threading.active_count() <= threads_before
+
+    handler.queue.join()
+    handler.stop_workers()
+
+    assert len(done) == 40
+    assert max_active <= 3
+
+
+def test_pdf_handler_metrics_report_queue_and_workers():
+    """The monitor collector reports queue depth and busy workers."""
+    from src.metrics import Registry
+
+    release = threading.Event()
+    handler = PDFHandler(lambda path: release.wait(timeout=5), num_workers=1)
+    handler.start_workers()
+    handler.enqueue(Path("/test/running.pdf"))
+    handler.enqueue(Path("/test/waiting.pdf"))
+    time.sleep(0.1)
+    registry = Registry()
+    registry.add_collector("monitor", handler.collect_metrics)
+
+    text = registry.render()
+
+    release.set()
+    handler.queue.join()
+    handler.stop_workers()
+    assert "pdf2md_queue_depth 1\n" in text
+    assert "pdf2md_documents_in_progress 1\n" in text
+    assert "pdf2md_workers 1\n" in text
+    assert 'pdf2md_trace_timestamps{table="queued_at"} 1\n' in text
+
+
+def test_pdf_handler_traces_waits_before_the_callback(tmp_path):
+    """A document's trace starts when its file was first seen."""
+    from src.tracing import TRACER, load_traces
+
+    done = threading.Event()
+    handler = PDFHandler(lambda path: done.set(), num_workers=1, quiet_period=0.05)
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 data")
+    TRACER.configure(tmp_path / "trace.jsonl")
+    try:
+        handler.start_workers()
+        handler.arrived(pdf, "new")
+        assert done.wait(5)
+        handler.queue.join()
+    finally:
+        handler.stop_workers()
+        TRACER.close()
+
+    (records,) = load_traces(tmp_path / "trace.jsonl").values()
+    spans = {r["name"]: r for r in records}
+    assert set(spans) == {"document", "stability_wait", "queue_wait"}
+    assert spans["document"]["attrs"] == {"path": str(pdf)}
+    assert spans["stability_wait"]["duration"] >= 0.05
+    assert spans["document"]["start"] == spans["stability_wait"]["start"]
+
+
+def test_pdf_handler_stop_workers_drops_pending():
+    """Stopping the pool drops jobs that have not started and forgets them."""
+    release = threading.Event()
+
+    def blocking_callback(path):
+        release.wait(timeout=5)
+
+    handler = PDFHandler(blocking_callback, num_workers=1)
+    handler.start_workers()
+    handler.enqueue(Path("/test/running.pdf"))
+    time.sleep(0.1)
+    handler.enqueue(Path("/test/pending.pdf"))
+
+    # Release the running job only after stop_workers has drained the queue
+    threading.Timer(0.2, release.set).start()
+    handler.stop_workers(timeout=2)
+
+    assert Path("/test/pending.pdf") not in handler.seen
+    assert handler.queue.qsize() == 0
+
+
+def test_pdf_handler_policy_runs_short_and_urgent_pdfs_first(tmp_path, blank_pdf):
+    """With a scheduling policy, queued PDFs are taken fewest pages first."""
+    from src.scheduling import SchedulingPolicy
+
+    release = threading.Event()
+    order = []
+
+    def callback(path):
+        order.append(Path(path).name)
+        release.wait(timeout=5)
+
+    (tmp_path / "priority").mkdir()
+    handler = PDFHandler(callback, num_workers=1, policy=SchedulingPolicy())
+    handler.start_workers()
+    try:
+        handler.enqueue(blank_pdf(tmp_path / "first.pdf", 1))
+        time.sleep(0.1)  # the single worker is now busy with first.pdf
+        handler.enqueue(blank_pdf(tmp_path / "binder.pdf", 30))
+        handler.enqueue(blank_pdf(tmp_path / "invoice.pdf", 1))
+        handler.enqueue(blank_pdf(tmp_path / "priority" / "rush.pdf", 10))
+    finally:
+        release.set()
+        handler.queue.join()
+        handler.stop_workers()
+
+    assert order == ["first.pdf", "rush.pdf", "invoice.pdf", "binder.pdf"]
+
+
+def test_pdf_handler_queues_pdfs_once_stable(tmp_path):
+    """With a quiet period, a PDF is queued once it stops changing."""
+    detected = []
+    done = threading.Event()
+
+    def callback(path):
+        detected.append(path)
+        done.set()
+
+    handler = PDFHandler(callback, num_workers=1, quiet_period=0.1)
+    handler.start_workers()
+    try:
+        pdf = tmp_path / "doc.pdf"
+        pdf.write_bytes(b"%PDF")
+        handler.on_created(MagicMock(is_directory=False, src_path=str(pdf)))
+        # Still being written: nothing is queued yet
+        assert handler.queue.qsize() == 0 and not done.is_set()
+        with open(pdf, "ab") as f:
+            f.write(b" rest of the file")
+        handler.on_modified(MagicMock(is_directory=False, src_path=str(pdf)))
+        handler.on_closed(MagicMock(is_directory=False, src_path=str(pdf)))
+
+        assert done.wait(timeout=2)
+    finally:
+        handler.stop_workers()
+
+    assert detected == [str(pdf)]
+
+
+def test_pdf_handler_forgets_files_the_tracker_drops(tmp_path):
+    """A file that disappears before it is stable leaves nothing behind."""
+    handler = PDFHandler(
+        MagicMock(), num_workers=1, quiet_period=0.05, max_stable_wait=0.1
+    )
+    handler.start_workers()
+    try:
+        pdf = tmp_path / "gone.pdf"
+        pdf.write_bytes(b"%PDF")
+        handler.on_created(MagicMock(is_directory=False, src_path=str(pdf)))
+        assert pdf in handler._first_seen
+        pdf.unlink()  # no delete event reaches the handler
+        deadline = time.monotonic() + 2
+        while handler._first_seen and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert handler._first_seen == {}
+        assert handler.stability.pending() == 0
+    finally:
+        handler.stop_workers()
+    handler.callback.assert_not_called()
+
+
+def test_directory_poller_diffs_listings(tmp_path):
+    """New, changed and removed PDFs are found by diffing the index."""
+    from src.monitor import DirectoryPoller
+
+    existing = tmp_path / "existing.pdf"
+    existing.write_bytes(b"%PDF old")
+    (tmp_path / "notes.txt").write_text("ignored")
+    handler = MagicMock()
+    poller = DirectoryPoller(handler, [tmp_path], interval=60, full_scan_every=3)
+    poller.start()
+    try:
+        # Files present at start are indexed, not reported
+        assert set(poller.index) == {existing}
+        handler.arrived.assert_not_called()
+
+        new = tmp_path / "new.pdf"
+        new.write_bytes(b"%PDF new")
+        existing.write_bytes(b"%PDF rewritten in place")
+        poller.poll()
+        handler.arrived.assert_called_once_with(new, "new")
+
+        # The in-place rewrite doesn't touch the directory; a full scan finds it
+        poller.poll()
+        assert handler.arrived.call_count == 1
+        poller.poll()
+        handler.arrived.assert_called_with(existing, "changed")
+
+        new.unlink()
+        poller.poll()
+        handler.removed.assert_called_once_with(new)
+        assert set(poller.index) == {existing}
+    finally:
+        poller.stop()
+        poller.join()
+
+
+def test_monitor_folder_polling_mode_detects_new_pdf(tmp_path):
+    detected = []
+    stop_event = threading.Event()
+
+    def on_new_pdf(path):
+        detected.append(path)
+        stop_event.set()
+
+    t = threading.Thread(
+        target=monitor_folder,
+        args=(tmp_path, on_new_pdf, stop_event, 0.1),
+        kwargs={"scan_interval": 0.1},
+    )
+    with patch("src.monitor.Observer") as mock_observer:
+        t.start()
+        time.sleep(0.2)
+        pdf_path = tmp_path / "polled.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 test content")
+        t.join(timeout=2)
+        stop_event.set()
+
+    assert detected == [str(pdf_path)]
+    mock_observer.assert_not_called()
+
+
+def test_monitor_folder_watches_only_an_existing_priority_dir(tmp_path):
+    """The priority subfolder is never created in the input folder."""
+    from src.scheduling import SchedulingPolicy
+
+    stop_event = threading.Event()
+    stop_event.set()
+    with patch("src.monitor.DirectoryPoller") as mock_poller:
+        monitor_folder(
+            tmp_path,
+            MagicMock(),
+            stop_event,
+            0.1,
+            policy=SchedulingPolicy(),
+            scan_interval=0.1,
+        )
+        (tmp_path / "priority").mkdir()
+        monitor_folder(
+            tmp_path,
+            MagicMock(),
+            stop_event,
+            0.1,
+            policy=SchedulingPolicy(),
+            scan_interval=0.1,
+        )
+
+    assert [c.args[1] for c in mock_poller.call_args_list] == [
+        [tmp_path],
+        [tmp_path, tmp_path / "priority"],
+    ]
+
+
+def test_pdf_handler_records_jobs(tmp_path):
+    """Jobs are tracked in the store; unfinished ones are queued again first."""
+    from src.jobstore import ABANDONED, FAILED, QUEUED, JobStore
+    from src.monitor import _resume_jobs
+
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    left_over = tmp_path / "left_over.pdf"
+    left_over.write_bytes(b"%PDF")
+    abandoned = tmp_path / "abandoned.pdf"
+    abandoned.write_bytes(b"%PDF")
+    store.enqueued(left_over)
+    store.started(abandoned)
+    store.unfinished(max_attempts=1)  # the service died converting it
+
+    handler = PDFHandler(lambda path: None, num_workers=1, jobs=store)
+    with patch.object(handler.queue, "put") as mock_put:
+        _resume_jobs(handler, max_attempts=3)
+        assert handler.enqueue(abandoned) is False
+    mock_put.assert_called_once_with(left_over)
+    assert abandoned not in handler.seen
+    assert store.status(abandoned) == ABANDONED
+    assert store.status(left_over) == QUEUED
+
+    # A callback that records nothing leaves the job failed, not running
+    handler.start_workers()
+    handler.queue.put(left_over)
+    handler.queue.join()
+    handler.stop_workers()
+    assert store.status(left_over) == FAILED
+    store.close()
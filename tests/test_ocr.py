@@ -1,8 +1,9 @@
+import asyncio
 import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from openai import APITimeoutError
+from openai import APIConnectionError, APITimeoutError
 
 from src.ocr import OcrProcessor, ocr_pdf_to_markdown_sync
 
@@ -43,6 +44,30 @@ async def test_process_pdf_to_markdown_delimited(tmp_path):
         assert md == "# Page 1\n\n---\n\n# Page 2"
 
 
+@pytest.mark.asyncio
+async def test_process_pages_ocrs_only_the_requested_pages(tmp_path):
+    from pypdf import PdfWriter
+
+    pdf_path = tmp_path / "test.pdf"
+    writer = PdfWriter()
+    for _ in range(4):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    async def fake_process_page(pdf, page_num, **kwargs):
+        return f"# Page {page_num}"
+
+    processor = OcrProcessor("http://fake", "fake", "fake", 10)
+    with patch.object(
+        processor, "process_page", new=AsyncMock(side_effect=fake_process_page)
+    ) as process_page:
+        pages = await processor.process_pages(str(pdf_path), [2, 4])
+
+    assert pages == {2: "# Page 2", 4: "# Page 4"}
+    assert sorted(c.args[1] for c in process_page.await_args_list) == [2, 4]
+
+
 @pytest.mark.asyncio
 async def test_process_pdf_to_markdown_concat(tmp_path):
     pdf_path = tmp_path / "test.pdf"
@@ -130,6 +155,602 @@ async def test_process_pdf_to_markdown_error(tmp_path):
         )
 
 
+@pytest.mark.asyncio
+async def test_process_pdf_to_markdown_concurrent_pages_keep_order(tmp_path):
+    """Pages are OCR'd concurrently (bounded) but assembled in page order."""
+    import asyncio
+
+    pdf_path = tmp_path / "test.pdf"
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(5):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_process_page(pdf_path, page_num, **kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        # Later pages finish first to make sure ordering is restored
+        await asyncio.sleep(0.01 * (6 - page_num))
+        in_flight -= 1
+        if page_num == 3:
+            return "**[ERROR: Max retries exceeded for page 3]**"
+        return f"# Page {page_num}"
+
+    processor = OcrProcessor("http://fake", "fake", "fake", 10, page_concurrency=2)
+    with patch.object(processor, "process_page", new=fake_process_page):
+        md = await processor.process_pdf_to_markdown(str(pdf_path), delimiter="concat")
+
+    assert max_in_flight == 2
+    assert md == (
+        "# Page 1\n\n# Page 2\n\n**[ERROR: Max retries exceeded for page 3]**"
+        "\n\n# Page 4\n\n# Page 5"
+    )
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_to_markdown_all_pages_failed_concurrently(tmp_path):
+    """The all-pages-failed header is still added with concurrent OCR."""
+    pdf_path = tmp_path / "test.pdf"
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    with patch.object(OcrProcessor, "process_page", new=AsyncMock(return_value=None)):
+        processor = OcrProcessor("http://fake", "fake", "fake", 10, page_concurrency=4)
+        md = await processor.process_pdf_to_markdown(str(pdf_path))
+
+    assert md.startswith("**[ERROR: All 2 pages failed OCR")
+    assert "[ERROR: Failed to OCR page 1]" in md
+    assert "[ERROR: Failed to OCR page 2]" in md
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_to_file_streams_pages_in_order(tmp_path):
+    """Pages finishing out of order are streamed to disk in page order."""
+    import asyncio
+
+    pdf_path = tmp_path / "test.pdf"
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(4):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+    output_path = tmp_path / "test.md"
+
+    async def fake_process_page(pdf_path, page_num, **kwargs):
+        await asyncio.sleep(0.01 * (5 - page_num))
+        # The output only appears once the whole document is done
+        assert not output_path.exists()
+        return f"# Page {page_num}"
+
+    processor = OcrProcessor("http://fake", "fake", "fake", 10, page_concurrency=4)
+    with patch.object(processor, "process_page", new=fake_process_page):
+        result = await processor.process_pdf_to_file(str(pdf_path), output_path)
+
+    assert result.num_pages == 4
+    assert result.page_failures == 0
+    assert result.clean
+    assert output_path.read_text() == (
+        "# Page 1\n\n---\n\n# Page 2\n\n---\n\n# Page 3\n\n---\n\n# Page 4"
+    )
+    assert list(tmp_path.glob("*.partial")) == []
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_to_file_matches_in_memory_output(tmp_path):
+    """Streaming produces the same markdown, including the all-failed header."""
+    pdf_path = tmp_path / "test.pdf"
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    processor = OcrProcessor("http://fake", "fake", "fake", 10, page_concurrency=2)
+    with patch.object(processor, "process_page", new=AsyncMock(return_value=None)):
+        expected = await processor.process_pdf_to_markdown(str(pdf_path))
+        result = await processor.process_pdf_to_file(
+            str(pdf_path), tmp_path / "test.md"
+        )
+
+    assert result.page_failures == 2
+    assert not result.clean
+    assert (tmp_path / "test.md").read_text() == expected
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_to_file_leaves_nothing_on_failure(tmp_path):
+    """An exception mid-document discards the partial file."""
+    pdf_path = tmp_path / "test.pdf"
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+    output_path = tmp_path / "test.md"
+    output_path.write_text("previous version")
+
+    processor = OcrProcessor("http://fake", "fake", "fake", 10)
+    with patch.object(
+        processor, "process_page", new=AsyncMock(side_effect=RuntimeError("boom"))
+    ):
+        with pytest.raises(RuntimeError):
+            await processor.process_pdf_to_file(str(pdf_path), output_path)
+
+    assert output_path.read_text() == "previous version"
+    assert list(tmp_path.glob("*.partial")) == []
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_spreads_pages_over_endpoints(tmp_path):
+    """Page requests are balanced across LM Studio endpoints."""
+    import asyncio
+
+    from src.endpoints import EndpointSpec
+
+    pdf_path = tmp_path / "test.pdf"
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(4):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    processor = OcrProcessor(
+        "http://unused",
+        "fake",
+        "fake",
+        10,
+        page_concurrency=4,
+        endpoints=(EndpointSpec("http://a"), EndpointSpec("http://b")),
+    )
+
+    async def slow_response(**kwargs):
+        await asyncio.sleep(0.02)
+        return DummyResponse(json.dumps({"natural_text": "text"}))
+
+    with patch("olmocr.data.renderpdf.render_pdf_to_base64png", return_value="aW1n"):
+        for endpoint in processor.pool.endpoints:
+            endpoint.client.chat.completions.create = AsyncMock(
+                side_effect=slow_response
+            )
+        md = await processor.process_pdf_to_markdown(str(pdf_path))
+
+    assert md.count("text") == 4
+    assert [e["requests"] for e in processor.pool.stats()] == [2, 2]
+    await processor.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_records_metrics(tmp_path):
+    """Pages, stage latencies, errors and endpoint state reach /metrics."""
+    from pypdf import PdfWriter
+
+    from src import ocr
+    from src.metrics import ERRORS, PAGES, REGISTRY, STAGE_SECONDS
+
+    pdf_path = tmp_path / "test.pdf"
+    writer = PdfWriter()
+    for _ in range(2):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    processor = OcrProcessor("http://fake", "fake", "test-model", 10)
+    ok_before = PAGES.value(source="ocr", result="ok")
+    error_before = PAGES.value(source="ocr", result="error")
+    json_errors_before = ERRORS.value(type="invalid_json")
+    inferences_before = STAGE_SECONDS.count(stage="inference")
+    responses = [
+        DummyResponse(json.dumps({"natural_text": "page text"})),
+        DummyResponse("not json"),
+    ]
+
+    with (
+        patch("olmocr.data.renderpdf.render_pdf_to_base64png", return_value="aW1n"),
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new=AsyncMock(side_effect=responses),
+        ),
+        patch.object(processor, "page_concurrency", 1),
+        patch.dict(
+            ocr._engines,
+            {("test",): MagicMock(metrics_snapshot=processor.metrics_snapshot)},
+        ),
+    ):
+        await processor.process_pdf_to_markdown(str(pdf_path))
+        text = REGISTRY.render()
+
+    assert PAGES.value(source="ocr", result="ok") == ok_before + 1
+    assert PAGES.value(source="ocr", result="error") == error_before + 1
+    assert ERRORS.value(type="invalid_json") == json_errors_before + 1
+    assert STAGE_SECONDS.count(stage="inference") == inferences_before + 2
+    assert 'pdf2md_inflight_requests{endpoint="http://fake"} 0\n' in text
+    assert 'pdf2md_endpoint_requests_total{endpoint="http://fake"} 2\n' in text
+    await processor.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_to_file_traces_each_page(tmp_path):
+    """Every page gets a span with its render, request, parse and write steps."""
+    from pypdf import PdfWriter
+
+    from src.tracing import TRACER, load_traces
+
+    pdf_path = tmp_path / "test.pdf"
+    writer = PdfWriter()
+    for _ in range(2):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+    processor = OcrProcessor("http://fake", "fake", "test-model", 10, read_ahead=2)
+
+    TRACER.configure(tmp_path / "trace.jsonl")
+    try:
+        with (
+            patch("olmocr.data.renderpdf.render_pdf_to_base64png", return_value="aW1n"),
+            patch.object(
+                processor.client.chat.completions,
+                "create",
+                new=AsyncMock(
+                    return_value=DummyResponse(json.dumps({"natural_text": "text"}))
+                ),
+            ),
+            TRACER.span("document"),
+        ):
+            await processor.process_pdf_to_file(str(pdf_path), tmp_path / "out.md")
+    finally:
+        TRACER.close()
+        await processor.pool.close()
+
+    (records,) = load_traces(tmp_path / "trace.jsonl").values()
+    by_id = {r["span"]: r for r in records}
+
+    def path_of(record):
+        names = []
+        while record is not None:
+            names.append(record["name"])
+            record = by_id.get(record["parent"])
+        return "/".join(reversed(names))
+
+    paths = sorted(path_of(r) for r in records)
+    assert paths.count("document/page/render") == 2
+    assert paths.count("document/page/request") == 2
+    assert paths.count("document/page/parse") == 2
+    assert paths.count("document/page/write") == 2
+    assert "document/open" in paths and "document/commit" in paths
+    pages = sorted(r["attrs"]["page"] for r in records if r["name"] == "page")
+    assert pages == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_page_slots_are_shared_fairly_between_documents(tmp_path):
+    """A small document started behind a large one still finishes early."""
+    import asyncio
+
+    from pypdf import PdfWriter
+
+    def write_pdf(name, pages):
+        writer = PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(width=72, height=72)
+        path = tmp_path / name
+        with open(path, "wb") as f:
+            writer.write(f)
+        return str(path)
+
+    big = write_pdf("big.pdf", 6)
+    small = write_pdf("small.pdf", 1)
+    processor = OcrProcessor("http://fake", "fake", "fake", 10, page_slots=2)
+    in_flight = 0
+    max_in_flight = 0
+    done = []
+
+    async def fake_process_page(pdf_path, page_num, **kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return f"{pdf_path} {page_num}"
+
+    async def convert(path, delay):
+        await asyncio.sleep(delay)
+        await processor.process_pdf_to_markdown(path)
+        done.append(path)
+
+    with patch.object(processor, "process_page", side_effect=fake_process_page):
+        await asyncio.gather(convert(big, 0), convert(small, 0.01))
+
+    assert done == [small, big]
+    assert max_in_flight == 2
+    await processor.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_render_stage_reads_ahead_of_inference(tmp_path):
+    """Upcoming pages are rendered while earlier ones are inferred, up to read_ahead."""
+    import asyncio
+
+    pdf_path = tmp_path / "test.pdf"
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(6):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    events: list[tuple[str, int]] = []
+    rendered = 0
+    inferred = 0
+    max_buffered = 0
+
+    async def fake_build_query(pdf_path, page_num, **kwargs):
+        nonlocal rendered, max_buffered
+        await asyncio.sleep(0.005)
+        rendered += 1
+        max_buffered = max(max_buffered, rendered - inferred)
+        events.append(("rendered", page_num))
+        return {"page": page_num}
+
+    async def fake_process_page(pdf_path, page_num, prepared_query=None, **kwargs):
+        nonlocal inferred
+        inferred += 1
+        assert prepared_query == {"page": page_num}
+        await asyncio.sleep(0.03)
+        events.append(("inferred", page_num))
+        return f"# Page {page_num}"
+
+    processor = OcrProcessor("http://fake", "fake", "fake", 10, read_ahead=2)
+    with (
+        patch.object(processor.renderer, "build_query", new=fake_build_query),
+        patch.object(processor, "process_page", new=fake_process_page),
+    ):
+        md = await processor.process_pdf_to_markdown(str(pdf_path), delimiter="concat")
+
+    assert md == "\n\n".join(f"# Page {n}" for n in range(1, 7))
+    # Page 2 was ready before page 1 came back from the model
+    assert events.index(("rendered", 2)) < events.index(("inferred", 1))
+    # Bounded buffer: read_ahead queued plus one finished render waiting for a slot
+    assert max_buffered <= 3
+
+
+@pytest.mark.asyncio
+async def test_process_page_reuses_query_on_retry():
+    """A prepared query is sent as is, and retries resend it without rendering."""
+    processor = OcrProcessor("http://fake", "fake", "test-model", 10)
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = json.dumps({"natural_text": "text"})
+
+    with (
+        patch.object(
+            processor.renderer, "build_query", new_callable=AsyncMock
+        ) as mock_build,
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            side_effect=[APITimeoutError("Timeout"), mock_response],
+        ) as mock_create,
+        patch("src.ocr.asyncio.sleep", new=AsyncMock()),
+    ):
+        result = await processor.process_page(
+            "/fake/path.pdf", 1, prepared_query={"messages": "prepared"}
+        )
+
+    assert result == "text"
+    assert [call.kwargs["messages"] for call in mock_create.await_args_list] == [
+        "prepared",
+        "prepared",
+    ]
+    mock_build.assert_not_awaited()
+
+
+def _text_response(content):
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = content
+    return mock_response
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("first", "reason"),
+    [
+        (json.dumps({"natural_text": "x"}), "short result"),
+        (
+            json.dumps({"natural_text": None, "classification": "diagram"}),
+            "no natural_text",
+        ),
+        ("not json", "invalid JSON"),
+    ],
+)
+async def test_process_page_escalates_poor_results(first, reason):
+    """A poor result at the cheap resolution is re-run one step higher."""
+    processor = OcrProcessor(
+        "http://fake", "fake", "test-model", 10, image_dims=(1024, 640)
+    )
+    good = json.dumps({"natural_text": "A full paragraph of recognised page text."})
+
+    with (
+        patch.object(
+            processor.renderer,
+            "build_query",
+            new_callable=AsyncMock,
+            side_effect=lambda path, page, **kw: {"messages": kw},
+        ) as mock_build,
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            side_effect=[_text_response(first), _text_response(good)],
+        ),
+    ):
+        result = await processor.process_page("/fake/path.pdf", 1)
+
+    assert result == "A full paragraph of recognised page text."
+    assert [
+        c.kwargs["target_longest_image_dim"] for c in mock_build.await_args_list
+    ] == [
+        640,
+        1024,
+    ]
+    assert processor.resolution_stats["pages"] == {1024: 1}
+    assert processor.resolution_stats["escalations"] == {reason: 1}
+
+
+@pytest.mark.asyncio
+async def test_process_page_keeps_good_cheap_result():
+    """A good result at the cheap resolution is not re-run."""
+    processor = OcrProcessor(
+        "http://fake", "fake", "test-model", 10, image_dims=(640, 1024)
+    )
+    good = json.dumps({"natural_text": "A full paragraph of recognised page text."})
+
+    with (
+        patch.object(
+            processor.renderer, "build_query", new_callable=AsyncMock, return_value={}
+        ) as mock_build,
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=_text_response(good),
+        ),
+    ):
+        result = await processor.process_page("/fake/path.pdf", 1)
+
+    assert result == "A full paragraph of recognised page text."
+    assert mock_build.await_count == 1
+    assert processor.resolution_stats["pages"] == {640: 1}
+    assert not processor.resolution_stats["escalations"]
+
+
+@pytest.mark.asyncio
+async def test_process_page_prefers_short_result_over_later_error():
+    """If the higher resolution fails outright, the cheaper text is kept."""
+    processor = OcrProcessor(
+        "http://fake", "fake", "test-model", 10, image_dims=(640, 1024)
+    )
+
+    with (
+        patch.object(
+            processor.renderer, "build_query", new_callable=AsyncMock, return_value={}
+        ),
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            side_effect=[
+                _text_response(json.dumps({"natural_text": "Short"})),
+                _text_response("not json"),
+            ],
+        ),
+    ):
+        result = await processor.process_page("/fake/path.pdf", 1)
+
+    assert result == "Short"
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_to_markdown_text_layer_fast_path(tmp_path):
+    """Born-digital pages skip the model and the output records each page's path."""
+    from tests.test_text_layer import BODY, _add_page
+
+    pdf_path = tmp_path / "mixed.pdf"
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    _add_page(writer, BODY)
+    _add_page(writer, "")
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    processor = OcrProcessor(
+        "http://fake", "fake", "fake", 10, text_layer_threshold=0.9
+    )
+    with patch.object(
+        processor, "process_page", new=AsyncMock(return_value="# Scanned page")
+    ) as mock_page:
+        md = await processor.process_pdf_to_markdown(str(pdf_path), delimiter="concat")
+
+    mock_page.assert_awaited_once()
+    assert mock_page.await_args.args == (str(pdf_path), 2)
+    first, second = md.split("\n\n<!-- page 2")
+    assert first.startswith("<!-- page 1: text-layer -->\nQuarterly report")
+    assert second == ": ocr -->\n# Scanned page"
+
+
+@pytest.mark.asyncio
+async def test_process_pdf_to_markdown_resumes_from_checkpoints(tmp_path):
+    """An interrupted document only OCRs the pages that were not checkpointed."""
+    from pypdf import PdfWriter
+
+    from src.checkpoint import CheckpointStore
+    from src.dedupe import file_sha256
+
+    pdf_path = tmp_path / "long.pdf"
+    writer = PdfWriter()
+    for _ in range(4):
+        writer.add_blank_page(width=72, height=72)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+    checkpoint_dir = tmp_path / "checkpoints"
+    processor = OcrProcessor(
+        "http://fake", "fake", "fake", 10, checkpoint_dir=str(checkpoint_dir)
+    )
+    store = processor.checkpoints
+    doc_hash = file_sha256(pdf_path)
+    # Pages 1 and 2 finished before the "restart"
+    store.save_page(doc_hash, 1, "# Page 1")
+    store.save_page(doc_hash, 2, "# Page 2")
+    # Pages checkpointed under another model are not reused
+    assert CheckpointStore(checkpoint_dir).load(doc_hash) == {}
+    other = OcrProcessor(
+        "http://fake", "fake", "other", 10, checkpoint_dir=str(checkpoint_dir)
+    )
+    assert other.checkpoints.load(doc_hash) == {}
+
+    async def fake_process_page(pdf_path, page_num, **kwargs):
+        if page_num == 4:
+            return "**[ERROR: Max retries exceeded for page 4]**"
+        return f"# Page {page_num}"
+
+    with patch.object(
+        processor, "process_page", new=AsyncMock(side_effect=fake_process_page)
+    ) as mock_page:
+        md = await processor.process_pdf_to_markdown(str(pdf_path), delimiter="concat")
+
+    assert [c.args[1] for c in mock_page.await_args_list] == [3, 4]
+    assert md == (
+        "# Page 1\n\n# Page 2\n\n# Page 3\n\n"
+        "**[ERROR: Max retries exceeded for page 4]**"
+    )
+    # The new success is checkpointed, the failure is not
+    assert sorted(store.load(doc_hash)) == [1, 2, 3]
+
+
 @pytest.mark.asyncio
 async def test_process_page_success():
     """Test successful OCR processing of a single page."""
@@ -145,7 +766,10 @@ async def test_process_page_success():
     with (
         patch("olmocr.pipeline.build_page_query") as mock_build_query,
         patch.object(
-            processor.client.chat.completions, "create", return_value=mock_response
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=mock_response,
         ),
     ):
         mock_build_query.return_value = {"model": "test-model"}
@@ -154,6 +778,64 @@ async def test_process_page_success():
         assert result == "This is extracted text from the page"
 
 
+@pytest.mark.asyncio
+async def test_process_page_uses_cache(tmp_path):
+    """A cached page is served without calling LM Studio; new results are stored."""
+    processor = OcrProcessor(
+        "http://fake", "fake", "test-model", 10, cache_dir=str(tmp_path / "cache")
+    )
+
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = json.dumps(
+        {"natural_text": "Cached text"}
+    )
+
+    with (
+        patch("olmocr.pipeline.build_page_query") as mock_build_query,
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=mock_response,
+        ) as mock_create,
+    ):
+        mock_build_query.return_value = {"messages": ["page image"]}
+
+        first = await processor.process_page("/fake/path.pdf", 1)
+        second = await processor.process_page("/fake/other.pdf", 7)
+
+    assert first == second == "Cached text"
+    assert mock_create.await_count == 1
+    assert processor.cache is not None
+    assert processor.cache.stats()["hits"] == 1
+    assert processor.cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_page_does_not_cache_errors(tmp_path):
+    """Error results are not cached, so the page is retried next time."""
+    processor = OcrProcessor(
+        "http://fake", "fake", "test-model", 10, cache_dir=str(tmp_path / "cache")
+    )
+
+    with (
+        patch("olmocr.pipeline.build_page_query") as mock_build_query,
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=None,
+        ),
+    ):
+        mock_build_query.return_value = {"messages": ["page image"]}
+        result = await processor.process_page("/fake/path.pdf", 1)
+
+    assert "ERROR" in result
+    assert processor.cache is not None
+    assert processor.cache.stats()["entries"] == 0
+
+
 @pytest.mark.asyncio
 async def test_process_page_none_response():
     """Test handling of None response from API."""
@@ -161,7 +843,12 @@ async def test_process_page_none_response():
 
     with (
         patch("olmocr.pipeline.build_page_query") as mock_build_query,
-        patch.object(processor.client.chat.completions, "create", return_value=None),
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=None,
+        ),
     ):
         mock_build_query.return_value = {"model": "test-model"}
 
@@ -180,7 +867,10 @@ async def test_process_page_no_choices():
     with (
         patch("olmocr.pipeline.build_page_query") as mock_build_query,
         patch.object(
-            processor.client.chat.completions, "create", return_value=mock_response
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=mock_response,
         ),
     ):
         mock_build_query.return_value = {"model": "test-model"}
@@ -202,7 +892,10 @@ async def test_process_page_no_message_content():
     with (
         patch("olmocr.pipeline.build_page_query") as mock_build_query,
         patch.object(
-            processor.client.chat.completions, "create", return_value=mock_response
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=mock_response,
         ),
     ):
         mock_build_query.return_value = {"model": "test-model"}
@@ -228,7 +921,10 @@ async def test_process_page_diagram_classification():
     with (
         patch("olmocr.pipeline.build_page_query") as mock_build_query,
         patch.object(
-            processor.client.chat.completions, "create", return_value=mock_response
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=mock_response,
         ),
     ):
         mock_build_query.return_value = {"model": "test-model"}
@@ -252,7 +948,10 @@ async def test_process_page_table_classification():
     with (
         patch("olmocr.pipeline.build_page_query") as mock_build_query,
         patch.object(
-            processor.client.chat.completions, "create", return_value=mock_response
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=mock_response,
         ),
     ):
         mock_build_query.return_value = {"model": "test-model"}
@@ -273,7 +972,10 @@ async def test_process_page_missing_natural_text():
     with (
         patch("olmocr.pipeline.build_page_query") as mock_build_query,
         patch.object(
-            processor.client.chat.completions, "create", return_value=mock_response
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=mock_response,
         ),
     ):
         mock_build_query.return_value = {"model": "test-model"}
@@ -302,14 +1004,16 @@ async def test_process_page_api_timeout_retry():
         patch.object(
             processor.client.chat.completions,
             "create",
+            new_callable=AsyncMock,
             side_effect=[APITimeoutError("Timeout"), mock_response],
         ),
-        patch("time.sleep"),
+        patch("src.ocr.asyncio.sleep", new=AsyncMock()) as mock_sleep,
     ):  # Speed up test
         mock_build_query.return_value = {"model": "test-model"}
 
         result = await processor.process_page("/fake/path.pdf", 1, max_retries=2)
         assert result == "Success after retry"
+        mock_sleep.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -322,14 +1026,145 @@ async def test_process_page_max_retries_exceeded():
         patch.object(
             processor.client.chat.completions,
             "create",
+            new_callable=AsyncMock,
             side_effect=APITimeoutError("Timeout"),
         ),
-        patch("time.sleep"),
+        patch("src.ocr.asyncio.sleep", new=AsyncMock()) as mock_sleep,
     ):  # Speed up test
         mock_build_query.return_value = {"model": "test-model"}
 
         result = await processor.process_page("/fake/path.pdf", 1, max_retries=2)
         assert "ERROR: Max retries exceeded for page 1" in result
+        # No backoff after the final attempt
+        mock_sleep.assert_awaited_once()
+
+
+def _split_probes(pages, probes):
+    """A completions.create that sends health probes (one token) to probes."""
+
+    async def create(**kwargs):
+        if kwargs.get("max_tokens") == 1:
+            return await probes(**kwargs)
+        return await pages(**kwargs)
+
+    return create
+
+
+@pytest.mark.asyncio
+async def test_process_page_waits_out_an_outage_with_the_circuit_breaker():
+    """Failures while every endpoint is down don't use up the page's retries."""
+    processor = OcrProcessor(
+        "http://fake",
+        "fake",
+        "test-model",
+        10,
+        endpoint_failure_threshold=2,
+        endpoint_probe_interval=0.01,
+        circuit_breaker=True,
+    )
+    outage = [APITimeoutError("LM Studio restarting")] * 2
+    pages = AsyncMock(side_effect=[*outage, DummyResponse('{"natural_text": "ok"}')])
+    probes = AsyncMock(side_effect=[APIConnectionError(request=MagicMock()), None])
+
+    with (
+        patch("olmocr.pipeline.build_page_query", return_value={"model": "m"}),
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new=_split_probes(pages, probes),
+        ),
+        patch("src.ocr._backoff_delay", return_value=0.0),
+    ):
+        result = await processor.process_page("/fake/path.pdf", 1, max_retries=2)
+
+    assert result == "ok"
+    assert pages.await_count == 3
+    # Probes ask the configured model for a token, not just for the model list
+    assert probes.await_count == 2
+    assert probes.await_args.kwargs["model"] == "test-model"
+    assert not processor.pool.circuit_open
+    await processor.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_process_page_gives_up_on_a_page_that_always_times_out():
+    """A page that times out on a server that answers probes runs out of retries."""
+    processor = OcrProcessor(
+        "http://fake",
+        "fake",
+        "test-model",
+        10,
+        endpoint_failure_threshold=3,
+        endpoint_probe_interval=0.01,
+        circuit_breaker=True,
+    )
+    create = AsyncMock(side_effect=APITimeoutError("too slow"))
+
+    with (
+        patch("olmocr.pipeline.build_page_query", return_value={"model": "m"}),
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new=_split_probes(create, AsyncMock()),
+        ),
+        patch("src.ocr._backoff_delay", return_value=0.0),
+    ):
+        result = await asyncio.wait_for(
+            processor.process_page("/fake/path.pdf", 1, max_retries=3), 5
+        )
+
+    assert "ERROR: Max retries exceeded for page 1" in result
+    # Two counted failures, the one that opened the circuit, one on trial
+    assert create.await_count == 4
+    await processor.pool.close()
+
+
+def test_backoff_delay_is_exponential_with_jitter():
+    """Backoff doubles per attempt, is jittered, and is capped."""
+    from src.ocr import _backoff_delay
+
+    for attempt, nominal in [(1, 2.0), (2, 4.0), (3, 8.0)]:
+        for _ in range(20):
+            delay = _backoff_delay(attempt)
+            assert nominal / 2 <= delay <= nominal
+    assert _backoff_delay(10, cap=30.0) <= 30.0
+
+
+@pytest.mark.asyncio
+async def test_process_page_requests_overlap_on_one_loop():
+    """API calls are awaited, so concurrent pages overlap instead of serializing."""
+    import asyncio
+    import time
+
+    processor = OcrProcessor("http://fake", "fake", "test-model", 10)
+
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = json.dumps({"natural_text": "text"})
+
+    async def slow_create(**kwargs):
+        await asyncio.sleep(0.2)
+        return mock_response
+
+    with (
+        patch("olmocr.pipeline.build_page_query") as mock_build_query,
+        patch.object(
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            side_effect=slow_create,
+        ),
+    ):
+        mock_build_query.return_value = {"model": "test-model"}
+
+        start = time.monotonic()
+        results = await asyncio.gather(
+            *(processor.process_page("/fake/path.pdf", n) for n in range(1, 5))
+        )
+        elapsed = time.monotonic() - start
+
+    assert results == ["text"] * 4
+    assert elapsed < 0.6
 
 
 @pytest.mark.asyncio
@@ -344,7 +1179,10 @@ async def test_process_page_json_decode_error():
     with (
         patch("olmocr.pipeline.build_page_query") as mock_build_query,
         patch.object(
-            processor.client.chat.completions, "create", return_value=mock_response
+            processor.client.chat.completions,
+            "create",
+            new_callable=AsyncMock,
+            return_value=mock_response,
         ),
     ):
         mock_build_query.return_value = {"model": "test-model"}
@@ -379,20 +1217,143 @@ async def test_process_pdf_read_error(tmp_path):
     result = await processor.process_pdf_to_markdown(str(invalid_pdf))
     assert "ERROR: Failed to read PDF" in result
 
+    output_path = tmp_path / "invalid.md"
+    doc = await processor.process_pdf_to_file(str(invalid_pdf), output_path)
+    assert doc.error is not None
+    assert not doc.clean
+    assert "ERROR: Failed to read PDF" in output_path.read_text()
+
 
 def test_ocr_pdf_to_markdown_sync():
-    """Test the synchronous wrapper function."""
-    with patch("asyncio.run") as mock_run:
-        mock_run.return_value = "Test markdown content"
-
-        result = ocr_pdf_to_markdown_sync(
-            "/fake/path.pdf",
-            "http://fake",
-            "fake_key",
-            "fake_model",
-            timeout=60,
-            delimiter="delimited",
-        )
+    """The synchronous wrapper runs on a shared, long-lived engine."""
+    from src.ocr import get_ocr_engine, shutdown_ocr_engines
+
+    try:
+        with patch.object(
+            OcrProcessor,
+            "process_pdf_to_markdown",
+            new=AsyncMock(return_value="Test markdown content"),
+        ) as mock_process:
+            result = ocr_pdf_to_markdown_sync(
+                "/fake/path.pdf",
+                "http://fake",
+                "fake_key",
+                "fake_model",
+                timeout=60,
+                delimiter="delimited",
+            )
+            second = ocr_pdf_to_markdown_sync(
+                "/fake/other.pdf",
+                "http://fake",
+                "fake_key",
+                "fake_model",
+                timeout=60,
+                delimiter="concat",
+            )
 
         assert result == "Test markdown content"
-        mock_run.assert_called_once()
+        assert second == "Test markdown content"
+        assert mock_process.await_count == 2
+        mock_process.assert_any_await(
+            "/fake/other.pdf", delimiter="concat", doc_hash=None
+        )
+        # Both documents went through the same engine (and client)
+        engine = get_ocr_engine("http://fake", "fake_key", "fake_model", 60)
+        assert engine is get_ocr_engine("http://fake", "fake_key", "fake_model", 60)
+    finally:
+        shutdown_ocr_engines()
+
+
+def test_get_ocr_engine_keys_on_options():
+    """Different processor options get different engines."""
+    from src.ocr import get_ocr_engine, shutdown_ocr_engines
+
+    try:
+        one = get_ocr_engine("http://fake", "key", "model", 60, page_concurrency=1)
+        four = get_ocr_engine("http://fake", "key", "model", 60, page_concurrency=4)
+        assert one is not four
+        assert four.processor.page_concurrency == 4
+        assert one is get_ocr_engine(
+            "http://fake", "key", "model", 60, page_concurrency=1
+        )
+    finally:
+        shutdown_ocr_engines()
+
+
+def test_ocr_engine_takes_metrics_snapshot_on_its_loop():
+    """/metrics reads engine state on the engine loop, not the server thread."""
+    import threading
+
+    from src.ocr import OcrEngine
+
+    processor = OcrProcessor("http://fake", "key", "model", 60, page_slots=2)
+    processor.resolution_stats["escalations"]["too_short"] += 1
+    engine = OcrEngine(processor)
+    threads = []
+    real_snapshot = processor.metrics_snapshot
+
+    def snapshot():
+        threads.append(threading.current_thread())
+        return real_snapshot()
+
+    try:
+        with patch.object(processor, "metrics_snapshot", new=snapshot):
+            result = engine.metrics_snapshot()
+    finally:
+        engine.close()
+
+    assert threads == [engine._thread]
+    assert result["escalations"] == {"too_short": 1}
+    assert result["slots"] == (0, 0)
+    assert result["endpoints"][0]["url"] == "http://fake"
+
+
+def test_ocr_engine_submit_from_many_threads():
+    """submit() is thread-safe and documents overlap on the engine loop."""
+    import asyncio
+    import threading
+    import time
+
+    from src.ocr import OcrEngine
+
+    async def fake_process(pdf_path, delimiter="delimited", doc_hash=None):
+        await asyncio.sleep(0.2)
+        return f"md for {pdf_path}"
+
+    processor = OcrProcessor("http://fake", "fake", "fake", 10)
+    engine = OcrEngine(processor)
+    results: dict[str, str] = {}
+    try:
+        with patch.object(processor, "process_pdf_to_markdown", new=fake_process):
+
+            def worker(name):
+                results[name] = engine.submit(name).result(timeout=5)
+
+            threads = [
+                threading.Thread(target=worker, args=(f"doc{i}.pdf",)) for i in range(5)
+            ]
+            start = time.monotonic()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.monotonic() - start
+    finally:
+        engine.close()
+
+    assert results == {f"doc{i}.pdf": f"md for doc{i}.pdf" for i in range(5)}
+    assert elapsed < 0.8
+    with pytest.raises(RuntimeError, match="closed"):
+        engine.submit("late.pdf")
+
+
+def test_failure_threshold_is_capped_at_the_page_attempts():
+    """The circuit must open before a page runs out of attempts."""
+    from src.ocr import PAGE_MAX_RETRIES
+
+    breaker = OcrProcessor(
+        "http://x", "k", "m", endpoint_failure_threshold=10, circuit_breaker=True
+    )
+    plain = OcrProcessor("http://x", "k", "m", endpoint_failure_threshold=10)
+    assert breaker.pool.failure_threshold == PAGE_MAX_RETRIES
+    assert plain.pool.failure_threshold == 10
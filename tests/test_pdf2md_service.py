@@ -1,3 +1,5 @@
+import os
+import socket
 import tempfile
 import time
 from pathlib import Path
@@ -5,9 +7,23 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+from src.config import load_config
+from src.ocr import DocumentResult
 from src.pdf2md_service import main, on_new_pdf, wait_for_file_stable
 
 
+def fake_ocr_to_file(markdown, page_failures=0):
+    """Stand-in for ocr_pdf_to_file_sync that writes markdown to the output path."""
+
+    def fake(pdf_path, output_path, **kwargs):
+        Path(output_path).write_text(markdown, encoding="utf-8")
+        return DocumentResult(
+            output_path=Path(output_path), num_pages=1, page_failures=page_failures
+        )
+
+    return fake
+
+
 def test_wait_for_file_stable_success(tmp_path):
     """Test successful file stability detection."""
     test_file = tmp_path / "test.pdf"
@@ -75,6 +91,7 @@ def service_env(monkeypatch):
         monkeypatch.setenv("PDF2MD_LM_STUDIO_API_KEY", "test-key")
         monkeypatch.setenv("PDF2MD_LM_STUDIO_MODEL", "test-model")
         monkeypatch.setenv("PDF2MD_LOG_FILE", str(Path(tmpdir) / "service.log"))
+        monkeypatch.setenv("PDF2MD_METRICS_PORT", "0")
         monkeypatch.setenv("PDF2MD_MD_PAGE_DELIMITER", "delimited")
 
         yield input_dir, output_dir, done_dir
@@ -120,8 +137,8 @@ def test_on_new_pdf_success(service_env):
     with (
         patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
         patch(
-            "src.pdf2md_service.ocr_pdf_to_markdown_sync",
-            return_value="# Test Markdown",
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file("# Test Markdown"),
         ),
     ):
         on_new_pdf(str(pdf_path))
@@ -145,8 +162,8 @@ def test_on_new_pdf_move_error_file_not_found(service_env):
     with (
         patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
         patch(
-            "src.pdf2md_service.ocr_pdf_to_markdown_sync",
-            return_value="# Test Markdown",
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file("# Test Markdown"),
         ),
         patch("shutil.move", side_effect=FileNotFoundError("File not found")),
     ):
@@ -166,8 +183,8 @@ def test_on_new_pdf_move_error_general_exception(service_env):
     with (
         patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
         patch(
-            "src.pdf2md_service.ocr_pdf_to_markdown_sync",
-            return_value="# Test Markdown",
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file("# Test Markdown"),
         ),
         patch("shutil.move", side_effect=PermissionError("Permission denied")),
     ):
@@ -187,7 +204,7 @@ def test_on_new_pdf_processing_exception(service_env):
     with (
         patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
         patch(
-            "src.pdf2md_service.ocr_pdf_to_markdown_sync",
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
             side_effect=Exception("Processing error"),
         ),
     ):
@@ -209,8 +226,8 @@ def test_on_new_pdf_with_handler(service_env):
     with (
         patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
         patch(
-            "src.pdf2md_service.ocr_pdf_to_markdown_sync",
-            return_value="# Test Markdown",
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file("# Test Markdown"),
         ),
     ):
         on_new_pdf(str(pdf_path), handler=mock_handler)
@@ -219,6 +236,69 @@ def test_on_new_pdf_with_handler(service_env):
         mock_handler.clear_seen_file.assert_called_once_with(str(pdf_path))
 
 
+def test_on_new_pdf_skips_polling_when_monitor_checked_stability(service_env):
+    input_dir, output_dir, done_dir = service_env
+    pdf_path = input_dir / "stable.pdf"
+    pdf_path.write_bytes(b"test content")
+
+    with (
+        patch("src.pdf2md_service.wait_for_file_stable") as mock_wait,
+        patch(
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file("# Test Markdown"),
+        ),
+    ):
+        on_new_pdf(str(pdf_path), handler=MagicMock())
+
+    mock_wait.assert_not_called()
+    assert (output_dir / "stable.md").exists()
+
+
+def test_on_new_pdf_records_job_outcome(service_env):
+    from src.jobstore import DONE, JobStore
+    from src.ocr import PageResult
+
+    input_dir, output_dir, done_dir = service_env
+    pdf_path = input_dir / "tracked.pdf"
+    pdf_path.write_bytes(b"test content")
+    store = JobStore(output_dir / "jobs.sqlite3")
+    store.started(pdf_path)
+    handler = MagicMock(jobs=store)
+
+    def fake(pdf_path, output_path, **kwargs):
+        Path(output_path).write_text("# Page", encoding="utf-8")
+        return DocumentResult(
+            Path(output_path), 1, 0, pages=[PageResult(1, "ocr", True, 2.5, 6)]
+        )
+
+    with (
+        patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
+        patch("src.pdf2md_service.ocr_pdf_to_file_sync", side_effect=fake),
+    ):
+        on_new_pdf(str(pdf_path), handler=handler)
+
+    assert store.status(pdf_path) == DONE
+    assert store.page_stats(0)[0]["avg_seconds"] == 2.5
+    store.close()
+
+
+def test_main_history_report(service_env, capsys):
+    from src.jobstore import DONE, JobStore
+
+    input_dir, output_dir, done_dir = service_env
+    store = JobStore(load_config().JOB_STORE)
+    store.started(input_dir / "a.pdf")
+    store.finished(input_dir / "a.pdf", DONE, num_pages=3)
+    store.close()
+
+    with patch("sys.argv", ["pdf2md_service.py", "--history", "1"]):
+        main()
+
+    out = capsys.readouterr().out
+    assert "Jobs: 1 done" in out
+    assert "      1      0      3" in out
+
+
 def test_main_healthcheck():
     """Test main function with healthcheck argument."""
     with patch("sys.argv", ["pdf2md_service.py", "--healthcheck"]):
@@ -236,7 +316,7 @@ def test_main_normal_run(service_env):
         patch("threading.Event"),
     ):
         # Mock the monitor to exit immediately
-        def mock_monitor_func(*args):
+        def mock_monitor_func(*args, **kwargs):
             args[2].set()  # Set the stop event
 
         mock_monitor.side_effect = mock_monitor_func
@@ -247,6 +327,17 @@ def test_main_normal_run(service_env):
         mock_monitor.assert_called_once()
 
 
+def test_scheduling_policy_from_config(service_env):
+    from src.pdf2md_service import scheduling_policy
+
+    cfg = load_config()
+    assert scheduling_policy(cfg).shortest_first
+
+    cfg.SCHEDULING = "lifo"
+    with pytest.raises(RuntimeError, match="PDF2MD_SCHEDULING"):
+        scheduling_policy(cfg)
+
+
 def test_main_keyboard_interrupt(service_env):
     """Test main function handling KeyboardInterrupt."""
     input_dir, output_dir, done_dir = service_env
@@ -257,3 +348,239 @@ def test_main_keyboard_interrupt(service_env):
     ):
         # Should exit gracefully
         main()
+
+
+def test_on_new_pdf_reuses_output_for_duplicate(service_env):
+    """A PDF with identical content is resolved from the index without OCR."""
+    input_dir, output_dir, done_dir = service_env
+    original = input_dir / "original.pdf"
+    original.write_bytes(b"%PDF-1.4 same content")
+
+    with (
+        patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
+        patch(
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file("# Converted once"),
+        ) as mock_ocr,
+    ):
+        on_new_pdf(str(original))
+
+        # Same bytes under a different name, and the same name dropped again
+        copy = input_dir / "copy of original.pdf"
+        copy.write_bytes(b"%PDF-1.4 same content")
+        on_new_pdf(str(copy))
+        again = input_dir / "original.pdf"
+        again.write_bytes(b"%PDF-1.4 same content")
+        on_new_pdf(str(again))
+
+    mock_ocr.assert_called_once()
+    assert (output_dir / "copy of original.md").read_text() == "# Converted once"
+    assert (output_dir / "original.md").read_text() == "# Converted once"
+    assert not copy.exists()
+    assert (done_dir / "copy of original.pdf").exists()
+    assert not again.exists()
+
+
+def test_on_new_pdf_does_not_index_failed_output(service_env):
+    """Outputs with error markers are not reused for duplicates."""
+    input_dir, output_dir, done_dir = service_env
+
+    with (
+        patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
+        patch(
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file(
+                "**[ERROR: Max retries exceeded for page 1]**", page_failures=1
+            ),
+        ) as mock_ocr,
+    ):
+        for name in ("first.pdf", "second.pdf"):
+            pdf_path = input_dir / name
+            pdf_path.write_bytes(b"%PDF-1.4 flaky")
+            on_new_pdf(str(pdf_path))
+
+    assert mock_ocr.call_count == 2
+
+
+def test_on_new_pdf_dedupe_disabled(service_env, monkeypatch):
+    """An empty PDF2MD_DEDUPE_INDEX turns the index off."""
+    input_dir, output_dir, done_dir = service_env
+    monkeypatch.setenv("PDF2MD_DEDUPE_INDEX", "")
+
+    with (
+        patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
+        patch(
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file("# Converted"),
+        ) as mock_ocr,
+    ):
+        for name in ("a.pdf", "b.pdf"):
+            pdf_path = input_dir / name
+            pdf_path.write_bytes(b"%PDF-1.4 same")
+            on_new_pdf(str(pdf_path))
+
+    assert mock_ocr.call_count == 2
+    assert not (output_dir / ".pdf2md-index.jsonl").exists()
+
+
+def test_on_new_pdf_clears_checkpoints_after_writing(service_env):
+    """Page checkpoints are removed once the markdown is on disk."""
+    from src.checkpoint import CheckpointStore
+    from src.dedupe import file_sha256
+
+    input_dir, output_dir, done_dir = service_env
+    pdf_path = input_dir / "resumed.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 resumed")
+    doc_hash = file_sha256(pdf_path)
+    store = CheckpointStore(output_dir / ".pdf2md-checkpoints")
+    store.save_page(doc_hash, 1, "# Page 1")
+
+    with (
+        patch("src.pdf2md_service.wait_for_file_stable", return_value=True),
+        patch(
+            "src.pdf2md_service.ocr_pdf_to_file_sync",
+            side_effect=fake_ocr_to_file("# Page 1"),
+        ) as mock_ocr,
+    ):
+        on_new_pdf(str(pdf_path))
+
+    assert mock_ocr.call_args.kwargs["doc_hash"] == doc_hash
+    assert mock_ocr.call_args.kwargs["checkpoint_dir"] == str(
+        output_dir / ".pdf2md-checkpoints"
+    )
+    assert store.load(doc_hash) == {}
+
+
+def test_main_removes_stale_partial_outputs(service_env):
+    """Partial outputs left by an interrupted run are cleaned up on startup."""
+    input_dir, output_dir, done_dir = service_env
+    # Written by an earlier process on this host that is no longer running
+    stale = output_dir / f".report.md~{socket.gethostname()}~99999999~abc123.partial"
+    stale.write_text("half a docu")
+
+    with (
+        patch("sys.argv", ["pdf2md_service.py"]),
+        patch("src.pdf2md_service.monitor_folder"),
+    ):
+        main()
+
+    assert not stale.exists()
+
+
+def test_main_prunes_stale_checkpoints(service_env):
+    from src.checkpoint import CheckpointStore
+
+    input_dir, output_dir, done_dir = service_env
+    store = CheckpointStore(output_dir / ".pdf2md-checkpoints")
+    store.save_page("abandoned", 1, "text")
+    long_ago = time.time() - 30 * 86400
+    os.utime(output_dir / ".pdf2md-checkpoints" / "abandoned", (long_ago, long_ago))
+
+    with (
+        patch("sys.argv", ["pdf2md_service.py"]),
+        patch("src.pdf2md_service.monitor_folder"),
+    ):
+        main()
+
+    assert store.load("abandoned") == {}
+
+
+def test_main_serves_metrics_while_monitoring(service_env, monkeypatch):
+    monkeypatch.setenv("PDF2MD_METRICS_PORT", "9999")
+    with (
+        patch("sys.argv", ["pdf2md_service.py"]),
+        patch("src.pdf2md_service.monitor_folder"),
+        patch("src.pdf2md_service.start_metrics_server") as mock_server,
+    ):
+        main()
+
+    mock_server.assert_called_once_with(9999, "127.0.0.1")
+    mock_server.return_value.shutdown.assert_called_once()
+
+
+def test_main_runs_without_metrics_when_the_port_is_taken(service_env, monkeypatch):
+    import socket
+
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        monkeypatch.setenv("PDF2MD_METRICS_PORT", str(taken.getsockname()[1]))
+        with (
+            patch("sys.argv", ["pdf2md_service.py"]),
+            patch("src.pdf2md_service.monitor_folder") as mock_monitor,
+        ):
+            main()
+
+    mock_monitor.assert_called_once()
+
+
+def test_main_runs_without_a_job_store_it_cannot_open(
+    service_env, monkeypatch, tmp_path
+):
+    (tmp_path / "not-a-dir").write_text("")
+    monkeypatch.setenv("PDF2MD_JOB_STORE", str(tmp_path / "not-a-dir" / "jobs.db"))
+    with (
+        patch("sys.argv", ["pdf2md_service.py"]),
+        patch("src.pdf2md_service.monitor_folder") as mock_monitor,
+    ):
+        main()
+
+    assert mock_monitor.call_args.kwargs["jobs"] is None
+
+
+def test_main_warns_that_page_concurrency_is_superseded(
+    service_env, monkeypatch, caplog
+):
+    monkeypatch.setenv("PDF2MD_OCR_PAGE_CONCURRENCY", "4")
+    for slots, warned in (("8", True), ("0", False)):
+        monkeypatch.setenv("PDF2MD_PAGE_SLOTS", slots)
+        caplog.clear()
+        with (
+            patch("sys.argv", ["pdf2md_service.py"]),
+            patch("src.pdf2md_service.monitor_folder"),
+        ):
+            main()
+        assert ("PDF2MD_OCR_PAGE_CONCURRENCY is deprecated" in caplog.text) is warned
+
+
+def test_main_rejects_unknown_monitor_mode(service_env, monkeypatch):
+    monkeypatch.setenv("PDF2MD_MONITOR_MODE", "magic")
+    with (
+        patch("sys.argv", ["pdf2md_service.py"]),
+        patch("src.pdf2md_service.monitor_folder") as mock_monitor,
+        pytest.raises(RuntimeError, match="PDF2MD_MONITOR_MODE"),
+    ):
+        main()
+    mock_monitor.assert_not_called()
+
+
+def test_main_repair_reruns_failed_pages_from_done_dir(service_env, capsys, blank_pdf):
+    from src.checkpoint import CheckpointStore
+    from src.dedupe import file_sha256
+
+    input_dir, output_dir, done_dir = service_env
+    pdf_sha256 = file_sha256(blank_pdf(done_dir / "scan.pdf", 2))
+    checkpoints = CheckpointStore(load_config().CHECKPOINT_DIR)
+    checkpoints.save_page(pdf_sha256, 2, "Page two", "ocr")
+    (output_dir / "scan.md").write_text("Page one\n\n---\n\n**[ERROR: timeout]**")
+    (output_dir / "clean.md").write_text("All good")
+    (output_dir / "orphan.md").write_text("**[ERROR: lost]**")
+
+    with (
+        patch("sys.argv", ["pdf2md_service.py", "--repair"]),
+        patch(
+            "src.pdf2md_service.ocr_pages_sync", return_value={2: "Page two"}
+        ) as ocr_pages,
+    ):
+        main()
+
+    assert ocr_pages.call_args.args == (str(done_dir / "scan.pdf"), [2])
+    assert ocr_pages.call_args.kwargs["doc_hash"] == pdf_sha256
+    assert checkpoints.load(pdf_sha256) == {}  # cleared like after a conversion
+    assert (output_dir / "scan.md").read_text() == "Page one\n\n---\n\nPage two"
+    out = capsys.readouterr().out
+    assert "scan.md: repaired 1 of 1 failed pages" in out
+    assert "orphan.md: not repaired (PDF not found)" in out
+    assert "clean.md" not in out
+    index = load_config().DEDUPE_INDEX
+    assert "scan.md" in Path(index).read_text()
@@ -0,0 +1,108 @@
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.render import PageRenderer, build_page_query_timed
+
+
+@pytest.mark.asyncio
+async def test_build_page_query_timed_matches_olmocr(tmp_path):
+    """The worker-process query builder produces olmocr's query.
+
+    Guards the constants and private anchor helpers mirrored from the pinned
+    olmocr version, so an upgrade that changes the query fails here.
+    """
+    from olmocr.pipeline import build_page_query
+
+    from tests.test_text_layer import BODY, _add_page, _write
+
+    pdf_path = _write(tmp_path, lambda w: _add_page(w, BODY, image=True))
+
+    with (
+        patch("olmocr.pipeline.render_pdf_to_base64png", return_value="aW1n"),
+        patch("olmocr.data.renderpdf.render_pdf_to_base64png", return_value="aW1n"),
+    ):
+        expected = await build_page_query(str(pdf_path), 1, 1024, 6000)
+        query, timings = build_page_query_timed(str(pdf_path), 1, 1024, 6000)
+
+    expected["model"] = query["model"]
+    assert BODY in expected["messages"][0]["content"][0]["text"]
+    assert query == expected
+    assert set(timings) == {"rasterize", "anchor_text"}
+    for start, end in timings.values():
+        assert start <= end
+
+
+@pytest.mark.asyncio
+async def test_page_renderer_without_workers_uses_olmocr():
+    renderer = PageRenderer(0)
+    with patch(
+        "olmocr.pipeline.build_page_query",
+        new_callable=AsyncMock,
+        return_value={"q": 1},
+    ) as mock_build:
+        assert await renderer.build_query("doc.pdf", 3) == {"q": 1}
+    mock_build.assert_called_once_with(
+        "doc.pdf", page=3, target_longest_image_dim=1024, target_anchor_text_len=6000
+    )
+    renderer.close()
+
+
+@pytest.mark.asyncio
+async def test_page_renderer_without_workers_uses_given_reader(tmp_path):
+    """With a parsed reader, anchor text comes from it, not a re-parse."""
+    from olmocr.pipeline import build_page_query
+
+    from src.render import open_cached_reader
+    from tests.test_text_layer import BODY, _add_page, _write
+
+    pdf_path = str(_write(tmp_path, lambda w: _add_page(w, BODY)))
+    reader = open_cached_reader(pdf_path)
+    renderer = PageRenderer(0)
+    with (
+        patch("olmocr.pipeline.render_pdf_to_base64png", return_value="aW1n"),
+        patch("olmocr.data.renderpdf.render_pdf_to_base64png", return_value="aW1n"),
+    ):
+        expected = await build_page_query(pdf_path, 1, 1024, 6000)
+        with patch("olmocr.prompts.anchor.get_anchor_text") as mock_anchor:
+            query = await renderer.build_query(pdf_path, 1, reader=reader)
+    mock_anchor.assert_not_called()
+    expected["model"] = query["model"]
+    assert query == expected
+    renderer.close()
+
+
+def test_cached_readers_of_deleted_copies_are_closed(tmp_path, blank_pdf):
+    """A finished session's deleted copy doesn't stay open in the workers."""
+    from src import render
+
+    done = str(blank_pdf(tmp_path / "done.pdf", 1))
+    render.open_cached_reader(done)
+    handle = next(h for (path, *_), (h, _) in render._readers.items() if path == done)
+    os.unlink(done)
+
+    render.open_cached_reader(str(blank_pdf(tmp_path / "next.pdf", 1)))
+    assert handle.closed
+    assert done not in {path for path, *_ in render._readers}
+
+
+def test_page_anchor_text_matches_olmocr_and_reuses_parse(tmp_path):
+    """Anchor text from a cached parse equals olmocr's per-page re-parse."""
+    from olmocr.prompts.anchor import get_anchor_text
+
+    from src.render import open_cached_reader, page_anchor_text
+    from tests.test_text_layer import BODY, _add_page, _write
+
+    pdf_path = str(
+        _write(
+            tmp_path,
+            lambda w: (_add_page(w, BODY, image=True), _add_page(w, BODY + " Two")),
+        )
+    )
+    reader = open_cached_reader(pdf_path)
+    assert open_cached_reader(pdf_path) is reader
+    for page_num in (1, 2):
+        assert page_anchor_text(reader, page_num, 6000) == get_anchor_text(
+            pdf_path, page_num, pdf_engine="pdfreport", target_length=6000
+        )
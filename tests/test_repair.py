@@ -0,0 +1,99 @@
+from src.repair import is_failed_page, repair_output, split_pages
+
+SEP = "\n\n---\n\n"
+
+
+def test_split_pages_by_separator():
+    header = "**[ERROR: All 2 pages failed OCR for a.pdf]**\n"
+    pages = ["**[ERROR: Max retries exceeded for page 1]**", "**[ERROR: x]**"]
+
+    assert split_pages(SEP.join(pages), "delimited", 2) == (None, pages)
+    assert split_pages(SEP.join([header, *pages]), "delimited", 2) == (header, pages)
+    # A page containing a horizontal rule makes the boundaries ambiguous
+    assert split_pages(SEP.join(["a", "b", "c"]), "delimited", 2) is None
+    assert split_pages("a\n\nb", "concat", 2) is None
+
+
+def test_split_pages_by_page_comments():
+    pages = [
+        "<!-- page 1: text-layer -->\nFirst\n\nparagraph",
+        "<!-- page 2: ocr -->\n**[ERROR: Max retries exceeded for page 2]**",
+    ]
+
+    header, split = split_pages("\n\n".join(pages), "concat", 2)
+
+    assert header is None and split == pages
+    assert [is_failed_page(page) for page in split] == [False, True]
+    assert split_pages("\n\n".join(pages), "concat", 3) is None
+
+
+def test_repair_output_splices_only_the_failed_pages(tmp_path, blank_pdf):
+    pdf = blank_pdf(tmp_path / "doc.pdf", 3)
+    output = tmp_path / "doc.md"
+    output.write_text(SEP.join(["One", "**[ERROR: Max retries exceeded]**", "Three"]))
+    calls = []
+
+    def ocr_pages(pdf_path, pages):
+        calls.append((pdf_path, pages))
+        return {2: "Two"}
+
+    result = repair_output(output, pdf, "delimited", ocr_pages)
+
+    assert calls == [(str(pdf), [2])]
+    assert result.failed == [2] and result.repaired == [2] and not result.still_failed
+    assert output.read_text() == SEP.join(["One", "Two", "Three"])
+    assert not list(tmp_path.glob(".*.partial"))
+
+
+def test_repair_output_drops_all_failed_header_and_keeps_pages_that_fail_again(
+    tmp_path, blank_pdf
+):
+    pdf = blank_pdf(tmp_path / "doc.pdf", 2)
+    output = tmp_path / "doc.md"
+    header = "**[ERROR: All 2 pages failed OCR for doc.pdf]**\n"
+    output.write_text(SEP.join([header, "**[ERROR: a]**", "**[ERROR: b]**"]))
+
+    result = repair_output(
+        output,
+        pdf,
+        "delimited",
+        lambda pdf_path, pages: {1: "Fixed", 2: "**[ERROR: still down]**"},
+    )
+
+    assert result.repaired == [1] and result.still_failed == [2]
+    assert output.read_text() == SEP.join(["Fixed", "**[ERROR: b]**"])
+
+
+def test_repair_output_keeps_page_comments_consistent(tmp_path, blank_pdf):
+    """Repaired pages follow the output's page comments, so it splits again."""
+    pdf = blank_pdf(tmp_path / "doc.pdf", 2)
+    plain = tmp_path / "plain.md"
+    plain.write_text(SEP.join(["One", "**[ERROR: a]**"]))
+    commented = tmp_path / "commented.md"
+    commented.write_text(
+        "<!-- page 1: text-layer -->\nOne\n\n<!-- page 2: ocr -->\n**[ERROR: a]**"
+    )
+
+    def ocr_pages(pdf_path, pages):
+        # Repaired under a text layer threshold: the page comes with a comment
+        return {2: "<!-- page 2: ocr -->\nTwo"}
+
+    repair_output(plain, pdf, "delimited", ocr_pages)
+    repair_output(commented, pdf, "concat", lambda *_: {2: "Two"})
+
+    assert plain.read_text() == SEP.join(["One", "Two"])
+    assert split_pages(commented.read_text(), "concat", 2) == (
+        None,
+        ["<!-- page 1: text-layer -->\nOne", "<!-- page 2: ocr -->\nTwo"],
+    )
+
+
+def test_repair_output_reports_mismatched_outputs(tmp_path, blank_pdf):
+    pdf = blank_pdf(tmp_path / "doc.pdf", 3)
+    output = tmp_path / "doc.md"
+    output.write_text(SEP.join(["One", "**[ERROR: x]**"]))
+
+    result = repair_output(output, pdf, "delimited", lambda *_: {})
+
+    assert "page boundaries" in result.error
+    assert output.read_text() == SEP.join(["One", "**[ERROR: x]**"])
@@ -0,0 +1,100 @@
+import queue
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.scheduling import (
+    NORMAL,
+    URGENT,
+    JobQueue,
+    SchedulingPolicy,
+    estimate_page_count,
+)
+
+
+def _drain(jobs):
+    items = []
+    while True:
+        try:
+            items.append(jobs.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def test_job_queue_orders_by_priority_then_cost():
+    jobs: JobQueue[str] = JobQueue()
+    jobs.put("binder", NORMAL, 800)
+    jobs.put("invoice", NORMAL, 1)
+    jobs.put("urgent binder", URGENT, 500)
+    jobs.put("letter", NORMAL, 1)
+
+    assert _drain(jobs) == ["urgent binder", "invoice", "letter", "binder"]
+
+
+def test_job_queue_without_costs_is_fifo():
+    jobs: JobQueue[int] = JobQueue()
+    for i in range(5):
+        jobs.put(i)
+
+    assert _drain(jobs) == [0, 1, 2, 3, 4]
+
+
+def test_job_queue_aging_lets_large_jobs_through():
+    """A job that has waited long enough beats newer, smaller ones."""
+    jobs: JobQueue[str] = JobQueue(aging=10.0)
+    with patch("src.scheduling.time.monotonic", return_value=0.0):
+        jobs.put("binder", NORMAL, 800)
+    with patch("src.scheduling.time.monotonic", return_value=60.0 * 60):
+        jobs.put("invoice", NORMAL, 1)
+        assert jobs.get() == "invoice"  # 800 - 600 pages of credit is still more
+    with patch("src.scheduling.time.monotonic", return_value=60.0 * 90):
+        jobs.put("letter", NORMAL, 1)
+        assert jobs.get() == "binder"
+
+
+def test_job_queue_put_blocks_while_full():
+    import threading
+
+    jobs: JobQueue[int] = JobQueue(maxsize=1)
+    jobs.put(1)
+    producer = threading.Thread(target=jobs.put, args=(2,))
+    producer.start()
+    producer.join(timeout=0.1)
+    assert producer.is_alive()
+
+    assert jobs.get() == 1
+    producer.join(timeout=2)
+    assert not producer.is_alive()
+    assert jobs.qsize() == 1
+
+
+def test_estimate_page_count(tmp_path):
+    """Estimated from the size alone, without parsing the PDF."""
+    pdf = tmp_path / "scan.pdf"
+    pdf.write_bytes(b"%PDF-1.7\n" + b"\0" * 249_991)
+    with patch("pypdf.PdfReader") as reader:
+        assert estimate_page_count(pdf) == 2.5
+    reader.assert_not_called()
+    assert estimate_page_count(tmp_path / "gone.pdf") == 1.0
+
+
+@pytest.mark.parametrize(
+    ("path", "priority"),
+    [
+        ("/in/report.pdf", NORMAL),
+        ("/in/priority/report.pdf", URGENT),
+        ("/in/priority_report.pdf", URGENT),
+        ("/in/archive/priority.pdf", NORMAL),
+    ],
+)
+def test_scheduling_policy_priority(path, priority):
+    assert SchedulingPolicy().priority(Path(path)) == priority
+
+
+def test_scheduling_policy_fifo_has_no_cost(tmp_path):
+    pdf = tmp_path / "big.pdf"
+    pdf.write_bytes(b"\0" * 400_000)
+
+    assert SchedulingPolicy().cost(pdf) == 4
+    assert SchedulingPolicy(shortest_first=False).cost(pdf) == 0
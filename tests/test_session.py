@@ -0,0 +1,68 @@
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+from pypdf.errors import PdfReadError
+
+from src.render import PageRenderer
+from src.session import DocumentSession
+
+
+def _query(page_num):
+    return {
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": f"prompt {page_num}"},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/png;base64,IMG{page_num}"},
+                    },
+                ],
+            }
+        ]
+    }
+
+
+@pytest.mark.asyncio
+async def test_session_opens_local_copy_once(tmp_path, blank_pdf):
+    pdf_path = blank_pdf(tmp_path / "doc.pdf", 3)
+    async with DocumentSession(str(pdf_path), PageRenderer()) as session:
+        assert session.page_count == 3
+        local = Path(session.local_path)
+        assert local != pdf_path
+        assert local.read_bytes() == pdf_path.read_bytes()
+        assert len(session.reader.pages) == 3
+    assert not local.exists()
+    with pytest.raises(RuntimeError, match="not open"):
+        _ = session.reader
+
+
+@pytest.mark.asyncio
+async def test_session_reuses_rendered_query_until_released(tmp_path, blank_pdf):
+    pdf_path = blank_pdf(tmp_path / "doc.pdf", 2)
+    renderer = PageRenderer()
+    renderer.build_query = AsyncMock(side_effect=lambda path, n, **kw: _query(n))
+    async with DocumentSession(str(pdf_path), renderer) as session:
+        first = await session.query(2)
+        assert await session.query(2) is first
+        renderer.build_query.assert_awaited_once()
+        # Rendering reads the local copy, not the original
+        assert renderer.build_query.await_args.args == (session.local_path, 2)
+        # Anchor text comes from the session's own parse
+        assert renderer.build_query.await_args.kwargs["reader"] is session.reader
+
+        session.release(2)
+        assert await session.query(2) is not first
+        assert renderer.build_query.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_session_open_failure_cleans_up(tmp_path):
+    bad = tmp_path / "bad.pdf"
+    bad.write_text("not a pdf")
+    session = DocumentSession(str(bad), PageRenderer())
+    with pytest.raises(PdfReadError):
+        await session.open()
+    assert session.local_path == str(bad)
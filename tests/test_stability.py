@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from src.stability import StabilityTracker
+
+
+@pytest.fixture
+def tracker():
+    stable = []
+    event = threading.Event()
+
+    def on_stable(path, source):
+        stable.append((path.name, source, time.monotonic()))
+        event.set()
+
+    dropped = []
+    tracker = StabilityTracker(
+        on_stable, quiet_period=0.2, max_wait=1.0, on_dropped=dropped.append
+    )
+    tracker.stable = stable
+    tracker.dropped = dropped
+    tracker.event = event
+    tracker.start()
+    yield tracker
+    tracker.stop()
+
+
+def test_small_file_is_ready_after_one_quiet_period(tracker, tmp_path):
+    pdf = tmp_path / "small.pdf"
+    pdf.write_bytes(b"%PDF-1.7 small")
+    start = time.monotonic()
+    tracker.changed(pdf)
+
+    assert tracker.event.wait(timeout=2)
+    assert tracker.stable[0][:2] == ("small.pdf", "new")
+    assert tracker.stable[0][2] - start < 0.5
+    assert tracker.pending() == 0
+
+
+def test_writes_push_the_deadline_back(tracker, tmp_path):
+    pdf = tmp_path / "growing.pdf"
+    pdf.write_bytes(b"%PDF")
+    tracker.changed(pdf)
+    for _ in range(4):
+        time.sleep(0.1)
+        with open(pdf, "ab") as f:
+            f.write(b" more")
+        tracker.changed(pdf)
+    last_write = time.monotonic()
+
+    assert tracker.event.wait(timeout=2)
+    assert tracker.stable[0][2] - last_write >= 0.2
+    assert len(tracker.stable) == 1
+
+
+def test_completed_file_skips_the_quiet_period(tmp_path):
+    stable = threading.Event()
+    tracker = StabilityTracker(lambda path, source: stable.set(), quiet_period=5.0)
+    tracker.start()
+    try:
+        pdf = tmp_path / "renamed.pdf"
+        pdf.write_bytes(b"%PDF-1.7 renamed")
+        tracker.completed(pdf, "moved")
+        assert stable.wait(timeout=1)
+    finally:
+        tracker.stop()
+
+
+def test_empty_and_deleted_files_are_not_reported(tracker, tmp_path):
+    empty = tmp_path / "empty.pdf"
+    empty.touch()
+    gone = tmp_path / "gone.pdf"
+    gone.write_bytes(b"%PDF")
+    tracker.changed(empty)
+    tracker.changed(gone)
+    gone.unlink()
+
+    time.sleep(1.3)  # past max_wait
+
+    assert tracker.stable == []
+    assert tracker.pending() == 0
+    assert sorted(p.name for p in tracker.dropped) == ["empty.pdf", "gone.pdf"]
@@ -0,0 +1,116 @@
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+)
+
+from src.text_layer import extract_text_layer_pages, score_page, text_to_markdown
+
+BODY = (
+    "Quarterly report for the northern region. Revenue grew by eight percent "
+    "compared to last year, driven by new contracts."
+)
+
+
+def _add_page(writer, content, font_subtype="/Type1", image=False):
+    """Add a letter-size page drawing `content` with one font (and an image)."""
+    page = writer.add_blank_page(612, 792)
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject(font_subtype),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    resources = DictionaryObject(
+        {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+    )
+    stream = b""
+    if image:
+        image_obj = DecodedStreamObject()
+        image_obj.set_data(b"\x00")
+        image_obj.update(
+            {
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(1),
+                NameObject("/Height"): NumberObject(1),
+                NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+            }
+        )
+        resources[NameObject("/XObject")] = DictionaryObject(
+            {NameObject("/Im1"): writer._add_object(image_obj)}
+        )
+        stream += b"q 612 0 0 792 0 0 cm /Im1 Do Q "
+    if content:
+        stream += b"BT /F1 10 Tf 20 700 Td (" + content.encode("latin-1") + b") Tj ET"
+    page[NameObject("/Resources")] = resources
+    contents = DecodedStreamObject()
+    contents.set_data(stream)
+    page[NameObject("/Contents")] = writer._add_object(contents)
+    page[NameObject("/MediaBox")] = ArrayObject(
+        [NumberObject(0), NumberObject(0), NumberObject(612), NumberObject(792)]
+    )
+    return page
+
+
+def _write(tmp_path, build):
+    writer = PdfWriter()
+    build(writer)
+    path = tmp_path / "doc.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def _score(tmp_path, build):
+    reader = PdfReader(_write(tmp_path, build))
+    return score_page(reader.pages[0])
+
+
+def test_born_digital_page_scores_high(tmp_path):
+    score, text = _score(tmp_path, lambda w: _add_page(w, BODY))
+    assert "Quarterly report" in text
+    assert score.garbage_ratio == 0
+    assert score.image_coverage == 0
+    assert score.score == 1.0
+
+
+def test_blank_or_tiny_page_scores_zero(tmp_path):
+    score, _ = _score(tmp_path, lambda w: _add_page(w, ""))
+    assert score.score == 0.0
+    score, _ = _score(tmp_path, lambda w: _add_page(w, "Page 3"))
+    assert score.score == 0.0
+
+
+def test_scanned_page_with_text_overlay_is_penalized(tmp_path):
+    score, _ = _score(tmp_path, lambda w: _add_page(w, BODY, image=True))
+    assert score.image_coverage == 1.0
+    assert score.score == 0.5
+
+
+def test_unmapped_fonts_score_zero(tmp_path):
+    score, _ = _score(tmp_path, lambda w: _add_page(w, BODY, font_subtype="/Type3"))
+    assert score.unmapped_font_ratio == 1.0
+    assert score.score == 0.0
+
+
+def test_text_to_markdown_cleans_up_layout():
+    text = "Intro-\nduction   \r\nline two\n\n\n\nNext paragraph\n"
+    assert text_to_markdown(text) == "Introduction\nline two\n\nNext paragraph"
+
+
+def test_extract_text_layer_pages_applies_threshold(tmp_path):
+    def build(writer):
+        _add_page(writer, BODY)
+        _add_page(writer, "")
+        _add_page(writer, BODY, image=True)
+
+    path = _write(tmp_path, build)
+    assert set(extract_text_layer_pages(path, threshold=0.9)) == {1}
+    assert set(extract_text_layer_pages(path, threshold=0.4)) == {1, 3}
+    assert set(extract_text_layer_pages(path, threshold=0.4, only=[2, 3])) == {3}
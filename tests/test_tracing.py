@@ -0,0 +1,122 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from src.tracing import (
+    Tracer,
+    format_trace,
+    load_traces,
+    main,
+    stage_totals,
+    to_chrome_trace,
+)
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_spans_nest_and_are_written_when_they_end(tmp_path):
+    tracer = Tracer(tmp_path / "trace.jsonl")
+    with tracer.span("document", path="a.pdf") as root:
+        with tracer.span("render", page=1):
+            pass
+        with pytest.raises(ValueError), tracer.span("parse"):
+            raise ValueError("bad json")
+        tracer.record("rasterize", root.start, root.start + 0.5)
+    tracer.close()
+
+    records = {r["name"]: r for r in _records(tmp_path / "trace.jsonl")}
+    assert set(records) == {"document", "render", "parse", "rasterize"}
+    assert {r["trace"] for r in records.values()} == {root.trace_id}
+    assert records["document"]["parent"] is None
+    assert records["render"]["parent"] == records["document"]["span"]
+    assert records["render"]["attrs"] == {"page": 1}
+    assert records["parse"]["error"] == "ValueError: bad json"
+    assert records["rasterize"]["duration"] == 0.5
+
+
+def test_disabled_tracer_writes_nothing(tmp_path):
+    tracer = Tracer()
+    with tracer.span("document"):
+        pass
+    assert not tracer.enabled
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spans_follow_tasks_and_coroutines_submitted_from_threads(tmp_path):
+    """Spans on an engine loop thread join the trace of the submitting thread."""
+    tracer = Tracer(tmp_path / "trace.jsonl")
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def page(n):
+        with tracer.span("page", page=n):
+            await asyncio.sleep(0)
+
+    async def document():
+        await asyncio.gather(*(asyncio.create_task(page(n)) for n in (1, 2)))
+
+    try:
+        with tracer.span("document") as root:
+            asyncio.run_coroutine_threadsafe(document(), loop).result(5)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+        tracer.close()
+
+    pages = [r for r in _records(tmp_path / "trace.jsonl") if r["name"] == "page"]
+    assert len(pages) == 2
+    assert all(r["parent"] == root.span_id for r in pages)
+
+
+def _write_trace(path):
+    tracer = Tracer(path)
+    for name, seconds in (("short.pdf", 0.1), ("long.pdf", 2.0)):
+        with tracer.span("document", path=name) as root:
+            tracer.record("stability_wait", root.start, root.start + 0.2)
+            with tracer.span("page", page=1) as page:
+                tracer.record("request", page.start, page.start + seconds)
+                tracer.record("parse", page.start + seconds, page.start + seconds)
+    tracer.close()
+
+
+def test_viewer_shows_span_tree_and_time_per_stage(tmp_path):
+    _write_trace(tmp_path / "trace.jsonl")
+    traces = load_traces(tmp_path / "trace.jsonl")
+    assert len(traces) == 2
+    long_trace = next(
+        r for r in traces.values() if any("long.pdf" in str(x.get("attrs")) for x in r)
+    )
+
+    lines = format_trace(long_trace).splitlines()
+
+    assert "document [path=long.pdf]" in lines[0]
+    assert [line.split()[2] for line in lines] == [
+        "document",
+        "stability_wait",
+        "page",
+        "request",
+        "parse",
+    ]
+    assert lines[3].index("request") > lines[2].index("page")  # indented child
+    assert list(stage_totals(long_trace)) == ["request", "stability_wait", "parse"]
+
+
+def test_viewer_cli_prints_slowest_and_exports_chrome(tmp_path, capsys):
+    _write_trace(tmp_path / "trace.jsonl")
+
+    main([str(tmp_path / "trace.jsonl"), "--slowest", "1"])
+    out = capsys.readouterr().out
+    assert "long.pdf" in out and "short.pdf" not in out
+    assert "time per stage: request 2.00s" in out
+
+    main([str(tmp_path / "trace.jsonl"), "--chrome", str(tmp_path / "chrome.json")])
+    chrome = json.loads((tmp_path / "chrome.json").read_text())
+    spans = [e for e in chrome["traceEvents"] if e["ph"] == "X"]
+    assert len(spans) == 10
+    assert to_chrome_trace({})["traceEvents"] == []
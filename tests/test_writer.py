@@ -0,0 +1,115 @@
+import os
+import socket
+import stat
+import time
+
+import pytest
+
+from src.writer import (
+    MarkdownStreamWriter,
+    copy_output,
+    load_umask,
+    remove_partial_files,
+)
+
+
+def test_writer_orders_pages_and_renames_on_commit(tmp_path):
+    output = tmp_path / "doc.md"
+    writer = MarkdownStreamWriter(output, delimiter="delimited")
+
+    writer.add_page(2, "two")
+    assert writer.pages_written == 0  # waiting for page 1
+    writer.add_page(1, "one")
+    writer.add_page(3, "three")
+    assert writer.pages_written == 3
+    assert not output.exists()
+
+    writer.commit()
+    assert output.read_text() == "one\n\n---\n\ntwo\n\n---\n\nthree"
+    assert list(tmp_path.glob("*.partial")) == []
+
+
+def test_writer_concat_delimiter_and_header(tmp_path):
+    output = tmp_path / "doc.md"
+    writer = MarkdownStreamWriter(output, delimiter="concat")
+    writer.add_page(1, "one")
+    writer.add_page(2, "two")
+    writer.commit(header="HEADER\n")
+    assert output.read_text() == "HEADER\n\n\none\n\ntwo"
+
+
+def test_writer_outputs_get_the_umask_mode(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.writer._UMASK", 0o022)
+    writer = MarkdownStreamWriter(tmp_path / "doc.md")
+    writer.add_page(1, "one")
+    writer.commit(header="notice")
+
+    mode = stat.S_IMODE(os.stat(tmp_path / "doc.md").st_mode)
+    assert mode == 0o644
+
+
+def test_writer_refuses_to_commit_with_missing_pages(tmp_path):
+    output = tmp_path / "doc.md"
+    writer = MarkdownStreamWriter(output)
+    writer.add_page(2, "two")
+    with pytest.raises(RuntimeError, match="page 1"):
+        writer.commit()
+    assert not output.exists()
+    assert list(tmp_path.glob("*.partial")) == []
+
+
+def test_writer_abort_keeps_existing_output(tmp_path):
+    output = tmp_path / "doc.md"
+    output.write_text("old")
+    writer = MarkdownStreamWriter(output)
+    writer.add_page(1, "new")
+    writer.abort()
+    writer.abort()
+    assert output.read_text() == "old"
+    assert list(tmp_path.glob("*.partial")) == []
+
+
+def test_copy_output_replaces_the_target_atomically(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.writer._UMASK", 0o022)
+    source = tmp_path / "first.md"
+    source.write_text("converted")
+    source.chmod(0o600)
+    target = tmp_path / "second.md"
+    target.write_text("old")
+
+    assert copy_output(source, target) == target
+
+    assert target.read_text() == "converted"
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o644
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".")] == []
+
+
+def test_remove_partial_files(tmp_path):
+    """Only abandoned partials of this host, or long-untouched ones, are removed."""
+    host = socket.gethostname()
+    MarkdownStreamWriter(tmp_path / "a.md")  # never committed, but still running
+    (tmp_path / "b.md").write_text("done")
+    crashed = tmp_path / f".c.md~{host}~99999999~x1.partial"
+    crashed.write_text("pid no longer running")
+    elsewhere = tmp_path / ".d.md~other-host~1~x2.partial"
+    elsewhere.write_text("another instance, in progress")
+    old = tmp_path / ".e.md~other-host~2~x3.partial"
+    old.write_text("abandoned")
+    long_ago = time.time() - 2 * 86400
+    os.utime(old, (long_ago, long_ago))
+
+    assert remove_partial_files(tmp_path) == 2
+
+    assert not crashed.exists() and not old.exists()
+    assert elsewhere.exists()
+    assert len(list(tmp_path.glob(f".a.md~{host}~{os.getpid()}~*.partial"))) == 1
+
+
+def test_load_umask_reads_the_process_umask(monkeypatch):
+    monkeypatch.setattr("src.writer._UMASK", 0)
+    previous = os.umask(0o027)
+    try:
+        assert load_umask() == 0o027
+        assert os.umask(0o027) == 0o027
+    finally:
+        os.umask(previous)